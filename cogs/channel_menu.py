@@ -1,9 +1,12 @@
+import asyncio
 import datetime
-from typing import List, Tuple
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
 
 import discord
 from discord.ext import commands
 
+from utils.role_changes import apply_role_changes, role_names
+
 
 class YearButton(discord.ui.Button):
     def __init__(self, bot, year: str, label: str, emoji: str, color: discord.Color):
@@ -102,19 +105,34 @@ class CourseSelect(discord.ui.Select):
         await interaction.response.defer(ephemeral=True)
 
         selected_ids = set(int(v) for v in self.values)
-        added, removed = [], []
+        to_add, to_remove = [], []
 
         for opt in self.options:
             role_id = int(opt.value)
             role = interaction.guild.get_role(role_id)
             if not role:
                 continue
-            if role_id in selected_ids and role not in interaction.user.roles:
-                await interaction.user.add_roles(role)
-                added.append(role.name)
-            elif role_id not in selected_ids and role in interaction.user.roles:
-                await interaction.user.remove_roles(role)
-                removed.append(role.name)
+            if role_id in selected_ids:
+                to_add.append(role)
+            else:
+                to_remove.append(role)
+
+        try:
+            result = await apply_role_changes(
+                interaction.user, to_add, to_remove, reason="Channel menu"
+            )
+        except discord.HTTPException as e:
+            self.bot.log.error(f"Kon vakrollen van {interaction.user} niet aanpassen: {e}")
+            await interaction.followup.send(
+                "❌ Er is een fout opgetreden bij het aanpassen van je rollen.", ephemeral=True
+            )
+            return
+
+        self.bot.log.debug(
+            f"Channel menu: {result.rest_calls} REST call(s) for roles of {interaction.user}"
+        )
+        added = [role.name for role in result.added]
+        removed = [role.name for role in result.removed]
 
         msg = []
         if added:
@@ -179,9 +197,35 @@ class BackToTracksButton(discord.ui.Button):
         await interaction.edit_original_response(embed=embed, view=view)
 
 
+YEARS = ("1", "2", "3")
+RECONCILE_DELAY = 5  # seconds to collect channel changes before reconciling them in one pass
+
+
+class CourseChannel(NamedTuple):
+    guild_id: int
+    year: str
+    role_name: str
+    tracks: Tuple[str, ...]
+
+
 class ChannelMenu(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        # channel_id -> course channel, kept current from the channel events
+        self.courses: Dict[int, CourseChannel] = {}
+        # guild_id -> year -> track -> [channel_id], rebuilt from self.courses on change
+        self.index: Dict[int, Dict[str, Dict[str, List[int]]]] = {}
+        # Channels whose role and permissions still have to be reconciled
+        self._dirty: Set[int] = set()
+        self._dirty_event = asyncio.Event()
+        self._reconcile_task: Optional[asyncio.Task] = None
+
+    async def cog_load(self):
+        self._reconcile_task = asyncio.create_task(self._reconcile_loop())
+
+    async def cog_unload(self):
+        if self._reconcile_task:
+            self._reconcile_task.cancel()
 
     async def parse_channel_topic(self, channel: discord.TextChannel) -> Tuple[str, List[str]]:
         """Gebruik altijd de kanaalnaam als rolnaam, en haal tracks uit de laatste regel van het topic."""
@@ -200,40 +244,75 @@ class ChannelMenu(commands.Cog):
 
         return role_name, tracks
 
+    @staticmethod
+    def _year_of(channel: discord.abc.GuildChannel) -> Optional[str]:
+        """Het studiejaar van de categorie van een kanaal, of None."""
+        if not channel.category:
+            return None
+        category_name = channel.category.name.upper()
+        return next((year for year in YEARS if f"{year}E JAAR" in category_name), None)
+
+    async def _index_channel(self, channel: discord.abc.GuildChannel) -> bool:
+        """(Her)indexeer één kanaal; True als het een vakkanaal is."""
+        year = self._year_of(channel) if isinstance(channel, discord.TextChannel) else None
+        if year is None:
+            return self.courses.pop(channel.id, None) is not None
+
+        role_name, tracks = await self.parse_channel_topic(channel)
+        if not role_name:
+            return self.courses.pop(channel.id, None) is not None
+
+        self.courses[channel.id] = CourseChannel(
+            channel.guild.id, year, role_name, tuple(t for t in tracks if t)
+        )
+        return True
+
+    def _rebuild_index(self, guild_id: int):
+        index: Dict[str, Dict[str, List[int]]] = {}
+        for channel_id, course in self.courses.items():
+            if course.guild_id != guild_id:
+                continue
+            for track in course.tracks:
+                index.setdefault(course.year, {}).setdefault(track, []).append(channel_id)
+        self.index[guild_id] = index
+
+    async def build_index(self, guild: discord.Guild):
+        """Bouw de jaar → track → kanalen index van een guild op."""
+        for channel_id in [k for k, v in self.courses.items() if v.guild_id == guild.id]:
+            del self.courses[channel_id]
+        for channel in guild.text_channels:
+            await self._index_channel(channel)
+        self._rebuild_index(guild.id)
+        self.bot.log.info(
+            f"Channel menu index opgebouwd voor {guild.name}: "
+            f"{sum(1 for c in self.courses.values() if c.guild_id == guild.id)} vakkanalen"
+        )
+
+    async def _guild_index(self, guild: discord.Guild) -> Dict[str, Dict[str, List[int]]]:
+        if guild.id not in self.index:
+            await self.build_index(guild)
+        return self.index[guild.id]
+
     async def get_tracks_for_year(self, guild: discord.Guild, year: str) -> List[str]:
         """Geef unieke tracks terug voor een studiejaar."""
-        tracks_set = set()
-        for category in guild.categories:
-            if f"{year}E JAAR" in category.name.upper():
-                for channel in category.channels:
-                    if isinstance(channel, discord.TextChannel):
-                        _, tracks = await self.parse_channel_topic(channel)
-                        for t in tracks:
-                            if t:
-                                tracks_set.add(t)
-        return sorted(list(tracks_set))
+        index = await self._guild_index(guild)
+        return sorted(index.get(year, {}))
 
     async def get_roles_for_track(
         self, guild: discord.Guild, year: str, track: str
     ) -> List[discord.Role]:
         """Geef alle rollen terug die gekoppeld zijn aan een bepaalde track in een jaar."""
+        index = await self._guild_index(guild)
         roles = []
 
-        for category in guild.categories:
-            if f"{year}E JAAR" not in category.name.upper():
+        for channel_id in index.get(year, {}).get(track, []):
+            course = self.courses[channel_id]
+            role = role_names.get(guild, course.role_name)
+            if role is None:
+                # Rol bestaat (nog) niet: de achtergrond-reconcile maakt ze aan
+                self._mark_dirty(channel_id)
                 continue
-
-            for channel in category.channels:
-                if not isinstance(channel, discord.TextChannel):
-                    continue
-
-                role_name, tracks = await self.parse_channel_topic(channel)
-                if not role_name:
-                    continue
-
-                if track in tracks:
-                    role = await self.ensure_role_for_channel(channel.guild, channel, role_name)
-                    roles.append(role)
+            roles.append(role)
 
         return roles
 
@@ -249,31 +328,96 @@ class ChannelMenu(commands.Cog):
             )
             self.bot.log.info(f"✅ Rol '{role.name}' aangemaakt in guild '{guild.name}'")
 
-        # Permissions instellen
-        await channel.set_permissions(role, read_messages=True)
+        # Permissions instellen (alleen als ze nog niet kloppen)
+        if channel.overwrites_for(role).read_messages is not True:
+            await channel.set_permissions(role, read_messages=True)
         everyone = guild.default_role
         if channel.overwrites_for(everyone).read_messages is not False:
             await channel.set_permissions(everyone, read_messages=False)
 
         return role
 
+    def _mark_dirty(self, channel_id: int):
+        self._dirty.add(channel_id)
+        self._dirty_event.set()
+
+    async def _reconcile_loop(self):
+        """Maak ontbrekende rollen aan en zet permissions, gebundeld en buiten de interacties."""
+        await self.bot.wait_until_ready()
+        for guild in self.bot.guilds:
+            try:
+                await self.build_index(guild)
+            except Exception as e:
+                self.bot.log.error(
+                    f"Kon channel menu index voor {guild.name} niet opbouwen: {e}", exc_info=True
+                )
+            self._dirty.update(k for k, v in self.courses.items() if v.guild_id == guild.id)
+        self._dirty_event.set()
+
+        while True:
+            await self._dirty_event.wait()
+            await asyncio.sleep(RECONCILE_DELAY)
+            self._dirty_event.clear()
+            dirty, self._dirty = self._dirty, set()
+
+            for channel_id in dirty:
+                course = self.courses.get(channel_id)
+                channel = self.bot.get_channel(channel_id)
+                if course is None or not isinstance(channel, discord.TextChannel):
+                    continue
+                try:
+                    await self.ensure_role_for_channel(channel.guild, channel, course.role_name)
+                except discord.HTTPException as e:
+                    self.bot.log.error(
+                        f"Kon rol/permissions voor #{channel.name} niet instellen: {e}"
+                    )
+                except Exception as e:
+                    # E.g. a channel or role deleted mid-run: keep reconciling the others
+                    self.bot.log.error(
+                        f"Onverwachte fout bij rol/permissions voor #{channel.name}: {e}",
+                        exc_info=True,
+                    )
+
     @commands.Cog.listener()
     async def on_guild_channel_create(self, channel: discord.abc.GuildChannel):
-        """Wanneer een nieuw kanaal wordt aangemaakt in een jaarcategorie → rol aanmaken."""
-        if not isinstance(channel, discord.TextChannel):
-            return
-
-        # Check of de category een jaar bevat
-        if channel.category and any(
-            x in channel.category.name.upper() for x in ["1E JAAR", "2E JAAR", "3E JAAR"]
-        ):
-            role_name, tracks = await self.parse_channel_topic(channel)
-            if role_name:
-                await self.ensure_role_for_channel(channel.guild, channel, role_name)
+        """Wanneer een nieuw kanaal wordt aangemaakt in een jaarcategorie → indexeren en rol aanmaken."""
+        if await self._index_channel(channel):
+            self._rebuild_index(channel.guild.id)
+            if channel.id in self.courses:
+                self._mark_dirty(channel.id)
                 self.bot.log.info(
-                    f"📘 Rol en permissions ingesteld voor #{channel.name} in {channel.category.name}"
+                    f"📘 Rol en permissions ingepland voor #{channel.name} in {channel.category.name}"
                 )
 
+    @commands.Cog.listener()
+    async def on_guild_channel_update(
+        self, before: discord.abc.GuildChannel, after: discord.abc.GuildChannel
+    ):
+        if isinstance(after, discord.CategoryChannel):
+            # A renamed category can turn its channels into (or out of) a year's courses
+            if before.name != after.name:
+                for channel in after.text_channels:
+                    await self._index_channel(channel)
+                    if channel.id in self.courses:
+                        self._mark_dirty(channel.id)
+                self._rebuild_index(after.guild.id)
+            return
+        if (
+            before.name == after.name
+            and getattr(before, "topic", None) == getattr(after, "topic", None)
+            and before.category_id == after.category_id
+        ):
+            return
+        if await self._index_channel(after):
+            self._rebuild_index(after.guild.id)
+            if after.id in self.courses:
+                self._mark_dirty(after.id)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel):
+        if self.courses.pop(channel.id, None) is not None:
+            self._rebuild_index(channel.guild.id)
+
 
 async def setup(bot):
     await bot.add_cog(ChannelMenu(bot))
@@ -13,7 +13,7 @@ class ConfessionCommands(commands.Cog):
 
     async def has_moderator_role(self, interaction: discord.Interaction) -> bool:
         """Check if user has moderator role."""
-        settings = await self.bot.db.settings.find_one({"_id": "reports_settings"})
+        settings = await self.bot.settings.get("reports_settings")
         if not settings or "moderator_role_id" not in settings:
             return interaction.user.guild_permissions.manage_guild
 
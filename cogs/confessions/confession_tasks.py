@@ -4,8 +4,13 @@ import discord
 from discord.ext import commands, tasks
 
 from cogs.confessions.confession_view import ConfessionView
+from utils.indexes import index_registry
 from utils.timezone import LOCAL_TIMEZONE, local_time
 
+# Pending/under review/posted confessions are looked up and counted by status
+index_registry.index("confessions", "status")
+index_registry.query("confessions", {"status": "pending"})
+
 
 class ConfessionTasks(commands.Cog):
     def __init__(self, bot):
@@ -16,13 +21,13 @@ class ConfessionTasks(commands.Cog):
         self.bot.loop.create_task(self.init_tasks())
 
     async def get_review_channel_id(self):
-        settings = await self.bot.db.settings.find_one({"_id": "confession_settings"})
+        settings = await self.bot.settings.get("confession_settings")
         if settings and "review_channel_id" in settings:
             return settings["review_channel_id"]
         return None
 
     async def get_public_channel_id(self):
-        settings = await self.bot.db.settings.find_one({"_id": "confession_settings"})
+        settings = await self.bot.settings.get("confession_settings")
         if settings and "public_channel_id" in settings:
             return settings["public_channel_id"]
         return None
@@ -32,14 +37,14 @@ class ConfessionTasks(commands.Cog):
         await self.update_post_schedule()
 
     async def get_settings(self):
-        settings = await self.bot.db.settings.find_one({"_id": "confession_settings"})
+        settings = await self.bot.settings.get("confession_settings")
         if not settings:
             settings = {
                 "daily_review_limit": 2,
                 "review_time": "17:00",
                 "post_times": ["9:00", "12:00"],
             }
-            await self.bot.db.settings.insert_one({"_id": "confession_settings", **settings})
+            await self.bot.settings.insert_one({"_id": "confession_settings", **settings})
             self.bot.log.info("Standaard confession instellingen aangemaakt in de database.")
         return settings
 
@@ -294,10 +299,8 @@ class ConfessionTasks(commands.Cog):
                 "confession", public_channel.id, message.id, public_channel.guild.id
             )
             # Sla ID van dit losse knopbericht op
-        await self.bot.db.settings.update_one(
-            {"_id": "confession_settings"},
-            {"$set": {"last_button_message_id": message.id}},
-            upsert=True,
+        await self.bot.settings.update_one(
+            "confession_settings", {"$set": {"last_button_message_id": message.id}}
         )
 
 
@@ -4,6 +4,7 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 
+from cogs.role_selector import RoleCategory
 from cogs.unban_request import UnbanView
 from main import DEFAULT_GUILD_ID
 from utils.checks import is_council
@@ -11,6 +12,19 @@ from utils.checks import is_council
 from .developer_management import DeveloperManagementView
 
 
+async def save_role_categories(bot, categories: list):
+    """Save the role selector categories through the RoleSelector cog, so its cache follows."""
+    role_selector_cog = bot.get_cog("RoleSelector")
+    if role_selector_cog:
+        await role_selector_cog.save_categories(
+            [RoleCategory.from_dict(category) for category in categories]
+        )
+    else:
+        await bot.db.role_selector.update_one(
+            {"_id": "categories"}, {"$set": {"categories": categories}}, upsert=True
+        )
+
+
 class ConfigurationView(discord.ui.View):
     """Main configuration view with category selection."""
 
@@ -212,7 +226,7 @@ class ServerConfigView(BaseConfigView):
         """Create server configuration embed."""
         try:
             self.settings_id = "baseconfig"
-            settings = await self.bot.db.settings.find_one({"_id": "server_settings"}) or {}
+            settings = await self.bot.settings.get("server_settings") or {}
 
             embed = discord.Embed(
                 title="🏠 Server Instellingen",
@@ -326,17 +340,15 @@ class ServerConfigView(BaseConfigView):
         """Toggle webhook logging format between embed and plaintext."""
         try:
             # Get current settings
-            settings = await self.bot.db.settings.find_one({"_id": "server_settings"}) or {}
+            settings = await self.bot.settings.get("server_settings") or {}
             current_format = settings.get("webhook_log_format", "embed")
 
             # Toggle format
             new_format = "plaintext" if current_format == "embed" else "embed"
 
             # Update database
-            await self.bot.db.settings.update_one(
-                {"_id": "server_settings"},
-                {"$set": {"webhook_log_format": new_format}},
-                upsert=True,
+            await self.bot.settings.update_one(
+                "server_settings", {"$set": {"webhook_log_format": new_format}}
             )
 
             # Create confirmation embed
@@ -392,7 +404,7 @@ class ServerConfigView(BaseConfigView):
         """Send test messages to demonstrate current webhook logging format."""
         try:
             # Get current format
-            settings = await self.bot.db.settings.find_one({"_id": "server_settings"}) or {}
+            settings = await self.bot.settings.get("server_settings") or {}
             current_format = settings.get("webhook_log_format", "embed")
 
             # Send test log messages
@@ -441,7 +453,7 @@ class ModmailConfigView(BaseConfigView):
     async def create_embed(self):
         """Create modmail configuration embed."""
         self.settings_id = "baseconfig"
-        settings = await self.bot.db.settings.find_one({"_id": "modmail_settings"}) or {}
+        settings = await self.bot.settings.get("modmail_settings") or {}
 
         embed = discord.Embed(
             title="📧 Modmail Instellingen",
@@ -512,7 +524,7 @@ class ConfessionsConfigView(BaseConfigView):
     async def create_embed(self):
         """Create confessions configuration embed."""
         self.settings_id = "baseconfig"
-        settings = await self.bot.db.settings.find_one({"_id": "confession_settings"}) or {}
+        settings = await self.bot.settings.get("confession_settings") or {}
 
         embed = discord.Embed(
             title="🤫 Confessions Instellingen",
@@ -606,7 +618,7 @@ class ReportsConfigView(BaseConfigView):
     async def create_embed(self):
         """Create reports configuration embed."""
         self.settings_id = "baseconfig"
-        settings = await self.bot.db.settings.find_one({"_id": "reports_settings"}) or {}
+        settings = await self.bot.settings.get("reports_settings") or {}
 
         embed = discord.Embed(
             title="🚨 Reports Instellingen",
@@ -679,7 +691,7 @@ class VerificationConfigView(BaseConfigView):
     async def create_embed(self):
         """Create verification configuration embed."""
         self.settings_id = "baseconfig"
-        settings = await self.bot.db.settings.find_one({"_id": "verification_settings"}) or {}
+        settings = await self.bot.settings.get("verification_settings") or {}
 
         embed = discord.Embed(
             title="✅ Verificatie Instellingen",
@@ -851,8 +863,8 @@ class ChannelSelectView(BaseConfigView):
             else:
                 self.bot.log.warning(f"Selected channel {channel_id} not found in bot cache")
 
-            await self.bot.db.settings.update_one(
-                {"_id": self.settings_id}, {"$set": {self.field_name: channel_id}}, upsert=True
+            await self.bot.settings.update_one(
+                self.settings_id, {"$set": {self.field_name: channel_id}}
             )
 
             self.bot.log.info(
@@ -930,9 +942,7 @@ class RoleSelectView(discord.ui.View):
         role = interaction.data["values"][0]
         role_id = int(role)
 
-        await self.bot.db.settings.update_one(
-            {"_id": self.settings_id}, {"$set": {self.field_name: role_id}}, upsert=True
-        )
+        await self.bot.settings.update_one(self.settings_id, {"$set": {self.field_name: role_id}})
 
         # Return to appropriate config view
         if self.settings_id == "reports_settings":
@@ -982,9 +992,7 @@ class GuildIdModal(discord.ui.Modal):
         try:
             guild_id = int(self.guild_id_input.value)
 
-            await self.bot.db.settings.update_one(
-                {"_id": "server_settings"}, {"$set": {"guild_id": guild_id}}, upsert=True
-            )
+            await self.bot.settings.update_one("server_settings", {"$set": {"guild_id": guild_id}})
 
             view = ServerConfigView(self.bot, self.user_id, self.visible)
             embed = await view.create_embed()
@@ -1043,8 +1051,8 @@ class ConfessionTimesModal(discord.ui.Modal):
                 raise ValueError("At least one post time required")
 
             # Update database
-            await self.bot.db.settings.update_one(
-                {"_id": "confession_settings"},
+            await self.bot.settings.update_one(
+                "confession_settings",
                 {
                     "$set": {
                         "review_time": formatted_review_time,
@@ -1052,7 +1060,6 @@ class ConfessionTimesModal(discord.ui.Modal):
                         "daily_review_limit": len(formatted_post_times),
                     }
                 },
-                upsert=True,
             )
 
             # Update schedules if confession tasks exist
@@ -1082,7 +1089,7 @@ class ExamResultsConfigView(BaseConfigView):
         self.settings_id = "baseconfig"
         try:
             self.bot.log.debug("Creating exam results configuration embed")
-            settings = await self.bot.db.settings.find_one({"_id": "exam_results_settings"}) or {}
+            settings = await self.bot.settings.get("exam_results_settings") or {}
             self.bot.log.debug(f"Retrieved exam_results_settings: {settings}")
 
             embed = discord.Embed(
@@ -1156,10 +1163,8 @@ class ExamDateModal(discord.ui.Modal):
             date_value = self.date_input.value.strip()
 
             if date_value:
-                await self.bot.db.settings.update_one(
-                    {"_id": "exam_results_settings"},
-                    {"$set": {"exam_result_date": date_value}},
-                    upsert=True,
+                await self.bot.settings.update_one(
+                    "exam_results_settings", {"$set": {"exam_result_date": date_value}}
                 )
 
                 success_embed = discord.Embed(
@@ -1170,10 +1175,8 @@ class ExamDateModal(discord.ui.Modal):
                 await interaction.response.send_message(embed=success_embed, ephemeral=True)
             else:
                 # Remove date if empty
-                await self.bot.db.settings.update_one(
-                    {"_id": "exam_results_settings"},
-                    {"$unset": {"exam_result_date": ""}},
-                    upsert=True,
+                await self.bot.settings.update_one(
+                    "exam_results_settings", {"$unset": {"exam_result_date": ""}}
                 )
 
                 success_embed = discord.Embed(
@@ -1230,8 +1233,8 @@ class UnbanUrlModal(discord.ui.Modal):
                     )
                     return
 
-                await self.bot.db.settings.update_one(
-                    {"_id": "mod_settings"}, {"$set": {"unban_request_url": url_value}}, upsert=True
+                await self.bot.settings.update_one(
+                    "mod_settings", {"$set": {"unban_request_url": url_value}}
                 )
 
                 success_embed = discord.Embed(
@@ -1242,8 +1245,8 @@ class UnbanUrlModal(discord.ui.Modal):
                 await interaction.response.send_message(embed=success_embed, ephemeral=True)
             else:
                 # Remove URL if empty
-                await self.bot.db.settings.update_one(
-                    {"_id": "mod_settings"}, {"$unset": {"unban_request_url": ""}}, upsert=True
+                await self.bot.settings.update_one(
+                    "mod_settings", {"$unset": {"unban_request_url": ""}}
                 )
 
                 success_embed = discord.Embed(
@@ -1485,9 +1488,7 @@ class AddCategoryModal(discord.ui.Modal):
             categories.append({"name": category_name, "roles": []})
 
             # Save to database
-            await self.bot.db.role_selector.update_one(
-                {"_id": "categories"}, {"$set": {"categories": categories}}, upsert=True
-            )
+            await save_role_categories(self.bot, categories)
 
             # Update role menu if it exists
             role_selector_cog = self.bot.get_cog("RoleSelector")
@@ -1554,9 +1555,7 @@ class RemoveCategoryModal(discord.ui.Modal):
                 return
 
             # Save to database
-            await self.bot.db.role_selector.update_one(
-                {"_id": "categories"}, {"$set": {"categories": categories}}, upsert=True
-            )
+            await save_role_categories(self.bot, categories)
 
             # Update role menu if it exists
             role_selector_cog = self.bot.get_cog("RoleSelector")
@@ -1675,9 +1674,7 @@ class AddRoleModal(discord.ui.Modal):
                 return
 
             # Save to database
-            await self.bot.db.role_selector.update_one(
-                {"_id": "categories"}, {"$set": {"categories": categories}}, upsert=True
-            )
+            await save_role_categories(self.bot, categories)
 
             # Update role menu if it exists
             role_selector_cog = self.bot.get_cog("RoleSelector")
@@ -1763,9 +1760,7 @@ class RemoveRoleModal(discord.ui.Modal):
                 return
 
             # Save to database
-            await self.bot.db.role_selector.update_one(
-                {"_id": "categories"}, {"$set": {"categories": categories}}, upsert=True
-            )
+            await save_role_categories(self.bot, categories)
 
             # Update role menu if it exists
             role_selector_cog = self.bot.get_cog("RoleSelector")
@@ -1798,7 +1793,7 @@ class UnbanRequestsConfigView(BaseConfigView):
         self.settings_id = "baseconfig"
         try:
             self.bot.log.debug("Creating unban requests configuration embed")
-            settings = await self.bot.db.settings.find_one({"_id": "mod_settings"}) or {}
+            settings = await self.bot.settings.get("mod_settings") or {}
             self.bot.log.debug(f"Retrieved mod_settings for unban requests: {settings}")
 
             embed = discord.Embed(
@@ -2080,7 +2075,7 @@ class UnbanRequestsConfigView(BaseConfigView):
     ):
         """Setup the unban request message."""
         try:
-            settings = await self.bot.db.settings.find_one({"_id": "mod_settings"}) or {}
+            settings = await self.bot.settings.get("mod_settings") or {}
 
             unban_request_kanaal_id = settings.get("unban_request_kanaal_id")
             aanvragen_log_kanaal_id_1 = settings.get("aanvragen_log_kanaal_id_1")
@@ -2155,7 +2150,7 @@ class JobInfoConfigView(BaseConfigView):
 
     async def create_embed(self):
         self.settings_id = "baseconfig"
-        settings = await self.bot.db.settings.find_one({"_id": "job_info_settings"}) or {}
+        settings = await self.bot.settings.get("job_info_settings") or {}
 
         embed = discord.Embed(
             title="💼 Job Info Instellingen",
@@ -2197,7 +2192,7 @@ class JobInfoConfigView(BaseConfigView):
     @discord.ui.button(label="Setup bericht sturen", style=discord.ButtonStyle.success, emoji="📝")
     async def send_setup(self, interaction: discord.Interaction, button: discord.ui.Button):
         """Stuur een setup bericht naar het ingestelde kanaal."""
-        settings = await self.bot.db.settings.find_one({"_id": "job_info_settings"}) or {}
+        settings = await self.bot.settings.get("job_info_settings") or {}
         channel_id = settings.get("job_info_channel_id")
 
         if not channel_id:
@@ -32,7 +32,7 @@ class AddDeveloperModal(discord.ui.Modal):
                 return
 
             # Get current developer IDs
-            settings = await self.bot.db.settings.find_one({"_id": "server_settings"}) or {}
+            settings = await self.bot.settings.get("server_settings") or {}
             dev_ids = settings.get("developer_ids", [])
 
             if dev_id in dev_ids:
@@ -55,8 +55,8 @@ class AddDeveloperModal(discord.ui.Modal):
             # Add the new developer
             dev_ids.append(dev_id)
 
-            await self.bot.db.settings.update_one(
-                {"_id": "server_settings"}, {"$set": {"developer_ids": dev_ids}}, upsert=True
+            await self.bot.settings.update_one(
+                "server_settings", {"$set": {"developer_ids": dev_ids}}
             )
 
             embed = discord.Embed(
@@ -121,7 +121,7 @@ class RemoveDeveloperSelect(discord.ui.Select):
         """Handle developer removal."""
         try:
             # Get current developer IDs
-            settings = await self.bot.db.settings.find_one({"_id": "server_settings"}) or {}
+            settings = await self.bot.settings.get("server_settings") or {}
             dev_ids = settings.get("developer_ids", [])
 
             # Remove selected developers
@@ -143,8 +143,8 @@ class RemoveDeveloperSelect(discord.ui.Select):
                 return
 
             # Update database
-            await self.bot.db.settings.update_one(
-                {"_id": "server_settings"}, {"$set": {"developer_ids": dev_ids}}, upsert=True
+            await self.bot.settings.update_one(
+                "server_settings", {"$set": {"developer_ids": dev_ids}}
             )
 
             embed = discord.Embed(
@@ -208,7 +208,7 @@ class DeveloperManagementView(discord.ui.View):
     async def create_embed(self):
         """Create the developer management embed."""
         try:
-            settings = await self.bot.db.settings.find_one({"_id": "server_settings"}) or {}
+            settings = await self.bot.settings.get("server_settings") or {}
             dev_ids = settings.get("developer_ids", [])
 
             embed = discord.Embed(
@@ -267,7 +267,7 @@ class DeveloperManagementView(discord.ui.View):
         """Show dropdown to remove developers."""
         try:
             # Get current developer IDs
-            settings = await self.bot.db.settings.find_one({"_id": "server_settings"}) or {}
+            settings = await self.bot.settings.get("server_settings") or {}
             dev_ids = settings.get("developer_ids", [])
 
             if not dev_ids:
@@ -54,6 +54,36 @@ class AdminCommands(commands.Cog, name="AdminCommands"):
         await asyncio.sleep(2)
         await self.bot.close()
 
+    @commands.command(name="mongostats", help="Toon de traagste MongoDB operaties.")
+    @commands.guild_only()
+    @developer()
+    async def mongostats(self, ctx: commands.Context, limit: int = 15):
+        """Percentielen (ms) per collectie/operatie over de laatste metingen, plus collection scans."""
+        monitor = self.bot.mongo_monitor
+        rows = monitor.summary(limit)
+        if not rows:
+            await ctx.send("Nog geen MongoDB operaties gemeten.")
+            return
+
+        lines = [
+            f"{'collectie':<22} {'operatie':<14} {'aantal':>7} {'p50':>7} {'p95':>7} {'p99':>7} {'max':>7}"
+        ]
+        for collection, operation, count, p50, p95, p99, slowest in rows:
+            lines.append(
+                f"{collection[:22]:<22} {operation[:14]:<14} {count:>7} "
+                f"{p50:>7.1f} {p95:>7.1f} {p99:>7.1f} {slowest:>7.1f}"
+            )
+        message = f"Trage operaties (≥ {monitor.slow_ms} ms): {monitor.slow_count}\n```\n"
+        message += "\n".join(lines) + "\n```"
+
+        if monitor.collscans:
+            scans = [
+                f"- {shape} ({caller or 'onbekend'})" for shape, caller in monitor.collscans.items()
+            ]
+            message += "\n**Collection scans:**\n" + "\n".join(scans)
+
+        await ctx.send(message[:2000])
+
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(AdminCommands(bot))
@@ -14,7 +14,7 @@ class examresults(commands.Cog, name="when_exam_results"):
         description="When are the exam results published?",
     )
     async def examResults(self, interaction: discord.Interaction):
-        settings = await self.db.settings.find_one({"_id": self.settings_id})
+        settings = await self.bot.settings.get(self.settings_id)
         if settings and "exam_result_date" in settings:
             exam_result_date = settings["exam_result_date"]
         else:
@@ -22,7 +22,7 @@ class JobInfoModal(ui.Modal, title="💼 Deel je job ervaring"):
 
     async def on_submit(self, interaction: discord.Interaction):
         # Haal het ingestelde kanaal op uit de database
-        settings = await self.bot.db.settings.find_one({"_id": "job_info_settings"}) or {}
+        settings = await self.bot.settings.get("job_info_settings") or {}
         channel_id = settings.get("job_info_channel_id")
         if not channel_id:
             await interaction.response.send_message(
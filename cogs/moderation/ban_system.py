@@ -34,7 +34,7 @@ class BanSystem:
 
             # Mogelijke unban aanvraag knop
             view = discord.ui.View()
-            settings = await self.bot.db.settings.find_one({"_id": "mod_settings"})
+            settings = await self.bot.settings.get("mod_settings")
             unban_request_url = (
                 settings.get("unban_request_url", "https://example.com/unban_request")
                 if settings
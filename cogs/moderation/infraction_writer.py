@@ -0,0 +1,171 @@
+import asyncio
+import logging
+from typing import Dict, List, Tuple
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+
+from utils.infraction_counts import COUNTS_COLLECTION, count_id, update_infraction_counts
+
+logger = logging.getLogger(__name__)
+
+FLUSH_SIZE = 50  # flush as soon as this many infractions are buffered
+FLUSH_INTERVAL = 2.0  # flush buffered infractions at least this often (seconds)
+MAX_BUFFER = 1000  # `add` waits until the buffer is written when it is this full
+DUPLICATE_KEY = 11000
+
+
+class InfractionWriter:
+    """
+    Write-behind buffer for infraction documents.
+
+    `add` gives every document its `_id` up front and returns a future that resolves to
+    that ID once the document is in MongoDB, so callers don't wait for the insert.
+    Buffered documents are written with one `insert_many(ordered=False)` when FLUSH_SIZE
+    is reached or every FLUSH_INTERVAL seconds. Failed writes stay buffered and are
+    retried on the next flush; while MAX_BUFFER infractions are waiting, `add` blocks
+    until MongoDB accepts them again instead of dropping any.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self._buffer: List[Tuple[dict, asyncio.Future]] = []
+        self._lock = asyncio.Lock()
+        self._task = None
+        self._flush_tasks = set()
+
+    @property
+    def lock(self) -> asyncio.Lock:
+        """
+        Held while a batch is written and its counters are updated. Hold it to change
+        infractions or counters without a flush landing in between.
+        """
+        return self._lock
+
+    async def add(self, document: dict) -> asyncio.Future:
+        """Buffer an infraction and return a future for its `_id`."""
+        while len(self._buffer) >= MAX_BUFFER:
+            await self.flush()
+            if len(self._buffer) >= MAX_BUFFER:
+                # The writes failed: wait for MongoDB rather than grow or drop the buffer
+                await asyncio.sleep(FLUSH_INTERVAL)
+
+        document.setdefault("_id", ObjectId())
+        future = asyncio.get_running_loop().create_future()
+        self._buffer.append((document, future))
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        if len(self._buffer) >= FLUSH_SIZE:
+            task = asyncio.create_task(self.flush())
+            self._flush_tasks.add(task)
+            task.add_done_callback(self._flush_done)
+        return future
+
+    def _flush_done(self, task: asyncio.Task):
+        self._flush_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Infraction flush failed", exc_info=task.exception())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            if self._buffer:
+                await self.flush()
+
+    async def flush(self):
+        """Write every buffered infraction now."""
+        async with self._lock:
+            if not self._buffer:
+                return
+            batch, self._buffer = self._buffer, []
+
+            failed = set()
+            try:
+                await self.collection.insert_many([doc for doc, _ in batch], ordered=False)
+            except BulkWriteError as e:
+                for error in e.details.get("writeErrors", []):
+                    # A duplicate _id means an earlier attempt already wrote it
+                    if error.get("code") != DUPLICATE_KEY:
+                        failed.add(error["index"])
+                        logger.error(f"Failed to write infraction: {error.get('errmsg')}")
+            except Exception as e:
+                logger.error(f"Failed to write {len(batch)} infraction(s), will retry: {e}")
+                failed = set(range(len(batch)))
+
+            retry = []
+            written = []
+            for index, (document, future) in enumerate(batch):
+                if index in failed:
+                    retry.append((document, future))
+                    continue
+                written.append(document)
+                if not future.done():
+                    future.set_result(document["_id"])
+
+            try:
+                await update_infraction_counts(self.collection, written)
+            except Exception as e:
+                logger.error(f"Failed to update infraction counts: {e}")
+
+            # Keep failed writes in front of newer ones
+            self._buffer = retry + self._buffer
+
+    async def close(self):
+        """Stop the timer and write everything that is still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        # Size-triggered flushes that are still writing
+        tasks, self._flush_tasks = self._flush_tasks, set()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.flush()
+        for document, future in self._buffer:
+            logger.error(f"Infraction not written at shutdown: {document}")
+            if not future.done():
+                future.set_exception(RuntimeError(f"Infraction {document['_id']} not written"))
+                # Most callers never await the future; mark the exception as retrieved so
+                # asyncio doesn't report it a second time
+                future.exception()
+        self._buffer = []
+
+
+_writers: Dict[str, InfractionWriter] = {}
+
+
+def get_infraction_writer(collection) -> InfractionWriter:
+    """Return the shared writer of an infractions collection."""
+    writer = _writers.get(collection.full_name)
+    if writer is None:
+        writer = _writers[collection.full_name] = InfractionWriter(collection)
+    return writer
+
+
+async def close_infraction_writers():
+    """Flush and stop every infraction writer (used on shutdown)."""
+    await asyncio.gather(*(writer.close() for writer in _writers.values()))
+
+
+async def get_infraction_counts(collection, guild_id: int, user_id: int) -> dict:
+    """Return the counter document of a user: {"total": int, "types": {type: int}}."""
+    counts = collection.database[COUNTS_COLLECTION]
+    document = await counts.find_one({"_id": count_id(guild_id, user_id)})
+    if document is not None:
+        return document
+
+    # Seed under the writer's lock: a flush (insert + $inc) between the aggregate and the
+    # seed would otherwise be missed or counted twice. $setOnInsert keeps a counter that
+    # someone else seeded first.
+    async with get_infraction_writer(collection).lock:
+        pipeline = [
+            {"$match": {"guild_id": guild_id, "user_id": user_id}},
+            {"$group": {"_id": "$type", "count": {"$sum": 1}}},
+        ]
+        types = {row["_id"]: row["count"] async for row in collection.aggregate(pipeline)}
+        return await counts.find_one_and_update(
+            {"_id": count_id(guild_id, user_id)},
+            {"$setOnInsert": {"total": sum(types.values()), "types": types}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
@@ -4,21 +4,55 @@ import re
 import time
 
 import discord
-import pymongo
 from bson import ObjectId
 from discord import app_commands
 from discord.ext import commands
+from discord.http import Route
 
 from utils.checks import is_council, is_moderator
+from utils.indexes import index_registry
+from utils.infraction_counts import update_infraction_counts
+from utils.ratelimit import SLOW_REQUEST, AdaptiveLimit, bucket_limit
 from utils.timezone import LOCAL_TIMEZONE, to_local
 
 from .ban_system import BanSystem
+from .infraction_writer import (
+    get_infraction_counts,
+    get_infraction_writer,
+)
 from .moderation_tasks import ModerationTasks
-from .moderation_utils import create_dm_embed, log_infraction, parse_duration, send_dm_embed
+from .moderation_utils import (
+    HISTORY_INDEX,
+    HISTORY_SORT,
+    create_dm_embed,
+    fetch_history_page,
+    log_infraction,
+    parse_duration,
+    send_dm_embed,
+)
+from .moderation_views import HistoryView
 from .mute_system import MuteSystem
 from .timeout_system import TimeoutSystem
 
 MAX_PURGE = 100  # Discord limit
+# Bulk delete rejects messages older than 14 days; keep a margin for the time the purge takes
+BULK_DELETE_MAX_AGE = datetime.timedelta(days=14) - datetime.timedelta(minutes=5)
+PURGE_PROGRESS_INTERVAL = 3.0  # seconds between progress updates of /purge_below
+HISTORY_PAGE_SIZE = 10
+
+# /history, mute lookups and the unban request form filter on guild + user
+index_registry.index("infractions", HISTORY_INDEX, name="guild_user_timestamp")
+index_registry.query("infractions", {"guild_id": 0, "user_id": 0}, HISTORY_SORT)
+# Only migrated warns have an old_warn_id (looked up by migrate.py)
+index_registry.index("infractions", "old_warn_id", sparse=True)
+index_registry.query("infractions", {"old_warn_id": 0})
+# Scheduled expiries are replaced/cancelled per member and ordered by their due time
+index_registry.index("scheduled_unmutes", [("guild_id", 1), ("user_id", 1)])
+index_registry.index("scheduled_unmutes", "unmute_at")
+index_registry.query("scheduled_unmutes", {"guild_id": 0, "user_id": 0})
+index_registry.index("scheduled_bans", [("guild_id", 1), ("user_id", 1)])
+index_registry.index("scheduled_bans", "unban_at")
+index_registry.query("scheduled_bans", {"guild_id": 0, "user_id": 0})
 
 
 class ModCommands(commands.Cog, name="ModCommands"):
@@ -30,7 +64,6 @@ class ModCommands(commands.Cog, name="ModCommands"):
         """Initialiseert de ModCommands cog."""
         self.bot = bot
         self.infractions_collection = self.bot.db["infractions"]
-        self.settings_collection = self.bot.db["settings"]
         self.scheduled_unmutes_collection = self.bot.db["scheduled_unmutes"]
         self.scheduled_bans_collection = self.bot.db["scheduled_bans"]
 
@@ -245,15 +278,24 @@ class ModCommands(commands.Cog, name="ModCommands"):
                 )
                 return
 
-            # Verwijder de specifieke warn
-            result = await self.infractions_collection.delete_one(
-                {
-                    "_id": warn_object_id,
-                    "guild_id": interaction.guild.id,
-                    "user_id": member.id,
-                    "type": "warn",
-                }
-            )
+            # Verwijder de specifieke warn (ook als die nog gebufferd was)
+            writer = get_infraction_writer(self.infractions_collection)
+            await writer.flush()
+            async with writer.lock:
+                result = await self.infractions_collection.delete_one(
+                    {
+                        "_id": warn_object_id,
+                        "guild_id": interaction.guild.id,
+                        "user_id": member.id,
+                        "type": "warn",
+                    }
+                )
+                if result.deleted_count:
+                    await update_infraction_counts(
+                        self.infractions_collection,
+                        [{"guild_id": interaction.guild.id, "user_id": member.id, "type": "warn"}],
+                        delta=-1,
+                    )
 
             if result.deleted_count == 0:
                 await interaction.response.send_message(
@@ -333,15 +375,34 @@ class ModCommands(commands.Cog, name="ModCommands"):
     @is_council()
     @app_commands.describe(user="De gebruiker om de voorgaande straffen van te bekijken")
     async def history(self, interaction: discord.Interaction, user: discord.User):
-        infractions = (
-            await self.infractions_collection.find(
-                {"guild_id": interaction.guild.id, "user_id": user.id}
+        # Include infractions that are still buffered
+        await get_infraction_writer(self.infractions_collection).flush()
+        guild = interaction.guild
+        counts = await get_infraction_counts(self.infractions_collection, guild.id, user.id)
+
+        async def fetch_page(after, limit):
+            return await fetch_history_page(
+                self.infractions_collection, guild.id, user.id, after, limit
             )
-            .sort("timestamp", pymongo.DESCENDING)
-            .limit(10)
-            .to_list(length=None)
-        )
 
+        def render_page(infractions, page):
+            return self._build_history_embed(guild, user, infractions, counts, page)
+
+        view = HistoryView(interaction.user, fetch_page, render_page, HISTORY_PAGE_SIZE)
+        embed = await view.load(0)
+        if view.has_next:
+            await interaction.response.send_message(embed=embed, view=view)
+        else:
+            await interaction.response.send_message(embed=embed)
+
+    def _build_history_embed(
+        self,
+        guild: discord.Guild,
+        user: discord.User,
+        infractions: list,
+        counts: dict,
+        page: int,
+    ) -> discord.Embed:
         # Dutch translations for infraction types
         infraction_translations = {
             "kick": "Kick",
@@ -379,14 +440,11 @@ class ModCommands(commands.Cog, name="ModCommands"):
             # Get moderator info if available
             moderator_info = ""
             if "moderator_id" in infraction:
-                try:
-                    moderator = interaction.guild.get_member(infraction["moderator_id"])
-                    if moderator:
-                        moderator_info = f" door {moderator.mention}"
-                    else:
-                        moderator_info = f" door <@{infraction['moderator_id']}>"
-                except Exception:
-                    moderator_info = ""
+                moderator = guild.get_member(infraction["moderator_id"])
+                if moderator:
+                    moderator_info = f" door {moderator.mention}"
+                else:
+                    moderator_info = f" door <@{infraction['moderator_id']}>"
 
             infraction_list += (
                 f"ID: `{str(infraction['_id'])}`\n"
@@ -399,7 +457,7 @@ class ModCommands(commands.Cog, name="ModCommands"):
             infraction_list = "Geen voorgaande straffen gevonden voor deze gebruiker."
 
         # Check of user nog lid is
-        member = interaction.guild.get_member(user.id)
+        member = guild.get_member(user.id)
 
         embed = discord.Embed(
             title=f"Strafgeschiedenis voor {user.name}",
@@ -407,6 +465,16 @@ class ModCommands(commands.Cog, name="ModCommands"):
             description=infraction_list,
         )
 
+        if counts.get("total"):
+            per_type = ", ".join(
+                f"{infraction_translations.get(t, t.capitalize())}: {n}"
+                for t, n in sorted(counts.get("types", {}).items())
+                if n > 0
+            )
+            embed.add_field(
+                name="Totaal", value=f"{counts['total']} straffen ({per_type})", inline=False
+            )
+
         if member and member.joined_at:
             embed.add_field(
                 name="Lid Sinds",
@@ -415,7 +483,9 @@ class ModCommands(commands.Cog, name="ModCommands"):
             )
 
         embed.set_thumbnail(url=user.avatar.url if user.avatar else user.default_avatar.url)
-        await interaction.response.send_message(embed=embed)
+        pages = max(1, -(-counts.get("total", 0) // HISTORY_PAGE_SIZE))
+        embed.set_footer(text=f"Pagina {page + 1}/{pages}")
+        return embed
 
     @app_commands.command(name="purge", description="Purge messages from the channel.")
     @is_council()
@@ -466,6 +536,40 @@ class ModCommands(commands.Cog, name="ModCommands"):
         except discord.HTTPException as e:
             await interaction.followup.send(f"❌ Purge mislukt: {e}", ephemeral=True)
 
+    async def _delete_individually(self, channel, message_ids, on_deleted):
+        """
+        Delete messages one request each (needed for messages older than 14 days), with as
+        many requests in flight as the channel's rate limit bucket allows.
+        """
+        route = Route(
+            "DELETE",
+            "/channels/{channel_id}/messages/{message_id}",
+            channel_id=channel.id,
+            message_id=0,
+        )
+        limit = AdaptiveLimit()
+
+        async def delete(message_id: int):
+            started = time.monotonic()
+            throttled = False
+            try:
+                await channel.get_partial_message(message_id).delete()
+                on_deleted()
+            except discord.NotFound:
+                on_deleted()  # already gone
+            except discord.HTTPException as e:
+                throttled = e.status == 429
+                self.bot.log.warning(f"Could not delete message {message_id} in {channel}: {e}")
+            finally:
+                throttled = throttled or time.monotonic() - started >= SLOW_REQUEST
+                await limit.release(throttled, bucket_limit(self.bot.http, route))
+
+        tasks = []
+        for message_id in message_ids:
+            await limit.acquire()
+            tasks.append(asyncio.create_task(delete(message_id)))
+        await asyncio.gather(*tasks)
+
     @app_commands.command(
         name="purge_below", description="Verwijder alle berichten onder een specifiek bericht."
     )
@@ -499,31 +603,67 @@ class ModCommands(commands.Cog, name="ModCommands"):
             # Haal het bericht op
             target_message = await channel.fetch_message(message_id)
 
-            # Verzamel alle berichten onder het doelbericht
-            messages_to_delete = []
-            async for msg in channel.history(limit=None, oldest_first=False):
-                if msg.id == target_message.id:
-                    break
-                messages_to_delete.append(msg)
+            # Verzamel enkel de ID's van alle berichten onder het doelbericht
+            message_ids = [
+                msg.id
+                async for msg in channel.history(
+                    limit=None, after=target_message, oldest_first=True
+                )
+            ]
 
-            if not messages_to_delete:
+            if not message_ids:
                 await interaction.followup.send(
                     "⚠️ Geen berichten gevonden om te verwijderen.", ephemeral=True
                 )
                 return
 
-            # Chunk delete
-            MAX_PURGE = 100
-            while messages_to_delete:
-                chunk = messages_to_delete[:MAX_PURGE]
-                del messages_to_delete[:MAX_PURGE]
-
-                await channel.delete_messages(chunk)
-                await asyncio.sleep(1)  # rate limit bescherming
+            # Bulk delete only accepts messages younger than 14 days
+            cutoff = discord.utils.time_snowflake(discord.utils.utcnow() - BULK_DELETE_MAX_AGE)
+            recent = [i for i in message_ids if i > cutoff]
+            old = [i for i in message_ids if i <= cutoff]
+            deleted = 0
+
+            async def report_progress():
+                while True:
+                    await asyncio.sleep(PURGE_PROGRESS_INTERVAL)
+                    try:
+                        await interaction.edit_original_response(
+                            content=f"🗑️ {deleted}/{len(message_ids)} berichten verwijderd..."
+                        )
+                    except discord.HTTPException:
+                        pass
+
+            def on_deleted():
+                nonlocal deleted
+                deleted += 1
+
+            reporter = asyncio.create_task(report_progress())
+            try:
+                for start in range(0, len(recent), MAX_PURGE):
+                    chunk = recent[start : start + MAX_PURGE]
+                    try:
+                        await channel.delete_messages([discord.Object(id=i) for i in chunk])
+                        deleted += len(chunk)
+                    except discord.Forbidden:
+                        raise
+                    except discord.HTTPException as e:
+                        # E.g. messages that turned 14 days old in the meantime
+                        self.bot.log.warning(f"Bulk delete in {channel} failed: {e}")
+                        old.extend(chunk)
+
+                if old:
+                    await self._delete_individually(channel, old, on_deleted)
+            finally:
+                reporter.cancel()
+
+            msg = f"✅ {deleted} berichten verwijderd onder het geselecteerde bericht."
+            if deleted < len(message_ids):
+                msg += f"\n⚠️ {len(message_ids) - deleted} berichten konden niet verwijderd worden."
+            await interaction.edit_original_response(content=msg)
 
+        except discord.Forbidden:
             await interaction.followup.send(
-                f"✅ {len(messages_to_delete)} berichten verwijderd onder het geselecteerde bericht.",
-                ephemeral=True,
+                "❌ Ik heb geen permissies om berichten te verwijderen.", ephemeral=True
             )
 
         except Exception as e:
@@ -1,12 +1,166 @@
 import asyncio
 import datetime
+import heapq
+import itertools
 
 import discord
 
-from utils.timezone import LOCAL_TIMEZONE
+from utils.timezone import LOCAL_TIMEZONE, UTC_TIMEZONE
 
 from .moderation_utils import log_infraction
 
+RETRY_DELAY = 60  # seconds before a failed expiry is tried again
+MAX_SLEEP = 3600  # re-check the clock at least once an hour
+
+
+def _as_utc(dt: datetime.datetime) -> datetime.datetime:
+    """MongoDB returns naive UTC datetimes; make them timezone-aware."""
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=UTC_TIMEZONE)
+    return dt.astimezone(UTC_TIMEZONE)
+
+
+class ExpiryScheduler:
+    """
+    In-memory min-heap of upcoming expiries for one scheduled_* collection.
+
+    The collection is read once at startup; afterwards the heap is kept up to date by
+    `add`/`remove`, so the worker sleeps until exactly the next expiry instead of polling.
+    Due entries are handed to `process_batch` together, processed documents are removed
+    with a single `delete_many`.
+    """
+
+    def __init__(self, bot, collection, time_field: str, process_batch, name: str):
+        self.bot = bot
+        self.collection = collection
+        self.time_field = time_field
+        self.process_batch = process_batch
+        self.name = name
+
+        # (guild_id, user_id) -> scheduled document; the heap may hold stale entries
+        self.entries = {}
+        self._heap = []
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._loaded = asyncio.Event()
+        self.task = None
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self.task and not self.task.done():
+            self.task.cancel()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, guild_id: int, user_id: int):
+        """Return the scheduled document for a member, or None."""
+        return self.entries.get((guild_id, user_id))
+
+    def add(self, document: dict):
+        """Add (or replace) the scheduled document for a member and wake the worker."""
+        document[self.time_field] = _as_utc(document[self.time_field])
+        key = (document["guild_id"], document["user_id"])
+        self.entries[key] = document
+        self._push(key, document)
+
+    def remove(self, guild_id: int, user_id: int):
+        """Forget the scheduled document for a member; its heap entry is skipped later."""
+        if self.entries.pop((guild_id, user_id), None) is not None:
+            self._wakeup.set()
+
+    def _push(self, key, document, due: datetime.datetime = None):
+        due = due or document[self.time_field]
+        heapq.heappush(self._heap, (due, next(self._counter), key, document["_id"]))
+        self._wakeup.set()
+
+    async def _load(self):
+        documents = await self.collection.find({}).to_list(length=None)
+        for document in documents:
+            key = (document["guild_id"], document["user_id"])
+            current = self.entries.get(key)
+            # Keep whatever got scheduled while we were loading
+            if current is None:
+                self.add(document)
+        self.bot.log.info(f"Loaded {len(documents)} {self.name} into the scheduler")
+
+    def _pop_due(self, now: datetime.datetime) -> list:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, _, key, document_id = heapq.heappop(self._heap)
+            document = self.entries.get(key)
+            # Skip entries that were cancelled or replaced in the meantime
+            if document is None or document["_id"] != document_id:
+                continue
+            del self.entries[key]
+            due.append(document)
+        return due
+
+    def _seconds_until_next(self, now: datetime.datetime):
+        while self._heap:
+            due, _, key, document_id = self._heap[0]
+            document = self.entries.get(key)
+            if document is None or document["_id"] != document_id:
+                heapq.heappop(self._heap)
+                continue
+            return max(0.0, (due - now).total_seconds())
+        return None
+
+    async def _run(self):
+        await self.bot.wait_until_ready()
+
+        while not self._loaded.is_set():
+            try:
+                await self._load()
+                self._loaded.set()
+            except Exception as e:
+                self.bot.log.error(f"Failed to load {self.name}: {e}")
+                await asyncio.sleep(RETRY_DELAY)
+
+        while True:
+            try:
+                self._wakeup.clear()
+                delay = self._seconds_until_next(datetime.datetime.now(UTC_TIMEZONE))
+                if delay is None or delay > 0:
+                    try:
+                        await asyncio.wait_for(
+                            self._wakeup.wait(), timeout=min(delay or MAX_SLEEP, MAX_SLEEP)
+                        )
+                        continue
+                    except asyncio.TimeoutError:
+                        pass
+
+                due = self._pop_due(datetime.datetime.now(UTC_TIMEZONE))
+                if not due:
+                    continue
+
+                done_ids = await self.process_batch(due)
+                done_ids = set(done_ids)
+
+                if done_ids:
+                    await self.collection.delete_many({"_id": {"$in": list(done_ids)}})
+
+                # Don't remove from database if there was an error, try again later
+                retry_at = datetime.datetime.now(UTC_TIMEZONE) + datetime.timedelta(
+                    seconds=RETRY_DELAY
+                )
+                for document in due:
+                    if document["_id"] in done_ids:
+                        continue
+                    key = (document["guild_id"], document["user_id"])
+                    if key not in self.entries:
+                        self.entries[key] = document
+                        self._push(key, document, due=retry_at)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.bot.log.error(f"Error in {self.name} scheduler: {e}")
+                await asyncio.sleep(RETRY_DELAY)
+
 
 class ModerationTasks:
     """Handles background tasks for moderation operations."""
@@ -18,95 +172,89 @@ class ModerationTasks:
         self.scheduled_unmutes_collection = scheduled_unmutes_collection
         self.scheduled_unbans_collection = scheduled_unbans_collection
         self.infractions_collection = infractions_collection
-        self.unmute_task = None
-        self.unban_task = None
+        self.unmutes = ExpiryScheduler(
+            bot,
+            scheduled_unmutes_collection,
+            "unmute_at",
+            self.process_scheduled_unmutes,
+            "scheduled unmutes",
+        )
+        self.unbans = ExpiryScheduler(
+            bot,
+            scheduled_unbans_collection,
+            "unban_at",
+            self.process_scheduled_unbans,
+            "scheduled unbans",
+        )
 
     def start_unmute_checker(self):
-        """Start the background task to check for scheduled unmutes."""
-        if self.unmute_task is None or self.unmute_task.done():
-            self.unmute_task = asyncio.create_task(self.check_scheduled_unmutes())
+        """Start the background task that fires scheduled unmutes."""
+        self.unmutes.start()
 
     def stop_unmute_checker(self):
         """Stop the background task."""
-        if self.unmute_task and not self.unmute_task.done():
-            self.unmute_task.cancel()
-
-    async def check_scheduled_unmutes(self):
-        """Background task to check and process scheduled unmutes."""
-        while True:
-            try:
-                current_time = datetime.datetime.now(LOCAL_TIMEZONE)
+        self.unmutes.stop()
 
-                # Find all unmutes that should be processed
-                expired_unmutes = await self.scheduled_unmutes_collection.find(
-                    {"unmute_at": {"$lte": current_time}}
-                ).to_list(length=None)
+    async def process_scheduled_unmutes(self, expired_unmutes: list) -> list:
+        """Process a batch of expired unmutes and return the IDs that can be removed."""
+        done_ids = []
 
-                for unmute_data in expired_unmutes:
+        for unmute_data in expired_unmutes:
+            try:
+                guild = self.bot.get_guild(unmute_data["guild_id"])
+                if not guild:
+                    # Guild not found, remove the scheduled unmute
+                    done_ids.append(unmute_data["_id"])
+                    continue
+
+                member = guild.get_member(unmute_data["user_id"])
+                if not member:
+                    # Member not found, remove the scheduled unmute
+                    done_ids.append(unmute_data["_id"])
+                    continue
+
+                # Get muted role
+                muted_role = discord.utils.get(guild.roles, name="Muted")
+                if muted_role and muted_role in member.roles:
+                    # Remove muted role
+                    await member.remove_roles(muted_role, reason="Geplande unmute verlopen")
+
+                    # Send DM to user
                     try:
-                        guild = self.bot.get_guild(unmute_data["guild_id"])
-                        if not guild:
-                            # Guild not found, remove the scheduled unmute
-                            await self.scheduled_unmutes_collection.delete_one(
-                                {"_id": unmute_data["_id"]}
-                            )
-                            continue
-
-                        member = guild.get_member(unmute_data["user_id"])
-                        if not member:
-                            # Member not found, remove the scheduled unmute
-                            await self.scheduled_unmutes_collection.delete_one(
-                                {"_id": unmute_data["_id"]}
-                            )
-                            continue
-
-                        # Get muted role
-                        muted_role = discord.utils.get(guild.roles, name="Muted")
-                        if muted_role and muted_role in member.roles:
-                            # Remove muted role
-                            await member.remove_roles(muted_role, reason="Geplande unmute verlopen")
-
-                            # Send DM to user
-                            try:
-                                dm_embed = discord.Embed(
-                                    title="🔓 | Je bent automatisch geunmute.",
-                                    description=f"Je scheduled mute in {guild.name} is verlopen.",
-                                    color=discord.Color.green(),
-                                )
-                                await member.send(embed=dm_embed)
-                            except (discord.errors.Forbidden, discord.errors.HTTPException):
-                                pass  # Couldn't send DM, but that's okay
-
-                            # Log the automatic unmute
-                            try:
-                                await log_infraction(
-                                    self.infractions_collection,
-                                    guild.id,
-                                    member.id,
-                                    self.bot.user.id,
-                                    "auto_unmute",
-                                    f"Geplande unmute na {unmute_data.get('original_duration', 'onbekende duur')}",
-                                )
-                            except Exception as e:
-                                self.bot.log.error(f"Failed to log auto unmute infraction: {e}")
-
-                        # Remove the scheduled unmute from database
-                        await self.scheduled_unmutes_collection.delete_one(
-                            {"_id": unmute_data["_id"]}
+                        dm_embed = discord.Embed(
+                            title="🔓 | Je bent automatisch geunmute.",
+                            description=f"Je scheduled mute in {guild.name} is verlopen.",
+                            color=discord.Color.green(),
                         )
+                        await member.send(embed=dm_embed)
+                    except (discord.errors.Forbidden, discord.errors.HTTPException):
+                        pass  # Couldn't send DM, but that's okay
 
-                    except Exception as e:
-                        self.bot.log.error(
-                            f"Error processing scheduled unmute for user {unmute_data.get('user_id')}: {e}"
+                    # Log the automatic unmute
+                    try:
+                        await log_infraction(
+                            self.infractions_collection,
+                            guild.id,
+                            member.id,
+                            self.bot.user.id,
+                            "auto_unmute",
+                            f"Geplande unmute na {unmute_data.get('original_duration', 'onbekende duur')}",
                         )
-                        # Don't remove from database if there was an error, try again later
+                    except Exception as e:
+                        self.bot.log.error(f"Failed to log auto unmute infraction: {e}")
 
-                # Wait 60 seconds before checking again
-                await asyncio.sleep(60)
+                done_ids.append(unmute_data["_id"])
 
             except Exception as e:
-                self.bot.log.error(f"Error in scheduled unmute checker: {e}")
-                await asyncio.sleep(60)  # Wait before retrying
+                self.bot.log.error(
+                    f"Error processing scheduled unmute for user {unmute_data.get('user_id')}: {e}"
+                )
+
+        return done_ids
+
+    def get_scheduled_unmute(self, guild_id: int, user_id: int):
+        """Return the scheduled unmute for a member from memory, or None."""
+        return self.unmutes.get(guild_id, user_id)
 
     async def schedule_unmute(
         self,
@@ -133,90 +281,71 @@ class ModerationTasks:
 
         # Insert the new scheduled unmute
         await self.scheduled_unmutes_collection.insert_one(unmute_data)
+        self.unmutes.add(unmute_data)
 
     async def cancel_scheduled_unmute(self, guild_id: int, user_id: int):
         """Cancel a scheduled unmute for a user."""
+        self.unmutes.remove(guild_id, user_id)
         result = await self.scheduled_unmutes_collection.delete_many(
             {"guild_id": guild_id, "user_id": user_id}
         )
         return result.deleted_count > 0
 
     def start_unban_checker(self):
-        """Start the background task to check for scheduled unbans."""
-        if self.unban_task is None or self.unban_task.done():
-            self.unban_task = asyncio.create_task(self.check_scheduled_unbans())
+        """Start the background task that fires scheduled unbans."""
+        self.unbans.start()
 
     def stop_unban_checker(self):
         """Stop the background task."""
-        if self.unban_task and not self.unban_task.done():
-            self.unban_task.cancel()
+        self.unbans.stop()
 
-    async def check_scheduled_unbans(self):
-        """Background task to check and process scheduled unbans."""
-        while True:
-            try:
-                current_time = datetime.datetime.now(LOCAL_TIMEZONE)
+    async def process_scheduled_unbans(self, expired_unbans: list) -> list:
+        """Process a batch of expired unbans and return the IDs that can be removed."""
+        done_ids = []
 
-                expired_unbans = await self.scheduled_unbans_collection.find(
-                    {"unban_at": {"$lte": current_time}}
-                ).to_list(length=None)
-
-                for unban_data in expired_unbans:
-                    try:
-                        guild = self.bot.get_guild(unban_data["guild_id"])
-                        if not guild:
-                            await self.scheduled_unbans_collection.delete_one(
-                                {"_id": unban_data["_id"]}
-                            )
-                            continue
-
-                        user = await self.bot.fetch_user(unban_data["user_id"])
-                        if not user:
-                            await self.scheduled_unbans_collection.delete_one(
-                                {"_id": unban_data["_id"]}
-                            )
-                            continue
-
-                        try:
-                            await guild.unban(user, reason="Automatische unban na tijdelijke ban")
-                            self.bot.log.info(
-                                f"Auto-unban uitgevoerd voor {user} ({user.id}) in {guild.name}"
-                            )
-                        except discord.NotFound:
-                            self.bot.log.debug(f"User {user.id} is al unbanned in {guild.name}")
-                        except discord.Forbidden:
-                            self.bot.log.error(
-                                f"Geen permissie om {user.id} te unbannen in {guild.name}"
-                            )
-
-                        # Log de auto-unban
-                        try:
-                            await log_infraction(
-                                self.infractions_collection,
-                                guild.id,
-                                user.id,
-                                self.bot.user.id,
-                                "auto_unban",
-                                f"Geplande unban na {unban_data.get('original_duration', 'onbekende duur')}",
-                            )
-                        except Exception as e:
-                            self.bot.log.error(f"Failed to log auto unban infraction: {e}")
-
-                        # Verwijder uit DB
-                        await self.scheduled_unbans_collection.delete_one(
-                            {"_id": unban_data["_id"]}
-                        )
-
-                    except Exception as e:
-                        self.bot.log.error(
-                            f"Error processing scheduled unban for {unban_data.get('user_id')}: {e}"
-                        )
-
-                await asyncio.sleep(60)
+        for unban_data in expired_unbans:
+            try:
+                guild = self.bot.get_guild(unban_data["guild_id"])
+                if not guild:
+                    done_ids.append(unban_data["_id"])
+                    continue
+
+                user = await self.bot.fetch_user(unban_data["user_id"])
+                if not user:
+                    done_ids.append(unban_data["_id"])
+                    continue
+
+                try:
+                    await guild.unban(user, reason="Automatische unban na tijdelijke ban")
+                    self.bot.log.info(
+                        f"Auto-unban uitgevoerd voor {user} ({user.id}) in {guild.name}"
+                    )
+                except discord.NotFound:
+                    self.bot.log.debug(f"User {user.id} is al unbanned in {guild.name}")
+                except discord.Forbidden:
+                    self.bot.log.error(f"Geen permissie om {user.id} te unbannen in {guild.name}")
+
+                # Log de auto-unban
+                try:
+                    await log_infraction(
+                        self.infractions_collection,
+                        guild.id,
+                        user.id,
+                        self.bot.user.id,
+                        "auto_unban",
+                        f"Geplande unban na {unban_data.get('original_duration', 'onbekende duur')}",
+                    )
+                except Exception as e:
+                    self.bot.log.error(f"Failed to log auto unban infraction: {e}")
+
+                done_ids.append(unban_data["_id"])
 
             except Exception as e:
-                self.bot.log.error(f"Error in scheduled unban checker: {e}")
-                await asyncio.sleep(60)
+                self.bot.log.error(
+                    f"Error processing scheduled unban for {unban_data.get('user_id')}: {e}"
+                )
+
+        return done_ids
 
     async def schedule_unban(
         self,
@@ -242,9 +371,11 @@ class ModerationTasks:
         )
 
         await self.scheduled_unbans_collection.insert_one(unban_data)
+        self.unbans.add(unban_data)
 
     async def cancel_scheduled_unban(self, guild_id: int, user_id: int):
         """Cancel a scheduled unban for a user."""
+        self.unbans.remove(guild_id, user_id)
         result = await self.scheduled_unbans_collection.delete_many(
             {"guild_id": guild_id, "user_id": user_id}
         )
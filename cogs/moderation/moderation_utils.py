@@ -1,3 +1,4 @@
+import asyncio
 import datetime
 import re
 from typing import Optional
@@ -6,6 +7,8 @@ import discord
 
 from utils.timezone import format_local_time, now_utc
 
+from .infraction_writer import get_infraction_writer
+
 
 async def send_dm_embed(member: discord.Member, embed: discord.Embed) -> bool:
     """
@@ -50,8 +53,13 @@ async def log_infraction(
     moderator_id: int,
     infraction_type: str,
     reason: str,
-):
-    """Log an infraction to the database."""
+) -> asyncio.Future:
+    """
+    Log an infraction to the database.
+
+    The write is buffered (see InfractionWriter); this returns right away with a future
+    that resolves to the `_id` of the infraction once it has been written.
+    """
     infraction_data = {
         "guild_id": guild_id,
         "user_id": user_id,
@@ -60,7 +68,7 @@ async def log_infraction(
         "reason": reason,
         "timestamp": now_utc().isoformat(),
     }
-    await infractions_collection.insert_one(infraction_data)
+    return await get_infraction_writer(infractions_collection).add(infraction_data)
 
 
 def create_dm_embed(
@@ -98,3 +106,55 @@ def format_duration(duration: datetime.timedelta) -> str:
         time_parts.append(f"{minutes} minuten")
 
     return ", ".join(time_parts) if time_parts else "minder dan een minuut"
+
+
+HISTORY_PROJECTION = {"type": 1, "reason": 1, "moderator_id": 1, "timestamp": 1}
+HISTORY_SORT = [("timestamp", -1), ("_id", -1)]
+HISTORY_INDEX = [("guild_id", 1), ("user_id", 1), ("timestamp", -1), ("_id", -1)]
+
+# BSON types that sort below a timestamp of the given Python type. Migrated warns may
+# store their timestamp as a datetime instead of an ISO string, so a page boundary has
+# to include every "smaller" type as well. Null and missing timestamps sort lowest of all
+# and are matched separately (`$type: "null"` doesn't match a missing field).
+_LOWER_BSON_TYPES = {
+    datetime.datetime: ["number", "string"],
+    str: ["number"],
+    int: [],
+    float: [],
+}
+
+
+def _older_than(timestamp, infraction_id) -> dict:
+    """Filter for infractions after (timestamp, _id) in descending order."""
+    clauses = [
+        {"timestamp": {"$lt": timestamp}},
+        {"timestamp": timestamp, "_id": {"$lt": infraction_id}},
+    ]
+    lower_types = _LOWER_BSON_TYPES.get(type(timestamp))
+    if lower_types:
+        clauses.append({"timestamp": {"$type": lower_types}})
+    if lower_types is not None:
+        clauses.append({"timestamp": None})
+    return {"$or": clauses}
+
+
+async def fetch_history_page(
+    infractions_collection, guild_id: int, user_id: int, after: Optional[tuple], limit: int
+) -> list:
+    """
+    Fetch one page of infractions, newest first.
+
+    Args:
+        after: (timestamp, _id) of the last infraction of the previous page, or None
+        limit: The number of infractions to fetch
+    """
+    query = {"guild_id": guild_id, "user_id": user_id}
+    if after is not None:
+        query.update(_older_than(*after))
+
+    return (
+        await infractions_collection.find(query, HISTORY_PROJECTION)
+        .sort(HISTORY_SORT)
+        .limit(limit)
+        .to_list(length=limit)
+    )
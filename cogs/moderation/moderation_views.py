@@ -171,3 +171,64 @@ class OverwriteConfirmationView(discord.ui.View):
             # Disable all buttons
             for item in self.children:
                 item.disabled = True
+
+
+class HistoryView(discord.ui.View):
+    """Previous/next buttons for /history; every click fetches exactly one page."""
+
+    def __init__(
+        self,
+        original_user: discord.abc.User,
+        fetch_page: Callable,
+        render_page: Callable,
+        page_size: int,
+    ):
+        super().__init__(timeout=300.0)
+        self.original_user = original_user
+        self.fetch_page = fetch_page
+        self.render_page = render_page
+        self.page_size = page_size
+        # cursors[i] is the (timestamp, _id) after which page i starts
+        self.cursors: list = [None]
+        self.page = 0
+        self.infractions: list = []
+        self.has_next = False
+
+    async def load(self, page: int) -> discord.Embed:
+        """Fetch a page (one query) and return its embed."""
+        rows = await self.fetch_page(self.cursors[page], self.page_size + 1)
+        self.page = page
+        self.has_next = len(rows) > self.page_size
+        self.infractions = rows[: self.page_size]
+
+        if self.has_next and len(self.cursors) == page + 1:
+            last = self.infractions[-1]
+            self.cursors.append((last["timestamp"], last["_id"]))
+
+        self.previous_page.disabled = page == 0
+        self.next_page.disabled = not self.has_next
+        return self.render_page(self.infractions, page)
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        """Only allow the original command user to interact with the buttons."""
+        if interaction.user.id != self.original_user.id:
+            await interaction.response.send_message(
+                "Alleen de persoon die het command uitvoerde kan deze knoppen gebruiken.",
+                ephemeral=True,
+            )
+            return False
+        return True
+
+    @discord.ui.button(label="Vorige", style=discord.ButtonStyle.secondary, emoji="⬅️")
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        embed = await self.load(max(self.page - 1, 0))
+        await interaction.response.edit_message(embed=embed, view=self)
+
+    @discord.ui.button(label="Volgende", style=discord.ButtonStyle.secondary, emoji="➡️")
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        embed = await self.load(self.page + 1)
+        await interaction.response.edit_message(embed=embed, view=self)
+
+    async def on_timeout(self):
+        for item in self.children:
+            item.disabled = True
@@ -2,6 +2,7 @@ import datetime
 
 import discord
 
+from .infraction_writer import get_infraction_writer
 from .moderation_utils import (
     create_dm_embed,
     format_duration,
@@ -228,6 +229,7 @@ class MuteSystem:
             if has_muted_role:
                 # Get the mute infraction from database to show when they were muted
                 try:
+                    await get_infraction_writer(self.infractions_collection).flush()
                     mute_infraction = await self.infractions_collection.find_one(
                         {
                             "guild_id": guild.id,
@@ -246,9 +248,7 @@ class MuteSystem:
                         time_info = "for an unknown duration"
 
                     # Check if there's a scheduled unmute
-                    scheduled_unmute = await self.tasks.scheduled_unmutes_collection.find_one(
-                        {"guild_id": guild.id, "user_id": member.id}
-                    )
+                    scheduled_unmute = self.tasks.get_scheduled_unmute(guild.id, member.id)
 
                     if scheduled_unmute:
                         unmute_time = scheduled_unmute["unmute_at"]
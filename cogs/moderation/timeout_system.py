@@ -189,10 +189,8 @@ class TimeoutSystem:
             if has_muted_role:
                 # Check if there's a scheduled unmute
                 try:
-                    scheduled_unmute = (
-                        await self.mute_system.tasks.scheduled_unmutes_collection.find_one(
-                            {"guild_id": guild.id, "user_id": member.id}
-                        )
+                    scheduled_unmute = self.mute_system.tasks.get_scheduled_unmute(
+                        guild.id, member.id
                     )
 
                     if scheduled_unmute:
@@ -1,5 +1,5 @@
 import asyncio
-import io
+import datetime
 from typing import Literal, Optional
 
 import discord
@@ -8,6 +8,34 @@ from discord.ext import commands
 
 from utils import checks
 from utils.checks import is_council, is_moderator
+from utils.indexes import index_registry
+from utils.timezone import LOCAL_TIMEZONE
+from utils.transcript import TranscriptArchive, load_transcript_html
+
+# Transcripts of a user, optionally within a date range, oldest first
+index_registry.index("modmail_logs", [("recipient_id", 1), ("timestamp", 1)])
+index_registry.query("modmail_logs", {"recipient_id": 0}, sort=[("timestamp", 1)])
+index_registry.query(
+    "modmail_logs",
+    {"recipient_id": 0, "timestamp": {"$gte": datetime.datetime(2000, 1, 1)}},
+    sort=[("timestamp", 1)],
+)
+
+ARCHIVE_MAX_SIZE = 10 * 1024 * 1024  # upload limit of servers without boosts
+EXPORT_BATCH_SIZE = 4  # transcript documents per cursor batch
+TRANSCRIPT_EXPORT_FIELDS = {
+    "ticket_id": 1,
+    "timestamp": 1,
+    "log_html": 1,
+    "log_html_gz": 1,
+    "log_file_id": 1,
+}
+
+
+def _local_midnight(date: str) -> datetime.datetime:
+    """Start of a JJJJ-MM-DD date in the local timezone (raises ValueError)."""
+    day = datetime.datetime.strptime(date, "%Y-%m-%d")
+    return LOCAL_TIMEZONE.localize(day)
 
 
 class Modmail(commands.Cog, name="modmail"):
@@ -17,17 +45,32 @@ class Modmail(commands.Cog, name="modmail"):
         self.settings_id = "modmail_settings"
 
     async def get_modmail_category_id(self):
-        settings = await self.db.settings.find_one({"_id": self.settings_id})
+        settings = await self.bot.settings.get(self.settings_id)
         if settings and "modmail_category_id" in settings:
             return settings["modmail_category_id"]
         return None
 
     async def get_modmail_logs_channel_id(self):
-        settings = await self.db.settings.find_one({"_id": self.settings_id})
+        settings = await self.bot.settings.get(self.settings_id)
         if settings and "modmail_channel_id" in settings:
             return settings["modmail_channel_id"]
         return None
 
+    # Keep the recipient <-> channel index of the thread manager up to date
+    @commands.Cog.listener()
+    async def on_guild_channel_create(self, channel: discord.abc.GuildChannel):
+        await self.bot.threads.handle_channel_create(channel)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_update(
+        self, before: discord.abc.GuildChannel, after: discord.abc.GuildChannel
+    ):
+        await self.bot.threads.handle_channel_update(before, after)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel):
+        await self.bot.threads.handle_channel_delete(channel)
+
     @app_commands.command(name="close", description="Sluit het ticket")
     @is_council()
     @checks.thread_only()
@@ -159,60 +202,89 @@ class Modmail(commands.Cog, name="modmail"):
     )
     @is_council()
     @checks.thread_only()
+    @app_commands.describe(
+        user="De gebruiker waarvan je de transcripts wilt",
+        since="Enkel tickets vanaf deze datum (JJJJ-MM-DD)",
+        until="Enkel tickets tot en met deze datum (JJJJ-MM-DD)",
+    )
     async def transcripts(
         self,
         interaction: discord.Interaction,
         user: discord.User,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
     ):
         await interaction.response.defer()  # Acknowledge command (avoids timeout)
-        recipient_id = user.id
-
-        # Fetch files from MongoDB
-        cursor = self.db.modmail_logs.find({"recipient_id": recipient_id})
-        files_list = await cursor.to_list(length=None)  # Convert cursor to a list
 
-        if not files_list:
+        query = {"recipient_id": user.id}
+        try:
+            date_range = {}
+            if since:
+                date_range["$gte"] = _local_midnight(since)
+            if until:
+                date_range["$lt"] = _local_midnight(until) + datetime.timedelta(days=1)
+        except ValueError:
+            await interaction.followup.send("❌ Ongeldige datum, gebruik JJJJ-MM-DD.")
+            return
+        if date_range:
+            query["timestamp"] = date_range
+
+        # One transcript at a time: only a small batch of documents is held by the cursor
+        # and every transcript is compressed into the archive before the next is loaded
+        cursor = (
+            self.db.modmail_logs.find(query, TRANSCRIPT_EXPORT_FIELDS)
+            .sort("timestamp", 1)
+            .batch_size(EXPORT_BATCH_SIZE)
+        )
+        archive = TranscriptArchive(min(interaction.guild.filesize_limit, ARCHIVE_MAX_SIZE))
+        amount = 0
+        too_large = []
+
+        async for document in cursor:
+            amount += 1
+            content = await load_transcript_html(self.db, document) or b"No content available"
+            # Legacy logs have no timestamp: fall back to when the ticket channel was created
+            timestamp = document.get("timestamp") or discord.utils.snowflake_time(
+                document["ticket_id"]
+            )
+            name = (
+                f"{amount}_transcript_{document['ticket_id']}_"
+                f"{timestamp.strftime('%Y-%m-%d_%H-%M')}.html"
+            )
+            try:
+                finished = await asyncio.to_thread(archive.add, name, content, timestamp)
+            except ValueError:
+                too_large.append(str(document["ticket_id"]))
+                continue
+            if finished is not None:
+                await self._send_transcript_part(interaction, user, finished, archive.parts - 1)
+
+        last = await asyncio.to_thread(archive.finish)
+        if last is not None:
+            await self._send_transcript_part(interaction, user, last, archive.parts)
+
+        if not amount:
             await interaction.followup.send(
                 f"Geen transcripts gevonden voor {user.mention} ({user.display_name})."
             )
             return
 
-        amount = len(files_list)
-        file_batches = []
-        current_batch = []
-
-        counter = 0
-        for file in files_list:
-            counter += 1
-
-            content = file.get("log_html", "No content available")
-            file_id = file["ticket_id"]
-            timestamp = file["timestamp"]
-
-            # Create a virtual file using io.BytesIO
-            file_data = io.BytesIO(content.encode("utf-8"))
-            file_data.seek(0)  # Reset pointer to start
-            discord_file = discord.File(
-                file_data,
-                filename=f"{counter}_transcript_{file_id}_{timestamp.strftime('%Y-%m-%d_%H:%M')}.html",
-            )
-
-            current_batch.append(discord_file)
-
-            # Send in batches of 10 files
-            if len(current_batch) == 10:
-                file_batches.append(current_batch)
-                current_batch = []
-
-        if current_batch:
-            file_batches.append(current_batch)  # Append any remaining files
+        msg = f"{amount} transcripts gevonden voor {user.mention} ({user.display_name})"
+        msg += f" in {archive.parts} archief(en)." if archive.parts > 1 else "."
+        if too_large:
+            msg += f"\n⚠️ Te groot om te uploaden: {', '.join(too_large)}"
+        await interaction.followup.send(msg)
 
-        # Send each batch separately
-        for batch in file_batches:
+    async def _send_transcript_part(
+        self, interaction: discord.Interaction, user: discord.User, part, number: int
+    ):
+        try:
             await interaction.followup.send(
-                f"{amount} transcripts gevonden voor {user.mention} ({user.display_name}):",
-                files=batch,
+                f"📦 Transcripts van {user.mention} ({user.display_name}), deel {number}",
+                file=discord.File(part, filename=f"transcripts_{user.id}_{number}.zip"),
             )
+        finally:
+            part.close()
 
     @staticmethod
     def parse_user_or_role(ctx, user_or_role):
@@ -12,13 +12,13 @@ class Reports(commands.Cog, name="reports"):
         self.settings_id = "reports_settings"
 
     async def get_reports_channel_id(self):
-        settings = await self.db.settings.find_one({"_id": self.settings_id})
+        settings = await self.bot.settings.get(self.settings_id)
         if settings and "reports_channel_id" in settings:
             return settings["reports_channel_id"]
         return None
 
     async def get_moderator_role_id(self):
-        settings = await self.db.settings.find_one({"_id": self.settings_id})
+        settings = await self.bot.settings.get(self.settings_id)
         if settings and "moderator_role_id" in settings:
             return settings["moderator_role_id"]
         return None
@@ -1,11 +1,15 @@
 import asyncio
-import hashlib
 import time
-from typing import Dict, List, Optional, Union
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Union
 
 import discord
 from discord.ext import commands
 
+from utils.role_changes import apply_role_changes, role_names
+
+ROLE_CACHE_SIZE = 256  # cached (category, role set) embeds
+
 
 class RoleCategory:
     def __init__(self, name: str, roles: List[Dict[str, Union[str, int]]] = None):
@@ -101,56 +105,42 @@ class RoleSelect(discord.ui.Select):
                 )
                 return
 
-            category_role_names = [role_data["role_name"] for role_data in category.roles]
-            selected_role_names = self.values
+            selected_role_names = set(self.values)
 
             roles_to_add = []
             roles_to_remove = []
 
-            for role_name in category_role_names:
-                role = discord.utils.get(guild.roles, name=role_name)
+            for role_data in category.roles:
+                role = role_names.get(guild, role_data["role_name"])
                 if not role:
                     continue
 
-                if role_name in selected_role_names and role not in member.roles:
+                if role.name in selected_role_names:
                     roles_to_add.append(role)
-                elif role_name not in selected_role_names and role in member.roles:
+                else:
                     roles_to_remove.append(role)
 
-            added_roles = []
-            removed_roles = []
-
-            if roles_to_add:
-                try:
-                    await member.add_roles(*roles_to_add, reason="Role selector")
-                    added_roles = [role.name for role in roles_to_add]
-                except discord.Forbidden:
-                    await interaction.response.send_message(
-                        "Ik heb geen toestemming om rollen toe te voegen.", ephemeral=True
-                    )
-                    return
-                except Exception as e:
-                    self.role_selector.bot.log.error(f"Error adding roles: {e}")
-                    await interaction.response.send_message(
-                        "Er is een fout opgetreden bij het toevoegen van rollen.", ephemeral=True
-                    )
-                    return
+            try:
+                result = await apply_role_changes(
+                    member, roles_to_add, roles_to_remove, reason="Role selector"
+                )
+            except discord.Forbidden:
+                await interaction.response.send_message(
+                    "Ik heb geen toestemming om je rollen aan te passen.", ephemeral=True
+                )
+                return
+            except Exception as e:
+                self.role_selector.bot.log.error(f"Error updating roles: {e}")
+                await interaction.response.send_message(
+                    "Er is een fout opgetreden bij het aanpassen van je rollen.", ephemeral=True
+                )
+                return
 
-            if roles_to_remove:
-                try:
-                    await member.remove_roles(*roles_to_remove, reason="Role selector")
-                    removed_roles = [role.name for role in roles_to_remove]
-                except discord.Forbidden:
-                    await interaction.response.send_message(
-                        "Ik heb geen toestemming om rollen te verwijderen.", ephemeral=True
-                    )
-                    return
-                except Exception as e:
-                    self.role_selector.bot.log.error(f"Error removing roles: {e}")
-                    await interaction.response.send_message(
-                        "Er is een fout opgetreden bij het verwijderen van rollen.", ephemeral=True
-                    )
-                    return
+            self.role_selector.bot.log.debug(
+                f"Role selector: {result.rest_calls} REST call(s) for roles of {member}"
+            )
+            added_roles = [role.name for role in result.added]
+            removed_roles = [role.name for role in result.removed]
 
             # Maak een feedbackbericht
             messages = []
@@ -171,11 +161,6 @@ class RoleSelect(discord.ui.Select):
             # Direct response in plaats van defer + followup
             await interaction.response.send_message(embed=embed, ephemeral=True)
 
-            # Cache invalideren alleen voor deze gebruiker & category
-            cache_key = await self.role_selector._get_cache_key(self.category_name, member.roles)
-            if cache_key in self.role_selector.role_selector_cache:
-                del self.role_selector.role_selector_cache[cache_key]
-
         except Exception as e:
             self.role_selector.bot.log.error(f"Error in RoleSelect callback: {e}")
             try:
@@ -207,11 +192,16 @@ class RoleSelector(commands.Cog):
         self.role_menu_message_id = None
         self.role_menu_channel_id = None
         self.views = {}  # Store views by message ID
-        # Cache for role selector embeds and views by category and user role state
-        self.role_selector_cache = (
-            {}
-        )  # key: cache_key, value: {"embed": embed, "view": view, "timestamp": timestamp}
+        # LRU of role selector embeds by (category, bitset of the category roles the user has)
+        # value: {"embed": embed, "view": view, "timestamp": timestamp}
+        self.role_selector_cache: "OrderedDict[Tuple[str, int], Dict]" = OrderedDict()
         self.cache_duration = 300  # 5 minutes cache duration
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # In-memory categories, rebuilt by save_categories
+        self._categories: Optional[List[RoleCategory]] = None
+        # category name -> {role name: bit}
+        self._role_bits: Dict[str, Dict[str, int]] = {}
         self.default_categories = [
             RoleCategory(
                 "Campussen",
@@ -275,20 +265,39 @@ class RoleSelector(commands.Cog):
                     "categories": [category.to_dict() for category in self.default_categories],
                 }
             )
+            self._set_categories(self.default_categories)
+        else:
+            self._set_categories(
+                [RoleCategory.from_dict(category) for category in categories.get("categories", [])]
+            )
 
         # Persistent views are now handled centrally by PersistentViewManager
 
     # Using the has_role decorator instead of a separate method
 
+    def _set_categories(self, categories: List[RoleCategory]):
+        """Replace the in-memory categories and rebuild the role bit map."""
+        self._categories = categories
+        self._role_bits = {
+            category.name: {role["role_name"]: bit for bit, role in enumerate(category.roles)}
+            for category in categories
+        }
+        self._invalidate_cache()
+
     async def get_categories(self) -> List[RoleCategory]:
-        """Get all role categories from the database."""
-        categories_doc = await self.bot.db.role_selector.find_one({"_id": "categories"})
-        if not categories_doc:
-            return self.default_categories
+        """Get all role categories (from memory, loaded from the database once)."""
+        if self._categories is None:
+            categories_doc = await self.bot.db.role_selector.find_one({"_id": "categories"})
+            if not categories_doc:
+                return self.default_categories
+            self._set_categories(
+                [
+                    RoleCategory.from_dict(category)
+                    for category in categories_doc.get("categories", [])
+                ]
+            )
 
-        return [
-            RoleCategory.from_dict(category) for category in categories_doc.get("categories", [])
-        ]
+        return self._categories
 
     async def save_categories(self, categories: List[RoleCategory]):
         """Save categories to the database."""
@@ -297,54 +306,52 @@ class RoleSelector(commands.Cog):
             {"$set": {"categories": [category.to_dict() for category in categories]}},
             upsert=True,
         )
-        # Invalidate cache when categories change
-        self._invalidate_cache()
-
-    async def _get_cache_key(self, category_name: str, user_roles: List[discord.Role]) -> str:
-        """Generate a cache key based on category and user roles."""
-        try:
-            # Get roles for this category from the current categories in the database
-            category_role_names = set()
-            categories = await self.get_categories()
-            for cat in categories:
-                if hasattr(cat, "name") and cat.name == category_name:
-                    # Handle RoleCategory object
-                    category_role_names = {role["role_name"] for role in cat.roles}
-                    break
-                elif isinstance(cat, dict) and cat.get("name") == category_name:
-                    # Handle dict format
-                    category_role_names = {role["role_name"] for role in cat.get("roles", [])}
-                    break
-
-            # Get user's relevant roles for this category
-            user_category_roles = sorted(
-                [role.name for role in user_roles if role.name in category_role_names]
-            )
-            roles_hash = hashlib.sha256(str(user_category_roles).encode()).hexdigest()
-            return f"{category_name}:{roles_hash}"
-        except Exception as e:
-            self.bot.log.warning(f"Error generating cache key: {e}")
-            # Fallback to simple key if there's any issue
-            return f"{category_name}:default"
-
-    def _get_cached_result(self, cache_key: str) -> Optional[Dict]:
+        # Rebuild the in-memory categories (and invalidate the cache) when categories change
+        self._set_categories(categories)
+
+    def _get_cache_key(self, category_name: str, user_roles: List[discord.Role]) -> Tuple[str, int]:
+        """Cache key: the category and a bitset of the category roles the user has."""
+        role_bits = self._role_bits.get(category_name, {})
+        mask = 0
+        for role in user_roles:
+            bit = role_bits.get(role.name)
+            if bit is not None:
+                mask |= 1 << bit
+        return category_name, mask
+
+    def _get_cached_result(self, cache_key: Tuple[str, int]) -> Optional[Dict]:
         """Get cached embed and view if still valid."""
-        if cache_key in self.role_selector_cache:
-            cached = self.role_selector_cache[cache_key]
+        cached = self.role_selector_cache.get(cache_key)
+        if cached is not None:
             if time.time() - cached["timestamp"] < self.cache_duration:
+                self.role_selector_cache.move_to_end(cache_key)
+                self.cache_hits += 1
                 return cached
-            else:
-                # Remove expired cache entry
-                del self.role_selector_cache[cache_key]
+            # Remove expired cache entry
+            del self.role_selector_cache[cache_key]
+        self.cache_misses += 1
         return None
 
-    def _cache_result(self, cache_key: str, embed: discord.Embed, view: discord.ui.View):
+    def _cache_result(
+        self, cache_key: Tuple[str, int], embed: discord.Embed, view: discord.ui.View
+    ):
         """Cache the embed and view for future use."""
         self.role_selector_cache[cache_key] = {
             "embed": embed,
             "view": view,
             "timestamp": time.time(),
         }
+        self.role_selector_cache.move_to_end(cache_key)
+        while len(self.role_selector_cache) > ROLE_CACHE_SIZE:
+            self.role_selector_cache.popitem(last=False)
+
+    def cache_stats(self) -> Dict[str, int]:
+        """Hit/miss counters and size of the role selector cache."""
+        return {
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "size": len(self.role_selector_cache),
+        }
 
     def _invalidate_cache(self):
         """Clear all cached role selector data."""
@@ -436,7 +443,7 @@ class RoleSelector(commands.Cog):
             await interaction.response.defer(ephemeral=True)
 
         # Check cache first for quick response
-        cache_key = await self._get_cache_key(category_name, interaction.user.roles)
+        cache_key = self._get_cache_key(category_name, interaction.user.roles)
         cached_result = self._get_cached_result(cache_key)
 
         if cached_result and not message:  # Only use cache if no status message is needed
@@ -449,13 +456,6 @@ class RoleSelector(commands.Cog):
 
                 # Always use followup for ephemeral response
                 await interaction.followup.send(embed=cached_embed, view=view, ephemeral=True)
-
-                # Optionally refresh cache in background (non-blocking)
-                asyncio.create_task(
-                    self._refresh_cache_in_background(
-                        cache_key, category_name, interaction.user.roles
-                    )
-                )
                 return
             except Exception as e:
                 self.bot.log.warning(
@@ -553,7 +553,6 @@ class RoleSelector(commands.Cog):
 
                 # Cache the result if no status message (for future quick access)
                 if not message:
-                    cache_key = await self._get_cache_key(category_name, interaction.user.roles)
                     self._cache_result(cache_key, embed, view)
 
                 # Send ephemeral response instead of editing the original message
@@ -756,44 +755,6 @@ class RoleSelector(commands.Cog):
 
         return view
 
-    async def _refresh_cache_in_background(
-        self, cache_key: str, category_name: str, user_roles: List[discord.Role]
-    ):
-        """Refresh cache entry in background to keep it up to date."""
-        try:
-            categories = await self.get_categories()
-            category = next((c for c in categories if c.name == category_name), None)
-            if not category:
-                return
-
-            # Create fresh embed
-            embed = discord.Embed(
-                title=f"🎭 Rolselectie - {category_name}",
-                description="Selecteer de rollen die je wilt hebben. Deselecteer rollen die je wilt verwijderen.",
-                color=discord.Color.green(),
-            )
-
-            # Add available roles to the embed
-            role_list = []
-            for role in category.roles:
-                user_has_role = any(user_role.name == role["role_name"] for user_role in user_roles)
-                status = "✅" if user_has_role else "❌"
-                role_list.append(f"{status} {role['emoji']} {role['name']}")
-
-            if role_list:
-                embed.add_field(name="Beschikbare Rollen", value="\n".join(role_list), inline=False)
-
-            embed.set_footer(text="Gebruik het dropdown menu om rollen te selecteren/deselecteren")
-
-            # Create fresh view
-            view = await self._create_role_select_view(category_name, user_roles)
-
-            # Update cache
-            self._cache_result(cache_key, embed, view)
-
-        except Exception as e:
-            self.bot.log.warning(f"Failed to refresh cache in background: {e}")
-
 
 async def setup(bot):
     await bot.add_cog(RoleSelector(bot))
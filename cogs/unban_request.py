@@ -5,6 +5,7 @@ import discord
 import pymongo
 from discord.ext import commands
 
+from cogs.moderation.infraction_writer import get_infraction_writer
 from utils.timezone import to_local
 
 
@@ -84,6 +85,8 @@ class UnbanAanvraagModal(discord.ui.Modal, title="Unban Aanvraag"):
         reden_antwoord = self.reden.value
         berouw_antwoord = self.berouw.value
 
+        # Infractions are written through a buffer: make sure the recent ones are included
+        await get_infraction_writer(self.bot.db.infractions).flush()
         infractions = (
             await self.bot.db.infractions.find(
                 {"guild_id": interaction.guild.id, "user_id": self.user.id}
@@ -155,12 +158,11 @@ class UnbanAanvraagModal(discord.ui.Modal, title="Unban Aanvraag"):
 class UnbanRequest(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.settings_collection = self.bot.db["settings"]
         self.unban_view = None
         self.bot.loop.create_task(self.load_unban_settings())
 
     async def load_unban_settings(self):
-        settings = await self.settings_collection.find_one({"_id": "mod_settings"})
+        settings = await self.bot.settings.get("mod_settings")
         if settings:
             self.unban_request_kanaal_id = (
                 str(settings.get("unban_request_kanaal_id"))
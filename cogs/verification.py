@@ -1,7 +1,5 @@
 import asyncio
-import email
 import hashlib
-import imaplib
 import random
 import re
 import smtplib
@@ -10,12 +8,13 @@ import time
 import uuid
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
-from typing import Dict
 
 import discord
+from bson import Binary
 from cryptography.fernet import Fernet
 from discord import Interaction, app_commands, ui
 from discord.ext import commands
+from discord.http import Route
 
 from env import (
     ENCRYPTION_KEY,
@@ -25,21 +24,51 @@ from env import (
     MIGRATION_SMTP_PASSWORD,
     MIGRATION_SMTP_PORT,
     MIGRATION_SMTP_SERVER,
+    PENDING_CODE_STORE,
     SMTP_EMAIL,
     SMTP_PASSWORD,
     SMTP_SERVER,
 )
+from utils.bounce_monitor import close_bounce_monitor, get_bounce_monitor
 from utils.checks import is_admin, is_moderator
 from utils.crypto import make_email_index
-from utils.email_sender import send_email
+from utils.email_sender import get_email_sender
+from utils.indexes import index_registry
+from utils.member_jobs import DONE, SKIPPED, JobKind
+from utils.pending_codes import (
+    MAX_ATTEMPTS,
+    MemoryCodeStore,
+    MongoCodeStore,
+    PendingCodeStore,
+)
+from utils.role_changes import apply_role_changes
 from utils.verification_check import ensure_verified_role
+from utils.verification_cleanup import (
+    pack_member_ids,
+    remove_records,
+    sweep_orphaned_records,
+    unpack_member_ids,
+)
 
 EMAIL_REGEX = re.compile(r"^[a-zA-Z0-9._%]+@student\.hogent\.be$")
 CODE_LENGTH = 6
 CODE_EXPIRY = 600  # 10 minutes
+BOUNCE_WAIT = 5 * 60  # seconds to wait for the test mail of a migration to bounce
+
+# One verification per e-mail address; records are looked up by address and by member
+index_registry.index(
+    "verifications",
+    "email_index",
+    unique=True,
+    partialFilterExpression={"email_index": {"$exists": True, "$type": "string"}},
+)
+index_registry.index("verifications", "user_id")
+index_registry.query("verifications", {"email_index": "x"})
+index_registry.query("verifications", {"user_id": 0})
+CLEANUP_FULL_INTERVAL = 24 * 3600  # full orphan diff at least once a day
 
-# In-memory store for codes: {user_id: (code, email, timestamp)}
-pending_codes: Dict[int, tuple] = {}
+# Store for pending codes; replaced by the MongoDB backend in setup() unless configured otherwise
+pending_codes: PendingCodeStore = MemoryCodeStore(ttl=CODE_EXPIRY)
 
 # Encryption utility
 fernet = Fernet(ENCRYPTION_KEY.encode())
@@ -160,13 +189,20 @@ class EmailModal(ui.Modal, title="Studentenmail verifiëren"):
             )
             return
 
+        if not await pending_codes.allow_request(user_id):
+            await interaction.followup.send(
+                "❌ Je hebt te veel codes aangevraagd. Probeer het over een uur opnieuw.",
+                ephemeral=True,
+            )
+            return
+
         # Generate code and store
         code = "".join(random.choices(string.digits, k=CODE_LENGTH))
-        pending_codes[user_id] = (code, email, time.time())
+        await pending_codes.put(user_id, code, email)
 
         async def send_email_background():
             try:
-                send_email(
+                await get_email_sender().send(
                     [email],
                     "Jouw verificatiecode voor de Discord-server",
                     f"Jouw verificatiecode is: {code}\nDeze code is 10 minuten geldig.",
@@ -176,7 +212,7 @@ class EmailModal(ui.Modal, title="Studentenmail verifiëren"):
                     ephemeral=True,
                 )
             except Exception as e:
-                pending_codes.pop(user_id, None)
+                await pending_codes.pop(user_id)
                 await interaction.followup.send(
                     f"❌ Er is een fout opgetreden bij het versturen van de e-mail: {e}",
                     ephemeral=True,
@@ -204,23 +240,24 @@ class CodeModal(ui.Modal, title="Voer je verificatiecode in"):
             await ensure_verified_role(self.bot, interaction)
             return
 
-        entry = pending_codes.get(user_id)
+        entry = await pending_codes.get(user_id)
         if not entry:
             await interaction.response.send_message(
-                "❌ Je hebt geen actieve verificatiecode aangevraagd. Gebruik eerst 'Stuur code'.",
+                "❌ Je hebt geen actieve verificatiecode (of je code is verlopen). Gebruik eerst 'Stuur code'.",
                 ephemeral=True,
             )
             return
 
-        code, email, timestamp = entry
-        if time.time() - timestamp > CODE_EXPIRY:
-            pending_codes.pop(user_id, None)
-            await interaction.response.send_message(
-                "❌ Je code is verlopen. Vraag een nieuwe code aan.", ephemeral=True
-            )
-            return
+        code, email = entry.code, entry.email
 
         if self.code.value.strip() != code:
+            attempts = await pending_codes.register_failed_attempt(user_id)
+            if attempts >= MAX_ATTEMPTS:
+                await pending_codes.pop(user_id)
+                await interaction.response.send_message(
+                    "❌ Te veel foute pogingen. Vraag een nieuwe code aan.", ephemeral=True
+                )
+                return
             await interaction.response.send_message(
                 "❌ Verkeerde code. Probeer het opnieuw.", ephemeral=True
             )
@@ -246,11 +283,11 @@ class CodeModal(ui.Modal, title="Voer je verificatiecode in"):
             )
             return
 
-        pending_codes.pop(user_id, None)
+        await pending_codes.pop(user_id)
 
         # Assign verified role (replace 'Verified' with your role name)
         guild = interaction.guild
-        settings = await self.bot.db.settings.find_one({"_id": "verification_settings"})
+        settings = await self.bot.settings.get("verification_settings")
         verified_role_id = settings.get("verified_role_id")
         role = guild.get_role(verified_role_id) if verified_role_id else None
         if role:
@@ -367,7 +404,7 @@ class MigrationModal(ui.Modal, title="Migratie van Oude Verificatie"):
                 )
 
                 guild = interaction.guild
-                settings = await self.bot.db.settings.find_one({"_id": "verification_settings"})
+                settings = await self.bot.settings.get("verification_settings")
                 verified_role_id = settings.get("verified_role_id")
                 role = guild.get_role(verified_role_id) if verified_role_id else None
 
@@ -436,13 +473,24 @@ class MigrationModal(ui.Modal, title="Migratie van Oude Verificatie"):
             # Generate unique test ID
             test_id = str(uuid.uuid4())[:8]
 
-            # Send test email
-            if not await self._send_test_email(email_address, test_id):
-                return "send_failed"
+            # Watch before sending so a fast bounce can't be missed; one shared IMAP
+            # session serves every migration that is waiting
+            monitor = get_bounce_monitor(
+                MIGRATION_IMAP_SERVER,
+                MIGRATION_IMAP_PORT,
+                MIGRATION_SMTP_EMAIL,
+                MIGRATION_SMTP_PASSWORD,
+            )
+            monitor.watch(test_id, email_address)
+            try:
+                # Send test email
+                if not await self._send_test_email(email_address, test_id):
+                    return "send_failed"
 
-            # Wait and check for bounces
-            result = await self._monitor_bounces({test_id: email_address}, wait_minutes=5)
-            return result.get(email_address, "unknown")
+                # Wait and check for bounces
+                return await monitor.wait(test_id, timeout=BOUNCE_WAIT)
+            finally:
+                monitor.forget(test_id)
 
         except Exception as e:
             self.bot.log.error(f"Bounce check error: {e}", exc_info=True)
@@ -483,188 +531,53 @@ Deze test helpt bij het verifiëren van e-mail bezorgbaarheid zonder dat je acti
             self.bot.log.error(f"Failed to send test email to {recipient}: {e}", exc_info=True)
             return False
 
-    async def _monitor_bounces(self, test_ids: dict, wait_minutes: int = 5) -> dict:
-        """Monitor for bounce responses using IMAP"""
-        results = {email_addr: "no_bounce_yet" for email_addr in test_ids.values()}
-        deadline = time.time() + wait_minutes * 60
-        poll_interval = 30  # seconds
 
-        # Use migration-specific IMAP server and port
-        imap_host = MIGRATION_IMAP_SERVER
-        imap_port = MIGRATION_IMAP_PORT
+def _cleanup_roles(member: discord.Member):
+    """Roles the bot can take away from a member (not @everyone, managed or above its own)."""
+    return [role for role in member.roles if role.is_assignable()]
 
-        while time.time() < deadline and any(v == "no_bounce_yet" for v in results.values()):
-            try:
-                with imaplib.IMAP4_SSL(imap_host, imap_port) as imap:
-                    imap.login(MIGRATION_SMTP_EMAIL, MIGRATION_SMTP_PASSWORD)
-                    imap.select("INBOX")
-
-                    # Search recent messages
-                    since_str = time.strftime("%d-%b-%Y", time.gmtime(time.time() - 86400))
-                    typ, data = imap.search(None, "SINCE", since_str)
-
-                    if typ == "OK" and data[0]:
-                        for num in data[0].split():
-                            typ2, msgdata = imap.fetch(num, "(RFC822)")
-                            if typ2 != "OK" or not msgdata or not msgdata[0]:
-                                continue
-
-                            msg = email.message_from_bytes(msgdata[0][1])
-
-                            if not self._looks_like_dsn(msg):
-                                continue
-
-                            match = self._message_matches_test(msg, test_ids)
-                            if not match:
-                                continue
-
-                            email_addr, matched_test_id = match
-                            if results[email_addr] != "no_bounce_yet":
-                                continue
-
-                            # Parse DSN status
-                            dsn_info = self._extract_dsn_status(msg)
-                            if dsn_info:
-                                results[email_addr] = self._classify_from_dsn(dsn_info)
-                            else:
-                                # Fallback text analysis
-                                all_text = (msg.get("Subject", "") + " " + str(msg)).lower()
-                                if (
-                                    "5.1.1" in all_text
-                                    or "user unknown" in all_text
-                                    or "recipient not found" in all_text
-                                ):
-                                    results[email_addr] = "bounced"
-                                elif "4." in all_text or "temporar" in all_text:
-                                    results[email_addr] = "delayed"
-                                else:
-                                    results[email_addr] = "unknown"
-
-                    imap.logout()
-            except Exception as e:
-                self.bot.log.error(f"Error checking bounces: {e}", exc_info=True)
 
-            await asyncio.sleep(poll_interval)
+def _select_unverified(guild: discord.Guild, params: dict):
+    verified_role_id = params["verified_role_id"]
+    return [
+        member.id
+        for member in guild.members
+        if not member.bot and member.get_role(verified_role_id) is None and _cleanup_roles(member)
+    ]
 
-        return results
 
-    def _looks_like_dsn(self, msg) -> bool:
-        """Check if message looks like a delivery status notification"""
-        rp = (msg.get("Return-Path") or "").strip()
-        ctype = (msg.get_content_type() or "").lower()
-        ctype_full = (msg.get("Content-Type") or "").lower()
+async def _cleanup_member(guild: discord.Guild, member_id: int, params: dict) -> str:
+    member = guild.get_member(member_id)
+    # Left the server or got verified since the job was started
+    if member is None or member.get_role(params["verified_role_id"]) is not None:
+        return SKIPPED
+    roles = _cleanup_roles(member)
+    if not roles:
+        return SKIPPED
+    await apply_role_changes(member, remove=roles, reason="Niet verified, opgeschoond")
+    return DONE
 
-        # RFC-compliant DSN markers
-        if (
-            rp == "<>"
-            and ctype == "multipart/report"
-            and "report-type=delivery-status" in ctype_full
-        ):
-            return True
 
-        # Heuristic fallback for non-compliant DSNs
-        subj = (msg.get("Subject") or "").lower()
-        bounce_hints = [
-            "undeliverable",
-            "delivery status notification",
-            "mail delivery failed",
-            "message not delivered",
-            "delivery failure",
-            "undelivered mail returned to sender",
-        ]
-        if any(h in subj for h in bounce_hints):
-            return True
-
-        if (msg.get("Auto-Submitted") or "").lower().startswith("auto-"):
-            return True
-
-        return False
-
-    def _extract_dsn_status(self, msg):
-        """Extract DSN status information from message/delivery-status part"""
-        if not msg.is_multipart():
-            return None
-
-        for part in msg.walk():
-            if part.get_content_type() == "message/delivery-status":
-                try:
-                    payload = part.get_payload()
-                    blocks = payload if isinstance(payload, list) else [part]
-
-                    for blk in blocks:
-                        text = blk.as_string()
-                        action = re.search(r"(?im)^Action:\s*([^\r\n]+)", text)
-                        status = re.search(r"(?im)^Status:\s*([0-9]\.[0-9]\.[0-9])", text)
-                        diag = re.search(r"(?im)^Diagnostic-Code:\s*([^\r\n]+)", text)
-                        recip = re.search(r"(?im)^Final-Recipient:\s*rfc822;\s*([^\r\n\s]+)", text)
-
-                        if action or status or diag or recip:
-                            return {
-                                "action": (action.group(1).strip().lower() if action else None),
-                                "status": (status.group(1).strip() if status else None),
-                                "diagnostic": (diag.group(1).strip() if diag else None),
-                                "final_recipient": (recip.group(1).strip() if recip else None),
-                            }
-                except Exception:
-                    pass
-        return None
-
-    def _message_matches_test(self, msg, test_id_to_email: dict):
-        """Match received message to one of our sent tests"""
-        subject = msg.get("Subject", "")
-
-        # Get body text
-        body_text = ""
-        if msg.is_multipart():
-            for part in msg.walk():
-                if part.get_content_type() == "text/plain":
-                    try:
-                        body_text += part.get_payload(decode=True).decode("utf-8", errors="ignore")
-                    except Exception:
-                        pass
-        else:
-            try:
-                body_text = msg.get_payload(decode=True).decode("utf-8", errors="ignore")
-            except Exception:
-                pass
-
-        text = subject + "\n" + body_text
-
-        # Match via test_id token
-        for test_id, email_addr in test_id_to_email.items():
-            if test_id in text:
-                return (email_addr, test_id)
-
-        # If DSN, try to pull Final-Recipient
-        dsn = self._extract_dsn_status(msg)
-        if dsn and dsn.get("final_recipient"):
-            for test_id, email_addr in test_id_to_email.items():
-                if dsn["final_recipient"].lower() == email_addr.lower():
-                    return (email_addr, test_id)
-
-        # Heuristic: look for any of the emails in message
-        for test_id, email_addr in test_id_to_email.items():
-            if email_addr.lower() in text.lower():
-                return (email_addr, test_id)
-
-        return None
-
-    def _classify_from_dsn(self, dsn_info):
-        """Classify bounce type from DSN information"""
-        action = (dsn_info.get("action") or "").lower()
-        status = dsn_info.get("status") or ""
-        if action == "failed" or status.startswith("5."):
-            return "bounced"
-        if action == "delayed" or status.startswith("4."):
-            return "delayed"
-        if action in ("delivered", "relayed", "expanded"):
-            return "delivered"
-        return "unknown"
+CLEANUP_UNVERIFIED = JobKind(
+    title="Opschonen niet-geverifieerde leden",
+    select=_select_unverified,
+    apply=_cleanup_member,
+    route=lambda guild: Route(
+        "PATCH", "/guilds/{guild_id}/members/{user_id}", guild_id=guild.id, user_id=0
+    ),
+)
 
 
 class Verification(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self._sweep_needed = asyncio.Event()
+        bot.member_jobs.register("cleanup_unverified", CLEANUP_UNVERIFIED)
+
+    async def cog_unload(self):
+        pending_codes.stop_sweeper()
+        await get_email_sender().close()
+        await close_bounce_monitor()
 
     @app_commands.command(
         name="get_email", description="Haal het e-mailadres van een gebruiker op (Moderator only)"
@@ -930,21 +843,12 @@ class Verification(commands.Cog):
     async def on_member_remove(self, member):
         """Remove verification record when user leaves the server."""
         try:
-            # Check if user had a verification record before removing
-            existing_record = await self.bot.db.verifications.find_one({"user_id": member.id})
+            result = await self.bot.db.verifications.delete_one({"user_id": member.id})
 
-            if existing_record:
-                # Remove verification record
-                result = await self.bot.db.verifications.delete_one({"user_id": member.id})
-
-                if result.deleted_count > 0:
-                    self.bot.log.info(
-                        f"Removed verification record for user {member} ({member.id}) who left the server"
-                    )
-                else:
-                    self.bot.log.warning(
-                        f"Failed to remove verification record for user {member} ({member.id}) who left the server"
-                    )
+            if result.deleted_count > 0:
+                self.bot.log.info(
+                    f"Removed verification record for user {member} ({member.id}) who left the server"
+                )
             else:
                 self.bot.log.debug(
                     f"User {member} ({member.id}) left the server but had no verification record"
@@ -956,8 +860,33 @@ class Verification(commands.Cog):
                 exc_info=True,
             )
 
+    @commands.Cog.listener()
+    async def on_ready(self):
+        """
+        A new gateway session (startup or a reconnect that couldn't resume) may have
+        missed member leave events, so the next cleanup run checks the member snapshot.
+        """
+        self._sweep_needed.set()
+
+    async def _load_cleanup_state(self) -> dict:
+        return await self.bot.db.task_state.find_one({"_id": "verification_cleanup"}) or {}
+
+    async def _save_cleanup_state(self, **fields):
+        await self.bot.db.task_state.update_one(
+            {"_id": "verification_cleanup"}, {"$set": fields}, upsert=True
+        )
+
     async def cleanup_orphaned_records(self):
-        """Periodically clean up verification records for users no longer in the server."""
+        """
+        Periodically clean up verification records for users no longer in the server.
+
+        While the bot is connected `on_member_remove` keeps the records in sync. Every
+        hour the member IDs are saved as a snapshot (the watermark); after a new gateway
+        session (startup or reconnect) only the snapshot members that are gone now are
+        removed. A full diff of the records runs when there is no snapshot and at least
+        every CLEANUP_FULL_INTERVAL, which also catches members that joined after the
+        last snapshot and left while the bot was down.
+        """
         await self.bot.wait_until_ready()
 
         # Wait a bit more to ensure guild configuration is loaded
@@ -974,71 +903,72 @@ class Verification(commands.Cog):
             )
             return
 
+        try:
+            state = await self._load_cleanup_state()
+        except Exception as e:
+            self.bot.log.error(f"Failed to load verification cleanup state: {e}")
+            state = {}
+        last_sweep_at = state.get("last_sweep_at", 0)
+        snapshot = state.get("member_snapshot")
+
         while not self.bot.is_closed():
             try:
-                self.bot.log.debug("Running verification records cleanup check")
-
                 # Get the configured guild from bot settings
                 guild = self.bot.guild
                 if not guild:
                     self.bot.log.warning(
                         f"Configured guild not found (guild_id: {self.bot.guild_id}), skipping verification cleanup"
                     )
-                    await asyncio.sleep(3600)
-                    continue
-
-                self.bot.log.debug(
-                    f"Checking verification records for configured guild: {guild.name} ({guild.id})"
-                )
+                else:
+                    member_ids = {member.id for member in guild.members}
+                    started = time.perf_counter()
+
+                    if time.time() - last_sweep_at >= CLEANUP_FULL_INTERVAL or (
+                        self._sweep_needed.is_set() and snapshot is None
+                    ):
+                        self._sweep_needed.clear()
+                        self.bot.log.debug(
+                            f"Checking verification records for configured guild: {guild.name} ({guild.id})"
+                        )
+                        cleanup_count, total_records = await sweep_orphaned_records(
+                            self.bot.db.verifications, member_ids.__contains__
+                        )
+                        last_sweep_at = time.time()
+                        elapsed = time.perf_counter() - started
 
-                cleanup_count = 0
-                total_records = 0
-
-                all_records = self.bot.db.verifications.find({})
-                async for record in all_records:
-                    total_records += 1
-                    user_id = record["user_id"]
-
-                    # Check if user is still in the server
-                    member = guild.get_member(user_id)
-                    if not member:
-                        # User is no longer in the server, remove their verification record
-                        try:
-                            # Remove the record
-                            result = await self.bot.db.verifications.delete_one(
-                                {"user_id": user_id}
+                        if cleanup_count > 0:
+                            self.bot.log.info(
+                                f"Verification cleanup completed: removed {cleanup_count} orphaned records out of {total_records} total records ({elapsed:.2f}s)"
                             )
-
-                            if result.deleted_count > 0:
-                                cleanup_count += 1
-                                self.bot.log.info(
-                                    f"Cleaned up orphaned verification record for user ID {user_id} (no longer in server)"
-                                )
-                            else:
-                                self.bot.log.warning(
-                                    f"Failed to delete orphaned verification record for user ID {user_id}"
-                                )
-
-                        except Exception as e:
-                            self.bot.log.error(
-                                f"Error cleaning up verification record for user ID {user_id}: {e}",
-                                exc_info=True,
+                        else:
+                            self.bot.log.debug(
+                                f"Verification cleanup completed: no orphaned records found ({total_records} total records checked in {elapsed:.2f}s)"
                             )
+                    elif self._sweep_needed.is_set():
+                        self._sweep_needed.clear()
+                        departed = unpack_member_ids(snapshot) - member_ids
+                        cleanup_count = await remove_records(self.bot.db.verifications, departed)
+                        elapsed = time.perf_counter() - started
+                        self.bot.log.info(
+                            f"Verification cleanup after gateway gap: {len(departed)} members left, "
+                            f"removed {cleanup_count} records ({elapsed:.2f}s)"
+                        )
 
-                if cleanup_count > 0:
-                    self.bot.log.info(
-                        f"Verification cleanup completed: removed {cleanup_count} orphaned records out of {total_records} total records"
-                    )
-                else:
-                    self.bot.log.debug(
-                        f"Verification cleanup completed: no orphaned records found ({total_records} total records checked)"
+                    snapshot = pack_member_ids(member_ids)
+                    await self._save_cleanup_state(
+                        last_sweep_at=last_sweep_at,
+                        member_snapshot=Binary(snapshot),
+                        snapshot_at=time.time(),
                     )
 
             except Exception as e:
                 self.bot.log.error(f"Error during verification records cleanup: {e}", exc_info=True)
 
-            # Wait 1 hour before next cleanup
-            await asyncio.sleep(3600)
+            # Wait 1 hour before next check, or until a new gateway session starts
+            try:
+                await asyncio.wait_for(self._sweep_needed.wait(), timeout=3600)
+            except asyncio.TimeoutError:
+                pass
 
     @app_commands.command(
         name="migrate_email_index", description="Voeg email_index toe aan alle oude verificaties"
@@ -1078,12 +1008,15 @@ class Verification(commands.Cog):
         description="Verwijder alle rollen van leden die niet verified zijn.",
     )
     @is_admin()
-    async def cleanup_unverified(self, interaction: discord.Interaction):
+    @app_commands.describe(
+        dry_run="Toon enkel welke leden opgeschoond zouden worden, zonder iets aan te passen"
+    )
+    async def cleanup_unverified(self, interaction: discord.Interaction, dry_run: bool = False):
         await interaction.response.defer(ephemeral=True)
         guild = interaction.guild
 
         # Haal de verified rol uit de database
-        settings = await self.bot.db.settings.find_one({"_id": "verification_settings"})
+        settings = await self.bot.settings.get("verification_settings")
         verified_role_id = settings.get("verified_role_id")
         verified_role = guild.get_role(verified_role_id) if verified_role_id else None
 
@@ -1093,34 +1026,24 @@ class Verification(commands.Cog):
             )
             return
 
-        cleaned = []
-        skipped = []
-
-        for member in guild.members:
-            if member.bot:
-                continue
-
-            if verified_role not in member.roles:
-                roles_to_remove = [r for r in member.roles if r != guild.default_role]
-                if roles_to_remove:
-                    try:
-                        await member.remove_roles(
-                            *roles_to_remove, reason="Niet verified, opgeschoond"
-                        )
-                        cleaned.append(member.display_name)
-
-                        # Kleine delay om rate limit te vermijden
-                        await asyncio.sleep(1.2)
-
-                    except discord.Forbidden:
-                        skipped.append(member.display_name)
-                    except discord.HTTPException as e:
-                        skipped.append(f"{member.display_name} (HTTP fout: {e})")
-
-        msg = f"✅ {len(cleaned)} leden opgeschoond."
-        if skipped:
-            msg += f"\n⚠️ {len(skipped)} leden konden niet opgeschoond worden."
+        # Runs in the background: the status message shows the progress, a restart resumes it
+        try:
+            job, message = await self.bot.member_jobs.create(
+                "cleanup_unverified",
+                guild,
+                interaction.channel,
+                interaction.user,
+                params={"verified_role_id": verified_role.id},
+                dry_run=dry_run,
+            )
+        except ValueError as e:
+            await interaction.followup.send(f"❌ {e}", ephemeral=True)
+            return
 
+        if dry_run:
+            msg = f"🔍 {len(job['member_ids'])} leden zouden opgeschoond worden: {message.jump_url}"
+        else:
+            msg = f"✅ Opschoning gestart voor {len(job['member_ids'])} leden: {message.jump_url}"
         await interaction.followup.send(msg, ephemeral=True)
 
     @app_commands.command(
@@ -1176,7 +1099,7 @@ class Verification(commands.Cog):
             )
 
             # Rol toekennen
-            settings = await self.bot.db.settings.find_one({"_id": "verification_settings"})
+            settings = await self.bot.settings.get("verification_settings")
             verified_role_id = settings.get("verified_role_id")
             role = interaction.guild.get_role(verified_role_id) if verified_role_id else None
             if role:
@@ -1209,23 +1132,14 @@ class Verification(commands.Cog):
 
 
 async def setup(bot):
-    cog = Verification(bot)
-    await bot.add_cog(cog)
+    global pending_codes
 
-    # Index maken in de achtergrond (niet blokkeren bij load)
-    async def ensure_index():
-        try:
-            await bot.wait_until_ready()
-            await bot.db.verifications.create_index(
-                "email_index",
-                unique=True,
-                partialFilterExpression={"email_index": {"$exists": True, "$type": "string"}},
-            )
-            bot.log.info("✅ email_index ensured on verifications collection")
-        except Exception as e:
-            bot.log.error(f"Failed to ensure email_index: {e}", exc_info=True)
+    if PENDING_CODE_STORE == "mongo":
+        pending_codes = MongoCodeStore(bot.db, ttl=CODE_EXPIRY)
+    pending_codes.start_sweeper()
 
-    bot.loop.create_task(ensure_index())
+    cog = Verification(bot)
+    await bot.add_cog(cog)
 
     # Start cleanup taak
     bot.loop.create_task(cog.cleanup_orphaned_records())
@@ -29,6 +29,14 @@ ENCRYPTION_KEY: Final[str] = cast(str, getenv("ENCRYPTION_KEY"))
 EMAIL_INDEX_KEY: Final[str] = cast(str, getenv("EMAIL_INDEX_KEY"))
 OLD_CONNECTION_STRING: Final[str] = cast(str, getenv("OLD_CONNECTION_STRING", ""))
 POD_UID: Final[str] = cast(str, getenv("POD_UID", ""))
+PENDING_CODE_STORE: Final[str] = cast(str, getenv("PENDING_CODE_STORE", "mongo")).lower()
+SETTINGS_CHANGE_STREAM: Final[bool] = getenv("SETTINGS_CHANGE_STREAM", "false").lower() == "true"
+LOG_QUEUE_SIZE: Final[int] = int(getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_QUEUE_OVERFLOW: Final[str] = cast(str, getenv("LOG_QUEUE_OVERFLOW", "drop_oldest")).lower()
+MONGO_SLOW_MS: Final[int] = int(getenv("MONGO_SLOW_MS", "100"))
+MONGO_EXPLAIN_NEW_SHAPES: Final[bool] = (
+    getenv("MONGO_EXPLAIN_NEW_SHAPES", "false").lower() == "true"
+)
 DISCORD_GUILD_ID_RAW = getenv("DISCORD_GUILD_ID", "").strip()
 
 if DISCORD_GUILD_ID_RAW.isdigit():
@@ -60,5 +68,11 @@ __all__: Final[Tuple[str, ...]] = (
     "ENCRYPTION_KEY",
     "OLD_CONNECTION_STRING",
     "POD_UID",
+    "PENDING_CODE_STORE",
+    "SETTINGS_CHANGE_STREAM",
+    "LOG_QUEUE_SIZE",
+    "LOG_QUEUE_OVERFLOW",
+    "MONGO_SLOW_MS",
+    "MONGO_EXPLAIN_NEW_SHAPES",
     "DISCORD_GUILD_ID",
 )
@@ -1,8 +1,11 @@
 import argparse
 import asyncio
+import atexit
+import collections
 import contextlib
 import datetime
 import logging
+import math
 import os
 import signal
 import sys
@@ -28,12 +31,17 @@ from motor.motor_asyncio import AsyncIOMotorClient
 from env import (
     BOT_TOKEN,
     DISCORD_GUILD_ID,
+    LOG_QUEUE_OVERFLOW,
+    LOG_QUEUE_SIZE,
+    MONGO_EXPLAIN_NEW_SHAPES,
+    MONGO_SLOW_MS,
     MONGODB_DB,
     MONGODB_IP_ADDRESS,
     MONGODB_PASSWORD,
     MONGODB_PORT,
     MONGODB_USERNAME,
     POD_UID,
+    SETTINGS_CHANGE_STREAM,
     WEBHOOK_URL,
 )
 from utils.errors import (
@@ -45,8 +53,18 @@ from utils.errors import (
     UnknownRole,
     UnknownUser,
 )
+from utils.indexes import index_registry
+from utils.log_pipeline import LogPipeline
+from utils.member_jobs import MemberJobEngine
+from utils.metrics import Metrics, MetricsCommandTree
+from utils.mongo_monitor import MongoMonitor, current_caller
+from utils.settings_cache import SettingsCache
 from utils.thread import ThreadManager
 
+# File and console handlers run on a listener thread; loggers only enqueue records
+log_pipeline = LogPipeline(LOG_QUEUE_SIZE, LOG_QUEUE_OVERFLOW)
+atexit.register(log_pipeline.stop)  # also flush when exiting without graceful_shutdown
+
 
 def _ensure_query_params(uri: str, extra: dict[str, str]) -> str:
     """Merge query params into a MongoDB URI correctly."""
@@ -154,7 +172,20 @@ class Responder(Protocol):
 
 
 class DiscordWebhookHandler(logging.Handler):
-    """Asynchrone, veilige en rate-limit-bewuste webhook handler voor Discord logs."""
+    """
+    Asynchrone, gebundelde en rate-limit-bewuste webhook handler voor Discord logs.
+
+    Records worden in een begrensde wachtrij gezet (bij overloop valt het oudste record
+    weg); identieke records die nog in de wachtrij staan worden samengevoegd met een
+    teller. De worker stuurt tot 10 embeds (of één bericht met meerdere regels) per POST
+    en volgt de X-RateLimit-* headers van de webhook.
+    """
+
+    QUEUE_SIZE = 500  # records in de wachtrij voordat de oudste wegvallen
+    BATCH_SIZE = 10  # Discord staat 10 embeds per bericht toe
+    EMBED_BUDGET = 5500  # Discord limiet is 6000 tekens voor alle embeds samen
+    MESSAGE_BUDGET = 1990  # Discord limiet is 2000 tekens per bericht
+    RECORD_LIMIT = 1900  # max lengte van één record
 
     def __init__(self, webhook_url, bot=None):
         super().__init__(level=logging.DEBUG)
@@ -162,14 +193,22 @@ class DiscordWebhookHandler(logging.Handler):
         self.bot = bot
         self.session = None
 
-        # Queue-based verwerking → voorkomt verloren logs
-        self.queue = asyncio.Queue()
+        # (level, logger, bericht) -> [record, bericht, aantal]; begrensd, oudste eerst
+        self.pending: "collections.OrderedDict[tuple, list]" = collections.OrderedDict()
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._sending = False
         self.worker_task = asyncio.create_task(self._worker_task())
 
+        # Tellers
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+
         # Rate-limit en retry instellingen
         self.base_delay = 2.0
         self.max_delay = 60.0
-        self.last_send_time = 0
+        self._blocked_until = 0.0
         self.failed_attempts = 0
 
         # File logger voor interne foutmeldingen
@@ -186,7 +225,7 @@ class DiscordWebhookHandler(logging.Handler):
             file_handler.setFormatter(
                 logging.Formatter("[%(asctime)s] [%(levelname)s] %(message)s")
             )
-            self._file_logger.addHandler(file_handler)
+            log_pipeline.attach(self._file_logger, file_handler)
             self._file_logger.propagate = False
 
     async def _ensure_session(self):
@@ -195,86 +234,161 @@ class DiscordWebhookHandler(logging.Handler):
             self.session = aiohttp.ClientSession()
 
     def emit(self, record):
-        """Stop logs in de async queue, zodat ze sequentieel verwerkt worden."""
+        """Zet het record in de wachtrij (thread-safe), de worker verstuurt het."""
         try:
             msg = self.format(record)
-            self.queue.put_nowait((record, msg))
+            self._loop.call_soon_threadsafe(self._enqueue, record, msg)
+        except RuntimeError:
+            pass  # Event loop is al gesloten
         except Exception:
             self.handleError(record)
 
+    def _enqueue(self, record, msg):
+        key = (record.levelname, record.name, msg)
+        entry = self.pending.get(key)
+        if entry is not None:
+            entry[2] += 1
+            self.coalesced += 1
+            return
+
+        if len(self.pending) >= self.QUEUE_SIZE:
+            self.pending.popitem(last=False)
+            self.dropped += 1
+        self.pending[key] = [record, msg, 1]
+        self._wakeup.set()
+
+    def stats(self) -> dict:
+        """Tellers van de handler."""
+        return {
+            "queued": len(self.pending),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+        }
+
     async def _worker_task(self):
-        """Werker die logs veilig en sequentieel naar Discord stuurt."""
+        """Werker die de wachtrij in batches naar Discord stuurt."""
         while True:
-            record, msg = await self.queue.get()
-            try:
-                await self._async_emit(record, msg)
-            except Exception as e:
-                self._file_logger.error(f"WEBHOOK Worker error: {type(e).__name__}: {e}")
-            finally:
-                self.queue.task_done()
-
-    async def _async_emit(self, record, msg):
-        """Zend één logbericht naar Discord, met rate limiting en retry logic."""
-        await self._ensure_session()
-        webhook = discord.Webhook.from_url(self.webhook_url, session=self.session)
+            await self._wakeup.wait()
+            self._wakeup.clear()
 
-        # Basic throttling (max 1 bericht per 2 seconden)
-        now = time.time()
-        elapsed = now - self.last_send_time
-        if elapsed < 2:
-            await asyncio.sleep(2 - elapsed)
-        self.last_send_time = time.time()
+            while self.pending:
+                self._sending = True
+                try:
+                    await self._wait_for_rate_limit()
+                    format_type = await self._get_webhook_format()
+                    payload, count = self._take_batch(format_type)
+                    await self._send(payload, count)
+                except Exception as e:
+                    self._file_logger.error(f"WEBHOOK Worker error: {type(e).__name__}: {e}")
+                finally:
+                    self._sending = False
+
+    async def _wait_for_rate_limit(self):
+        delay = self._blocked_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _take_batch(self, format_type):
+        """Haal de volgende batch uit de wachtrij en bouw de webhook payload."""
+        embeds = []
+        lines = []
+        used = 0
+
+        while self.pending and len(embeds) + len(lines) < self.BATCH_SIZE:
+            record, msg, count = next(iter(self.pending.values()))
+
+            # Truncate lange berichten (Discord limiet)
+            if len(msg) > self.RECORD_LIMIT:
+                msg = msg[: self.RECORD_LIMIT] + "…"
+
+            if format_type == "plaintext":
+                timestamp = datetime.datetime.now().strftime("%H:%M:%S")
+                line = f"[{record.levelname}] [{timestamp}] {msg}"
+                if count > 1:
+                    line += f" (×{count})"
+                budget, size = self.MESSAGE_BUDGET - 8, len(line) + 1
+            else:
+                budget, size = self.EMBED_BUDGET, len(msg) + 40
 
-        # Truncate lange berichten (Discord limiet)
-        if len(msg) > 1900:
-            msg = msg[:1900] + "…"
+            if used and used + size > budget:
+                break
+            used += size
+            self.pending.popitem(last=False)
 
-        format_type = await self._get_webhook_format()
-        color = self._get_color(record.levelname)
+            if format_type == "plaintext":
+                lines.append(line)
+            else:
+                embed = discord.Embed(
+                    title="Log Entry",
+                    description=f"```{msg}```",
+                    color=self._get_color(record.levelname),
+                    timestamp=datetime.datetime.fromtimestamp(record.created, datetime.UTC),
+                )
+                embed.add_field(name="Level", value=record.levelname, inline=True)
+                embed.add_field(name="Logger", value=record.name, inline=True)
+                if count > 1:
+                    embed.add_field(name="Herhaald", value=f"{count}×", inline=True)
+                embeds.append(embed.to_dict())
+
+        if lines:
+            return {"content": "```\n" + "\n".join(lines) + "\n```"}, len(lines)
+        return {"embeds": embeds}, len(embeds)
+
+    def _update_rate_limit(self, headers):
+        """Volg de X-RateLimit-* headers: wacht tot de reset als de bucket leeg is."""
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset_after = headers.get("X-RateLimit-Reset-After")
+        if remaining == "0" and reset_after:
+            self._blocked_until = time.monotonic() + float(reset_after)
+
+    async def _send(self, payload, count):
+        """Stuur één batch naar Discord, met retry bij rate limits en netwerkfouten."""
+        await self._ensure_session()
 
         for attempt in range(3):  # max 3 pogingen
             try:
-                if format_type == "plaintext":
-                    timestamp = datetime.datetime.now().strftime("%H:%M:%S")
-                    content = f"[{record.levelname}] [{timestamp}] {msg}"
-                    await webhook.send(content=f"```\n{content}\n```")
-                else:
-                    embed = discord.Embed(
-                        title="Log Entry",
-                        description=f"```{msg}```",
-                        color=color,
-                        timestamp=datetime.datetime.now(datetime.UTC),
-                    )
-                    embed.add_field(name="Level", value=record.levelname, inline=True)
-                    embed.add_field(name="Logger", value=record.name, inline=True)
-                    await webhook.send(embed=embed)
+                async with self.session.post(self.webhook_url, json=payload) as resp:
+                    self._update_rate_limit(resp.headers)
+
+                    if resp.status == 429:  # Rate limited
+                        self.failed_attempts += 1
+                        data = await resp.json(content_type=None)
+                        retry_after = float(
+                            data.get("retry_after") or resp.headers.get("Retry-After") or 1
+                        )
+                        self._blocked_until = time.monotonic() + retry_after
+                        self._file_logger.warning(
+                            f"WEBHOOK rate limit (429) — retry {attempt+1}/3 after {retry_after:.1f}s"
+                        )
+                        await self._wait_for_rate_limit()
+                        continue
+
+                    if resp.status >= 400:
+                        text = await resp.text()
+                        self._file_logger.error(f"WEBHOOK HTTP error {resp.status}: {text}")
+                        self.dropped += count
+                        return
 
                 self.failed_attempts = 0
+                self.sent += count
                 return  # ✅ succes
 
-            except discord.HTTPException as e:
-                if e.status == 429:  # Rate limited
-                    self.failed_attempts += 1
-                    delay = min(self.base_delay * (2**attempt), self.max_delay)
-                    self._file_logger.warning(
-                        f"WEBHOOK rate limit (429) — retry {attempt+1}/3 after {delay:.1f}s"
-                    )
-                    await asyncio.sleep(delay)
-                else:
-                    self._file_logger.error(f"WEBHOOK HTTP error {e.status}: {e.text}")
-                    return
-            except Exception as e:
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
                 self.failed_attempts += 1
                 self._file_logger.error(f"WEBHOOK Unexpected error: {type(e).__name__}: {e}")
                 await asyncio.sleep(min(self.base_delay * (2**attempt), self.max_delay))
+
+        self.dropped += count
         self._file_logger.error("WEBHOOK gave up after max retries.")
 
     async def _get_webhook_format(self):
         """Haal log-formaat op uit de database."""
         if self.bot:
             try:
-                settings = await self.bot.db.settings.find_one({"_id": "server_settings"}) or {}
-                return settings.get("webhook_log_format", "embed")
+                return await self.bot.settings.get_value(
+                    "server_settings", "webhook_log_format", "embed"
+                )
             except Exception:
                 return "embed"
         return "embed"
@@ -288,14 +402,20 @@ class DiscordWebhookHandler(logging.Handler):
             "ERROR": discord.Color.red(),
             "CRITICAL": discord.Color.dark_red(),
         }
-        return colors.get(levelname, discord.Color.default())
-
-    async def async_close(self):
-        """Netjes afsluiten van sessie en queue."""
-        await self.queue.join()
+        return colors.get(levelname, discord.Color.default()).value
+
+    async def async_close(self, timeout: float = 10.0):
+        """Netjes afsluiten: wachtrij leegmaken (max `timeout` seconden) en sessie sluiten."""
+        deadline = time.monotonic() + timeout
+        while (self.pending or self._sending) and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        self.worker_task.cancel()
         if self.session and not self.session.closed:
             await self.session.close()
-        self._file_logger.info("WEBHOOK handler closed cleanly.")
+        self._file_logger.info(
+            f"WEBHOOK handler closed: {self.sent} sent, {self.dropped} dropped, "
+            f"{self.coalesced} coalesced, {len(self.pending)} left in queue."
+        )
 
     def close(self):
         """Compatibiliteit met sync shutdowns."""
@@ -316,12 +436,20 @@ class Bot(commands.Bot):
         if args.tls:
             uri = _ensure_query_params(uri, {"tls": "true", "tlsInsecure": "true"})
 
+        # Slow-operation log, per-collection percentiles and collection scan detection; also
+        # the source of the MongoDB timings in /metrics, so every command is tracked once
+        self.mongo_monitor = MongoMonitor(MONGO_SLOW_MS, MONGO_EXPLAIN_NEW_SHAPES)
+        # Metrics for /metrics on the health server
+        self.metrics = Metrics(self.mongo_monitor)
+
         motor = AsyncIOMotorClient(
             uri,
             connect=True,
+            event_listeners=[self.mongo_monitor],
         )
         motor.get_io_loop = asyncio.get_running_loop
         self.db = motor[db_name]
+        self.settings = SettingsCache(self.db, follow_changes=SETTINGS_CHANGE_STREAM)
         # ===== End MongoDB init =====
 
         self.color = discord.Color.blurple()
@@ -360,6 +488,7 @@ class Bot(commands.Bot):
             chunk_guilds_at_startup=True,
             auto_sync_commands=True,
             intents=intents,
+            tree_cls=MetricsCommandTree,
         )
 
         self.session = aiohttp.ClientSession(loop=loop)
@@ -369,6 +498,7 @@ class Bot(commands.Bot):
         self.status = discord.Status.online
 
         self.threads = ThreadManager(self)
+        self.member_jobs = MemberJobEngine(self)
 
         # Initialize persistent view manager
         try:
@@ -392,16 +522,17 @@ class Bot(commands.Bot):
             backupCount=1,
         )
         file_handler.setFormatter(PodUidFormatter())
-        self.log.addHandler(file_handler)
 
         console_handler = logging.StreamHandler()
         console_handler.setFormatter(PodUidFormatter())
-        self.log.addHandler(console_handler)
+
+        # Formatting, writing and rotating happen on the listener thread, not the event loop
+        log_pipeline.attach(self.log, file_handler, console_handler)
 
         # Add a console handler to log to the console as well.
         discord_log = logging.getLogger("discord")
         discord_log.setLevel(logging.WARNING)
-        discord_log.addHandler(console_handler)
+        log_pipeline.attach(discord_log, console_handler)
 
         self.__started = False
         self.owner_ids: frozenset[int] = frozenset()  # Will be loaded from database
@@ -452,11 +583,32 @@ class Bot(commands.Bot):
                 except Exception:
                     self.log.critical(f"Couldn't load {m} cog", exc_info=True)
 
+    def dispatch(self, event_name: str, /, *args, **kwargs) -> None:
+        # Handler tasks copy the context, so their queries are attributed to the event
+        token = current_caller.set(f"on_{event_name}")
+        try:
+            super().dispatch(event_name, *args, **kwargs)
+        finally:
+            current_caller.reset(token)
+
+    async def invoke(self, ctx: commands.Context) -> None:
+        if ctx.command is not None:
+            current_caller.set(f"?{ctx.command.qualified_name} ({ctx.command.cog_name})")
+        await super().invoke(ctx)
+
     async def setup_hook(self) -> None:
+        self.mongo_monitor.start(self.db.client)
+        await self.check_db_connection()
+        # Fill the settings cache before the cogs load: their setup tasks read it right away
+        await self.settings.load()
         await self.load_extension("cogs.confessions.confession_commands")
         await self.load_extension("cogs.moderation.moderation_commands")
         await self.__load_cogs()
-        await self.check_db_connection()
+        # Every module has declared its indexes by now (at import / cog setup)
+        await index_registry.apply(self.db)
+        asyncio.create_task(index_registry.find_collection_scans(self.db))
+        # Cogs registered their job kinds; resume jobs a restart interrupted
+        self.member_jobs.start()
         await self.load_developer_ids()
         await self.setup_health_check()
 
@@ -526,10 +678,7 @@ class Bot(commands.Bot):
 
     async def get_guild_id(self) -> typing.Optional[int]:
         """Get guild ID from database configuration."""
-        settings = await self.db.settings.find_one({"_id": "server_settings"})
-        if settings and "guild_id" in settings:
-            return settings["guild_id"]
-        return None
+        return await self.settings.get_value("server_settings", "guild_id")
 
     async def load_guild_id(self):
         """Auto-detect guild ID from the guilds the bot is in."""
@@ -556,7 +705,7 @@ class Bot(commands.Bot):
 
     async def load_developer_ids(self):
         """Load developer IDs from database configuration."""
-        settings = await self.db.settings.find_one({"_id": "server_settings"})
+        settings = await self.settings.get("server_settings")
         if settings and "developer_ids" in settings:
             self.owner_ids = frozenset(settings["developer_ids"])
             self.log.info(f"Loaded {len(self.owner_ids)} developer IDs from database")
@@ -566,8 +715,7 @@ class Bot(commands.Bot):
     async def is_owner(self, user: discord.abc.User) -> bool:
         """Check if a user is a developer/owner of the bot."""
         # First check if developer IDs are configured in database
-        settings = await self.db.settings.find_one({"_id": "server_settings"})
-        developer_ids = settings.get("developer_ids", []) if settings else []
+        developer_ids = await self.settings.get_value("server_settings", "developer_ids", [])
 
         if developer_ids:
             return user.id in developer_ids
@@ -590,8 +738,7 @@ class Bot(commands.Bot):
             return True
 
         # Use the same logic as the developer() decorator
-        settings = await self.db.settings.find_one({"_id": "server_settings"})
-        developer_ids = settings.get("developer_ids", []) if settings else []
+        developer_ids = await self.settings.get_value("server_settings", "developer_ids", [])
 
         # If developers are configured, check if user is in the list
         if developer_ids:
@@ -804,9 +951,14 @@ class Bot(commands.Bot):
 
         return True
 
+    async def on_app_command_completion(self, interaction: Interaction, command):
+        self.metrics.command_finished(interaction, "ok")
+
     async def on_application_command_error(
         self, interaction: Interaction, error: app_commands.AppCommandError
     ):
+        self.metrics.command_finished(interaction, "error")
+
         respond = (
             interaction.response.send_message
             if not interaction.response.is_done()
@@ -1022,6 +1174,20 @@ class Bot(commands.Bot):
 
             # Step 4: Close other services (but keep webhook logging available)
             # Close database connection
+            await self.settings.close()
+            if self.persistent_view_manager:
+                self.persistent_view_manager.stop()
+            self.metrics.stop()
+
+            # Write infractions that are still buffered before the client goes away
+            from cogs.moderation.infraction_writer import close_infraction_writers
+
+            await close_infraction_writers()
+            self.log.info("Buffered infractions written")
+
+            # Save the progress of running member jobs so they resume after the restart
+            await self.member_jobs.close()
+
             if hasattr(self, "db") and self.db is not None:
                 self.db.client.close()
                 self.log.info("Database connection closed")
@@ -1059,6 +1225,13 @@ class Bot(commands.Bot):
             self.log.error(f"Error during graceful shutdown: {e}")
 
         self.log.info("Graceful shutdown completed")
+        # Write everything that is still queued to bot.log / the console; later records
+        # are written directly
+        log_pipeline.stop()
+        if log_pipeline.dropped:
+            self.log.warning(
+                f"{log_pipeline.dropped} log record(s) dropped because the log queue was full"
+            )
 
     async def setup_health_check(self):
         async def health_handler(request):
@@ -1075,8 +1248,17 @@ class Bot(commands.Bot):
             status_code = 200 if is_ready else 503
             return web.json_response(data, status=status_code)
 
+        async def metrics_handler(request):
+            return web.Response(
+                text=self.metrics.render(), content_type="text/plain", charset="utf-8"
+            )
+
+        self._register_gauges()
+        self.metrics.start()
+
         app = web.Application()
         app.router.add_get("/health", health_handler)
+        app.router.add_get("/metrics", metrics_handler)
 
         runner = web.AppRunner(app)
         await runner.setup()
@@ -1085,6 +1267,52 @@ class Bot(commands.Bot):
         await self.site.start()
         self.log.info("Health check endpoint started on http://0.0.0.0:3000/health")
 
+    def _register_gauges(self):
+        """Gauges read from the bot's own state on every /metrics scrape."""
+
+        def gateway_latency():
+            return self.latency if math.isfinite(self.latency) else None
+
+        def webhook_queue():
+            totals = collections.Counter()
+            for handler in self.log.handlers:
+                if isinstance(handler, DiscordWebhookHandler):
+                    totals.update(handler.stats())
+            return {(("state", state),): count for state, count in totals.items()}
+
+        def scheduled_backlog():
+            cog = self.get_cog("ModCommands")
+            if cog is None:
+                return None
+            now = datetime.datetime.now(datetime.timezone.utc)
+            backlog = {}
+            for kind, scheduler in (("unmute", cog.tasks.unmutes), ("unban", cog.tasks.unbans)):
+                entries = list(scheduler.entries.values())
+                overdue = sum(1 for doc in entries if doc[scheduler.time_field] <= now)
+                backlog[(("kind", kind), ("state", "pending"))] = len(entries)
+                backlog[(("kind", kind), ("state", "overdue"))] = overdue
+            return backlog
+
+        self.metrics.gauge(
+            "bot_gateway_latency_seconds", "Discord gateway heartbeat latency", gateway_latency
+        )
+        self.metrics.gauge(
+            "bot_event_loop_lag_last_seconds",
+            "Most recent event loop lag sample",
+            lambda: self.metrics.last_loop_lag,
+        )
+        self.metrics.gauge(
+            "bot_webhook_log_records", "Webhook log handler queue depth and totals", webhook_queue
+        )
+        self.metrics.gauge(
+            "bot_modmail_threads_cached", "Modmail threads in the cache", lambda: len(self.threads)
+        )
+        self.metrics.gauge(
+            "bot_scheduled_expiries",
+            "Scheduled unmutes/unbans waiting to be processed",
+            scheduled_backlog,
+        )
+
 
 def main():
     """Main entry point for the bot."""
@@ -16,21 +16,30 @@ Usage:
     python migrate.py              # Run full migration
     python migrate.py --test       # Test connections only
     python migrate.py --dry-run    # Show what would be migrated without doing it
+    python migrate.py --workers 4  # Migrate up to 4 collections at the same time
+    python migrate.py --restart    # Ignore checkpoints and start from the beginning
 
 Safety features:
 - Tests database connections before starting
-- Skips already migrated records
+- Skips already migrated records (upserts keyed on user_id / old_warn_id)
+- Resumes an interrupted run from the last checkpointed _id
 - Provides verification after migration
 - Maintains references to old records for rollback if needed
 """
 
+import argparse
 import asyncio
 import sys
+import time
 import urllib.parse
 from datetime import datetime
+from typing import Awaitable, Callable, NamedTuple, Optional
 
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 
+from utils.infraction_counts import update_infraction_counts
 from utils.timezone import LOCAL_TIMEZONE
 
 # Add the DiscordTI-bot directory to the path to import env
@@ -50,8 +59,23 @@ except ImportError:
     sys.exit(1)
 
 
+BATCH_SIZE = 1000  # records read and written per round trip
+DEFAULT_WORKERS = 2  # collections migrated concurrently
+DEFAULT_GUILD_ID = 771394209419624489  # mainServerID from old emailVerification.py
+
+
+class MigrationJob(NamedTuple):
+    name: str
+    source: str  # collection in the old database
+    target: str  # collection in the new database
+    key: str  # field in the new documents that identifies a migrated record
+    projection: dict
+    transform: Callable[[dict], dict]
+    after_insert: Optional[Callable[..., Awaitable]] = None
+
+
 class DatabaseMigrator:
-    def __init__(self):
+    def __init__(self, workers: int = DEFAULT_WORKERS):
         # Setup new database connection
         mongodb_password = urllib.parse.quote_plus(MONGODB_PASSWORD)
         mongodb_username = urllib.parse.quote_plus(MONGODB_USERNAME)
@@ -68,6 +92,10 @@ class DatabaseMigrator:
         self.old_client = AsyncIOMotorClient(OLD_CONNECTION_STRING)
         self.old_db = self.old_client["TIBot"]
 
+        # Progress per job, so an interrupted migration can resume
+        self.checkpoints = self.new_db["migration_checkpoints"]
+        self.workers = asyncio.Semaphore(workers)
+
         print("Database connections initialized")
 
     async def test_connections(self):
@@ -86,127 +114,160 @@ class DatabaseMigrator:
             return False
         return True
 
-    async def migrate_email_hashes(self, dry_run=False):
-        """Migrate email hashes from old emailData to new oldEmails collection"""
-        print("\n=== Migrating Email Hashes ===")
-        if dry_run:
-            print("DRY RUN MODE - No actual changes will be made")
-
-        try:
-            # Get all email data from old database
-            old_email_data = self.old_db["emailData"]
-            email_records = await old_email_data.find({}).to_list(length=None)
-
-            if not email_records:
-                print("No email records found in old database")
-                return
-
-            print(f"Found {len(email_records)} email records to migrate")
-
-            # Prepare records for new database
-            old_emails_collection = self.new_db["oldEmails"]
-            migrated_count = 0
-            skipped_count = 0
-
-            for record in email_records:
-                try:
-                    # Check if already migrated
-                    existing = await old_emails_collection.find_one({"user_id": record["_id"]})
-                    if existing:
-                        print(f"Skipping user {record['_id']} - already migrated")
-                        skipped_count += 1
-                        continue
-
-                    # Create new record structure
-                    new_record = {
-                        "user_id": record["_id"],  # Discord user ID
-                        "email_hash": record["emailHash"],  # Original email hash
-                        "migrated_at": datetime.now(LOCAL_TIMEZONE),
-                    }
-
-                    if not dry_run:
-                        await old_emails_collection.insert_one(new_record)
-                    migrated_count += 1
-                    print(
-                        f"{'[DRY RUN] Would migrate' if dry_run else 'Migrated'} email hash for user {record['_id']}"
-                    )
-
-                except Exception as e:
-                    print(
-                        f"Error migrating email record for user {record.get('_id', 'unknown')}: {e}"
-                    )
-                    continue
-
-            print(f"Email migration completed: {migrated_count} migrated, {skipped_count} skipped")
+    async def _load_checkpoint(self, job: MigrationJob, restart: bool):
+        if restart:
+            await self.checkpoints.delete_one({"_id": job.name})
+            return None
+        return await self.checkpoints.find_one({"_id": job.name})
+
+    async def _save_checkpoint(self, job: MigrationJob, last_id, migrated: int, skipped: int):
+        await self.checkpoints.update_one(
+            {"_id": job.name},
+            {
+                "$set": {"last_id": last_id, "updated_at": datetime.now(LOCAL_TIMEZONE)},
+                "$inc": {"migrated": migrated, "skipped": skipped},
+            },
+            upsert=True,
+        )
+
+    async def _write_batch(self, job: MigrationJob, batch: list, dry_run: bool):
+        """Upsert a batch keyed on the job's key field; returns (migrated, skipped)."""
+        target = self.new_db[job.target]
+        documents = [job.transform(record) for record in batch]
 
-        except Exception as e:
-            print(f"Error during email migration: {e}")
-            raise
-
-    async def migrate_warns(self, dry_run=False):
-        """Migrate warns from old warnData to new infractions collection"""
-        print("\n=== Migrating Warns ===")
         if dry_run:
-            print("DRY RUN MODE - No actual changes will be made")
-
+            # Only the records that aren't in the new database yet would be migrated
+            keys = [document[job.key] for document in documents]
+            cursor = target.find({job.key: {"$in": keys}}, {job.key: 1, "_id": 0})
+            existing = {document[job.key] async for document in cursor}
+            migrated = sum(1 for key in keys if key not in existing)
+            return migrated, len(batch) - migrated
+
+        # $setOnInsert: records that were migrated before are left untouched
+        operations = [
+            UpdateOne({job.key: document[job.key]}, {"$setOnInsert": document}, upsert=True)
+            for document in documents
+        ]
         try:
-            # Get all warn data from old database
-            old_warn_data = self.old_db["warnData"]
-            warn_records = await old_warn_data.find({}).to_list(length=None)
-
-            if not warn_records:
-                print("No warn records found in old database")
+            result = await target.bulk_write(operations, ordered=False)
+            upserted = result.upserted_ids
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", [])[:5]:
+                print(
+                    f"[{job.name}] Error migrating record {batch[error['index']]['_id']}: {error.get('errmsg')}"
+                )
+            upserted = {item["index"]: item["_id"] for item in e.details.get("upserted", [])}
+
+        if job.after_insert is not None and upserted:
+            await job.after_insert(target, [documents[index] for index in upserted])
+        return len(upserted), len(batch) - len(upserted)
+
+    async def migrate_collection(self, job: MigrationJob, dry_run=False, restart=False):
+        """
+        Stream one source collection into the new database.
+
+        Records are read in _id order with a projection, BATCH_SIZE at a time, and written
+        with one unordered bulk upsert per batch. After every batch the last _id is saved,
+        so an interrupted run continues where it stopped.
+        """
+        async with self.workers:
+            print(f"\n=== Migrating {job.name} ({job.source} -> {job.target}) ===")
+            if dry_run:
+                print("DRY RUN MODE - No actual changes will be made")
+
+            source = self.old_db[job.source]
+            query = {}
+            checkpoint = None if dry_run else await self._load_checkpoint(job, restart)
+            if checkpoint and checkpoint.get("last_id") is not None:
+                query = {"_id": {"$gt": checkpoint["last_id"]}}
+                print(f"[{job.name}] Resuming after _id {checkpoint['last_id']}")
+
+            total = await source.count_documents(query)
+            if not total:
+                print(f"[{job.name}] Nothing (left) to migrate")
                 return
 
-            print(f"Found {len(warn_records)} warn records to migrate")
-
-            # Prepare records for new database
-            infractions_collection = self.new_db["infractions"]
-            migrated_count = 0
-            skipped_count = 0
-
-            # Default guild ID (you may need to adjust this)
-            DEFAULT_GUILD_ID = 771394209419624489  # mainServerID from old emailVerification.py
-
-            for record in warn_records:
-                try:
-                    # Check if already migrated (using old warn ID as reference)
-                    existing = await infractions_collection.find_one({"old_warn_id": record["_id"]})
-                    if existing:
-                        print(f"Skipping warn {record['_id']} - already migrated")
-                        skipped_count += 1
-                        continue
-
-                    # Create new infraction record structure (matching moderation.py log_infraction)
-                    new_record = {
-                        "guild_id": DEFAULT_GUILD_ID,  # Default guild ID
-                        "user_id": record["userID"],
-                        "moderator_id": record.get(
-                            "staffmember", 0
-                        ),  # Staff member who issued the warn
-                        "type": "warn",
-                        "reason": record["reason"],
-                        "timestamp": record["timestamp"],
-                        "old_warn_id": record["_id"],  # Keep reference to old warn ID
-                        "migrated_at": datetime.now(LOCAL_TIMEZONE),
-                    }
-
-                    if not dry_run:
-                        await infractions_collection.insert_one(new_record)
-                    migrated_count += 1
-                    print(
-                        f"{'[DRY RUN] Would migrate' if dry_run else 'Migrated'} warn {record['_id']} for user {record['userID']}"
+            cursor = source.find(query, job.projection).sort("_id", 1).batch_size(BATCH_SIZE)
+            started = time.monotonic()
+            processed = migrated = skipped = 0
+            batch = []
+
+            async def flush():
+                nonlocal processed, migrated, skipped
+                batch_migrated, batch_skipped = await self._write_batch(job, batch, dry_run)
+                if not dry_run:
+                    await self._save_checkpoint(
+                        job, batch[-1]["_id"], batch_migrated, batch_skipped
                     )
+                processed += len(batch)
+                migrated += batch_migrated
+                skipped += batch_skipped
+                batch.clear()
+
+                elapsed = time.monotonic() - started
+                rate = processed / elapsed if elapsed else 0.0
+                eta = (total - processed) / rate if rate else 0.0
+                print(f"[{job.name}] {processed}/{total} ({rate:.0f} records/s, ETA {eta:.0f}s)")
+
+            async for record in cursor:
+                batch.append(record)
+                if len(batch) >= BATCH_SIZE:
+                    await flush()
+            if batch:
+                await flush()
+
+            elapsed = time.monotonic() - started
+            print(
+                f"{job.name} migration completed in {elapsed:.1f}s: "
+                f"{migrated} {'would be migrated' if dry_run else 'migrated'}, {skipped} skipped"
+            )
 
-                except Exception as e:
-                    print(f"Error migrating warn record {record.get('_id', 'unknown')}: {e}")
-                    continue
-
-            print(f"Warns migration completed: {migrated_count} migrated, {skipped_count} skipped")
-
-        except Exception as e:
-            print(f"Error during warns migration: {e}")
-            raise
+    def jobs(self):
+        """The collections to migrate from the old bot."""
+        return [
+            MigrationJob(
+                name="email_hashes",
+                source="emailData",
+                target="oldEmails",
+                key="user_id",
+                projection={"emailHash": 1},
+                transform=lambda record: {
+                    "user_id": record["_id"],  # Discord user ID
+                    "email_hash": record["emailHash"],  # Original email hash
+                    "migrated_at": datetime.now(LOCAL_TIMEZONE),
+                },
+            ),
+            MigrationJob(
+                name="warns",
+                source="warnData",
+                target="infractions",
+                key="old_warn_id",
+                projection={"userID": 1, "staffmember": 1, "reason": 1, "timestamp": 1},
+                # Same structure as log_infraction in the moderation cog
+                transform=lambda record: {
+                    "guild_id": DEFAULT_GUILD_ID,
+                    "user_id": record["userID"],
+                    "moderator_id": record.get("staffmember", 0),
+                    "type": "warn",
+                    "reason": record["reason"],
+                    "timestamp": record["timestamp"],
+                    "old_warn_id": record["_id"],  # Keep reference to old warn ID
+                    "migrated_at": datetime.now(LOCAL_TIMEZONE),
+                },
+                # Keep the per-user counters shown by /history in sync
+                after_insert=update_infraction_counts,
+            ),
+        ]
+
+    async def migrate_all(self, dry_run=False, restart=False):
+        """Migrate every collection, at most `workers` at the same time."""
+        if not dry_run:
+            # The upserts look records up by these keys
+            await self.new_db["oldEmails"].create_index("user_id")
+            await self.new_db["infractions"].create_index("old_warn_id", sparse=True)
+        await asyncio.gather(
+            *(self.migrate_collection(job, dry_run, restart) for job in self.jobs())
+        )
 
     async def verify_migration(self):
         """Verify the migration was successful"""
@@ -253,19 +314,25 @@ async def main():
     print()
 
     # Parse command line arguments
-    test_mode = False
-    dry_run = False
-
-    if len(sys.argv) > 1:
-        if sys.argv[1] == "--test":
-            print("Running in test mode - only testing database connections")
-            test_mode = True
-        elif sys.argv[1] == "--dry-run":
-            print("Running in dry-run mode - showing what would be migrated without making changes")
-            dry_run = True
-        elif sys.argv[1] in ["--help", "-h"]:
-            print(__doc__)
-            return
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--test", action="store_true", help="only test the database connections")
+    parser.add_argument("--dry-run", action="store_true", help="don't write anything")
+    parser.add_argument(
+        "--workers", type=int, default=DEFAULT_WORKERS, help="collections migrated concurrently"
+    )
+    parser.add_argument(
+        "--restart", action="store_true", help="ignore saved checkpoints and start over"
+    )
+    args = parser.parse_args()
+
+    test_mode = args.test
+    dry_run = args.dry_run
+    if test_mode:
+        print("Running in test mode - only testing database connections")
+    elif dry_run:
+        print("Running in dry-run mode - showing what would be migrated without making changes")
 
     if not test_mode and not dry_run:
         # Confirm before proceeding with actual migration
@@ -274,7 +341,7 @@ async def main():
             print("Migration cancelled.")
             return
 
-    migrator = DatabaseMigrator()
+    migrator = DatabaseMigrator(workers=max(1, args.workers))
 
     try:
         # Test connections
@@ -287,8 +354,7 @@ async def main():
             return
 
         # Perform migrations
-        await migrator.migrate_email_hashes(dry_run=dry_run)
-        await migrator.migrate_warns(dry_run=dry_run)
+        await migrator.migrate_all(dry_run=dry_run, restart=args.restart)
 
         # Verify migration (only if not dry run)
         if not dry_run:
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the verification records cleanup with synthetic records.
+
+Fills a throwaway database with verification records (by default 50k, of which 2%
+belong to users that left) and times:
+
+1. the old cleanup: one `delete_one` per record whose member is gone
+2. a full sweep: one projected pass plus `delete_many` in batches
+3. the restart path: removing the members missing from the member snapshot
+
+Needs a running MongoDB; the database is dropped afterwards.
+
+Usage: python scripts/bench_verification_cleanup.py [--uri mongodb://localhost:27017] [--records 50000]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.verification_cleanup import (  # noqa: E402
+    pack_member_ids,
+    remove_records,
+    sweep_orphaned_records,
+    unpack_member_ids,
+)
+
+DATABASE = "bench_verification_cleanup"
+FIRST_ID = 200_000_000_000_000_000  # realistic snowflake range
+
+
+async def fill(collection, records: int, left_fraction: float):
+    """Insert `records` synthetic verifications; returns the IDs of the current members."""
+    await collection.drop()
+    await collection.create_index("user_id")
+    user_ids = random.sample(range(FIRST_ID, FIRST_ID + records * 100), records)
+    documents = [
+        {"user_id": user_id, "email_index": f"{user_id:x}", "encrypted_email": "x" * 100}
+        for user_id in user_ids
+    ]
+    for i in range(0, len(documents), 10_000):
+        await collection.insert_many(documents[i : i + 10_000], ordered=False)
+    left = set(random.sample(user_ids, int(records * left_fraction)))
+    return set(user_ids) - left
+
+
+async def old_cleanup(collection, members: set) -> int:
+    removed = 0
+    async for record in collection.find({}):
+        if record["user_id"] not in members:
+            result = await collection.delete_one({"user_id": record["user_id"]})
+            removed += result.deleted_count
+    return removed
+
+
+async def timed(name: str, coroutine):
+    started = time.perf_counter()
+    result = await coroutine
+    print(f"{name:<28} {time.perf_counter() - started:8.3f}s  -> {result}")
+    return result
+
+
+async def main(uri: str, records: int, left_fraction: float):
+    client = AsyncIOMotorClient(uri, serverSelectionTimeoutMS=3000)
+    collection = client[DATABASE].verifications
+    try:
+        print(f"{records} records, {left_fraction:.0%} of the users left\n")
+
+        members = await fill(collection, records, left_fraction)
+        await timed("old: delete_one per orphan", old_cleanup(collection, members))
+
+        members = await fill(collection, records, left_fraction)
+        await timed("full sweep", sweep_orphaned_records(collection, members.__contains__))
+
+        # Restart: the snapshot still has everyone, the cache misses the users that left
+        members = await fill(collection, records, left_fraction)
+        snapshot = pack_member_ids(await collection.distinct("user_id"))
+        print(f"{'snapshot size':<28} {len(snapshot) / 1024:8.1f} KiB")
+
+        async def restart_path():
+            return await remove_records(collection, unpack_member_ids(snapshot) - members)
+
+        await timed("restart: snapshot diff", restart_path())
+    finally:
+        await client.drop_database(DATABASE)
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--uri", default=os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--records", type=int, default=50_000)
+    parser.add_argument("--left", type=float, default=0.02, help="fraction of users that left")
+    args = parser.parse_args()
+    asyncio.run(main(args.uri, args.records, args.left))
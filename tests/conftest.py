@@ -0,0 +1,8 @@
+import os
+
+from cryptography.fernet import Fernet
+
+# env.py reads these at import time; the tests never use real credentials
+os.environ.setdefault("ENCRYPTION_KEY", Fernet.generate_key().decode())
+os.environ.setdefault("EMAIL_INDEX_KEY", "test")
+os.environ.setdefault("MONGODB_DB", "test")
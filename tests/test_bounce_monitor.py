@@ -0,0 +1,202 @@
+"""
+BounceMonitor against an in-process IMAP stand-in.
+
+The stand-in speaks just enough IMAP4rev1 for the monitor (LOGIN, CAPABILITY, SELECT,
+UID SEARCH, UID FETCH with literals, IDLE/DONE, LOGOUT) and records every FETCH, so
+the tests can check which messages were only read by their headers.
+"""
+
+import asyncio
+import re
+import time
+
+from utils import bounce_monitor
+from utils.bounce_monitor import BounceMonitor
+
+ADDRESS = "student@student.hogent.be"
+
+DSN = """Return-Path: <>
+Subject: Undelivered Mail Returned to Sender
+Content-Type: multipart/report; report-type=delivery-status; boundary="B"
+
+--B
+Content-Type: text/plain
+
+Your message E-mail verificatie test - {test_id} could not be delivered.
+--B
+Content-Type: message/delivery-status
+
+Reporting-MTA: dns; mail.example.org
+
+Final-Recipient: rfc822; {address}
+Action: {action}
+Status: {status}
+
+--B--
+"""
+
+NORMAL = b"Subject: Hallo\r\nFrom: someone@example.org\r\n\r\nGewoon een bericht.\r\n"
+
+
+def dsn(test_id: str, action: str = "failed", status: str = "5.1.1") -> bytes:
+    text = DSN.format(test_id=test_id, address=ADDRESS, action=action, status=status)
+    return text.replace("\n", "\r\n").encode()
+
+
+class ImapStandIn:
+    def __init__(self, idle: bool = True):
+        self.idle = idle
+        self.messages = {10: NORMAL}
+        self.uid_next = 11
+        self.idlers = []
+        self.idle_count = 0
+        self.fetches = []  # (uids, item)
+
+    async def start(self) -> int:
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+
+    def deliver(self, raw: bytes):
+        self.messages[self.uid_next] = raw
+        self.uid_next += 1
+        for writer in self.idlers:
+            writer.write(f"* {len(self.messages)} EXISTS\r\n".encode())
+
+    def body_fetches(self):
+        return [uids for uids, item in self.fetches if "HEADER" not in item]
+
+    async def handle(self, reader, writer):
+        writer.write(b"* OK IMAP stand-in ready\r\n")
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            tag, command = line.decode().rstrip("\r\n").split(" ", 1)
+            upper = command.upper()
+
+            if upper.startswith("LOGIN"):
+                writer.write(f"{tag} OK LOGIN completed\r\n".encode())
+            elif upper == "CAPABILITY":
+                capabilities = "IMAP4rev1 IDLE" if self.idle else "IMAP4rev1"
+                writer.write(f"* CAPABILITY {capabilities}\r\n{tag} OK\r\n".encode())
+            elif upper.startswith("SELECT"):
+                writer.write(
+                    f"* {len(self.messages)} EXISTS\r\n"
+                    f"* OK [UIDVALIDITY 7] UIDs valid\r\n"
+                    f"* OK [UIDNEXT {self.uid_next}] Predicted next UID\r\n"
+                    f"{tag} OK [READ-WRITE] SELECT completed\r\n".encode()
+                )
+            elif upper.startswith("UID SEARCH"):
+                match = re.search(r"UID (\d+):\*", command)
+                if match:
+                    uids = [uid for uid in self.messages if uid >= int(match[1])]
+                    # "n:*" always matches the newest message
+                    uids = uids or [max(self.messages)]
+                else:
+                    uids = list(self.messages)
+                writer.write(f"* SEARCH {' '.join(map(str, uids))}\r\n{tag} OK\r\n".encode())
+            elif upper.startswith("UID FETCH"):
+                _, _, uid_set, item = command.split(" ", 3)
+                uids = [int(uid) for uid in uid_set.split(",")]
+                self.fetches.append((uids, item))
+                for sequence, uid in enumerate(uids, start=1):
+                    raw = self.messages[uid]
+                    if "HEADER" in item:
+                        raw = raw.split(b"\r\n\r\n", 1)[0] + b"\r\n\r\n"
+                    writer.write(
+                        f"* {sequence} FETCH (UID {uid} BODY[] {{{len(raw)}}}\r\n".encode()
+                        + raw
+                        + b")\r\n"
+                    )
+                writer.write(f"{tag} OK FETCH completed\r\n".encode())
+            elif upper == "IDLE":
+                self.idle_count += 1
+                writer.write(b"+ idling\r\n")
+                self.idlers.append(writer)
+                await writer.drain()
+                await reader.readline()  # DONE
+                self.idlers.remove(writer)
+                writer.write(f"{tag} OK IDLE terminated\r\n".encode())
+            elif upper == "LOGOUT":
+                writer.write(f"* BYE\r\n{tag} OK\r\n".encode())
+                await writer.drain()
+                writer.close()
+                return
+            else:
+                writer.write(f"{tag} BAD unknown command\r\n".encode())
+            await writer.drain()
+
+
+async def _run(check, idle: bool = True):
+    server = ImapStandIn(idle=idle)
+    port = await server.start()
+    monitor = BounceMonitor("127.0.0.1", port, "user", "password", use_ssl=False)
+    try:
+        await check(server, monitor)
+    finally:
+        await monitor.close()
+        await server.stop()
+
+
+def test_idle_wakes_up_on_a_bounce():
+    async def check(server, monitor):
+        monitor.watch("abc123", ADDRESS)
+        asyncio.get_running_loop().call_later(0.3, server.deliver, dsn("abc123"))
+
+        started = time.monotonic()
+        assert await monitor.wait("abc123", 5) == "bounced"
+        # Far below IDLE_TIMEOUT: the EXISTS push ended the IDLE
+        assert time.monotonic() - started < 3
+        assert server.idle_count >= 1
+
+    asyncio.run(_run(check))
+
+
+def test_non_bounces_are_only_read_by_their_headers():
+    async def check(server, monitor):
+        monitor.watch("abc123", ADDRESS)
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.2, server.deliver, NORMAL)
+        loop.call_later(0.4, server.deliver, dsn("abc123"))
+
+        assert await monitor.wait("abc123", 5) == "bounced"
+        # UID 10 (already there) and 11 are ordinary mails, 12 is the bounce
+        assert server.body_fetches() == [[12]]
+
+    asyncio.run(_run(check))
+
+
+def test_bounce_is_classified_and_matched_to_its_test_mail():
+    async def check(server, monitor):
+        monitor.watch("soft1", "other@student.hogent.be")
+        monitor.watch("abc123", ADDRESS)
+        server.deliver(dsn("abc123", action="delayed", status="4.2.2"))
+
+        assert await monitor.wait("abc123", 5) == "delayed"
+        assert await monitor.wait("soft1", 0.2) == "no_bounce_yet"
+
+    asyncio.run(_run(check))
+
+
+def test_timeout_without_bounce():
+    async def check(server, monitor):
+        monitor.watch("abc123", ADDRESS)
+        assert await monitor.wait("abc123", 0.5) == "no_bounce_yet"
+        assert "abc123" not in monitor._watchers
+
+    asyncio.run(_run(check))
+
+
+def test_polling_without_idle(monkeypatch):
+    monkeypatch.setattr(bounce_monitor, "POLL_INTERVAL", 0.1)
+
+    async def check(server, monitor):
+        monitor.watch("abc123", ADDRESS)
+        asyncio.get_running_loop().call_later(0.3, server.deliver, dsn("abc123"))
+        assert await monitor.wait("abc123", 5) == "bounced"
+        assert server.idle_count == 0
+
+    asyncio.run(_run(check, idle=False))
@@ -0,0 +1,82 @@
+"""
+Every query shape declared in `index_registry` must be served by an index.
+
+Runs against a local mongod (MONGO_TEST_URI, default mongodb://localhost:27017): the
+declared indexes are created in a throwaway database and every shape is explained.
+Skipped when no mongod is reachable.
+"""
+
+import asyncio
+import os
+import uuid
+
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import PyMongoError
+
+# Importing the modules declares their indexes and query shapes
+import cogs.confessions.confession_tasks  # noqa: F401
+import cogs.moderation.moderation_commands  # noqa: F401
+import cogs.modmail  # noqa: F401
+import cogs.verification  # noqa: F401
+import utils.member_jobs  # noqa: F401
+import utils.persistent_views  # noqa: F401
+from utils.indexes import index_registry
+from utils.message_links import MessageLinkStore
+from utils.mongo_monitor import has_collscan
+from utils.pending_codes import MongoCodeStore
+
+MONGO_TEST_URI = os.getenv("MONGO_TEST_URI", "mongodb://localhost:27017")
+
+
+async def _with_database(check):
+    client = AsyncIOMotorClient(MONGO_TEST_URI, serverSelectionTimeoutMS=2000)
+    try:
+        try:
+            await client.admin.command("ping")
+        except PyMongoError as e:
+            pytest.skip(f"No mongod reachable at {MONGO_TEST_URI}: {e}")
+
+        db = client[f"test_indexes_{uuid.uuid4().hex[:8]}"]
+        try:
+            # Stores declare their indexes when they are created
+            MessageLinkStore(db)
+            MongoCodeStore(db)
+            await check(db)
+        finally:
+            await client.drop_database(db.name)
+    finally:
+        client.close()
+
+
+def test_declared_indexes_are_created():
+    async def check(db):
+        assert await index_registry.apply(db) == len(index_registry.indexes)
+
+    asyncio.run(_with_database(check))
+
+
+def test_declared_query_shapes_use_an_index():
+    async def check(db):
+        await index_registry.apply(db)
+        scans = await index_registry.find_collection_scans(db)
+        assert scans == []
+
+    asyncio.run(_with_database(check))
+
+
+def test_email_lookup_uses_the_partial_index():
+    """{"email_index": value} implies the partial filter ($type string), so no COLLSCAN."""
+
+    async def check(db):
+        await index_registry.apply(db)
+        result = await db.command(
+            {
+                "explain": {"find": "verifications", "filter": {"email_index": "x"}},
+                "verbosity": "queryPlanner",
+            }
+        )
+        assert not has_collscan(result)
+        assert "email_index_1" in str(result["queryPlanner"]["winningPlan"])
+
+    asyncio.run(_with_database(check))
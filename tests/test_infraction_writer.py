@@ -0,0 +1,45 @@
+"""InfractionWriter against an in-memory collection."""
+
+import asyncio
+
+from cogs.moderation import infraction_writer
+from cogs.moderation.infraction_writer import InfractionWriter
+
+
+class SlowCollection:
+    """Stand-in for the infractions collection whose inserts take a while."""
+
+    full_name = "bot.infractions"
+
+    def __init__(self, delay: float = 0.2):
+        self.delay = delay
+        self.documents = {}
+
+    async def insert_many(self, documents, ordered=True):
+        await asyncio.sleep(self.delay)
+        for document in documents:
+            self.documents[document["_id"]] = document
+
+
+def test_close_waits_for_a_pending_size_triggered_flush(monkeypatch):
+    async def no_counts(collection, infractions, delta=1):
+        pass
+
+    monkeypatch.setattr(infraction_writer, "update_infraction_counts", no_counts)
+
+    async def check():
+        collection = SlowCollection()
+        writer = InfractionWriter(collection)
+        futures = [
+            await writer.add({"guild_id": 1, "user_id": i, "type": "warn"})
+            for i in range(infraction_writer.FLUSH_SIZE)
+        ]
+        pending = set(writer._flush_tasks)
+        assert pending
+
+        await writer.close()
+        assert all(task.done() for task in pending)
+        assert len(collection.documents) == infraction_writer.FLUSH_SIZE
+        assert all(future.done() and not future.exception() for future in futures)
+
+    asyncio.run(check())
@@ -0,0 +1,522 @@
+"""
+Bounce detection for the migration of old verifications.
+
+A test mail is sent to the old address; if it bounces, the address no longer exists.
+`BounceMonitor` keeps one IMAP session to the migration mailbox open for all migrations
+that are waiting, waits for new mail with IDLE (or polls when the server has no IDLE),
+and remembers the last UID it has seen so every message is fetched once. Only the
+headers are downloaded first; the full message is fetched for probable DSNs only.
+"""
+
+import asyncio
+import email
+import logging
+import re
+import ssl
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from email.message import Message
+from email.parser import BytesHeaderParser
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+IDLE_TIMEOUT = 60  # seconds per IDLE before checking in again (servers allow ~29 min)
+POLL_INTERVAL = 30  # seconds between checks when the server doesn't support IDLE
+RETRY_DELAY = 10  # seconds before reconnecting after an error
+FETCH_CHUNK = 200  # UIDs per FETCH command
+PARSE_CACHE_SIZE = 1_000  # parsed messages remembered by Message-ID / UID
+PARSE_WORKERS = 2
+COMMAND_TIMEOUT = 30
+
+LITERAL_REGEX = re.compile(rb"\{(\d+)\}\r\n$")
+EXISTS_REGEX = re.compile(rb"^\* \d+ EXISTS", re.IGNORECASE)
+UID_REGEX = re.compile(rb"\bUID (\d+)", re.IGNORECASE)
+CODE_REGEX = re.compile(rb"\[(UIDVALIDITY|UIDNEXT) (\d+)\]", re.IGNORECASE)
+
+BOUNCE_HINTS = (
+    "undeliverable",
+    "delivery status notification",
+    "mail delivery failed",
+    "message not delivered",
+    "delivery failure",
+    "undelivered mail returned to sender",
+)
+
+
+class ImapError(Exception):
+    """The server answered NO/BAD or the connection broke."""
+
+
+def _quote(value: str) -> str:
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+class ImapClient:
+    """Minimal asyncio IMAP4rev1 client: the handful of commands the bounce monitor needs."""
+
+    def __init__(self, host: str, port: int, *, use_ssl: bool = True):
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.capabilities: set = set()
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._tag = 0
+        # Set while a command or IDLE runs; stays set when one was interrupted, after
+        # which the state of the stream is unknown
+        self._busy = False
+
+    async def connect(self):
+        context = ssl.create_default_context() if self.use_ssl else None
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=context), COMMAND_TIMEOUT
+        )
+        greeting = await self._read_line()
+        if not greeting.upper().startswith(b"* OK"):
+            raise ImapError(f"Unexpected greeting: {greeting!r}")
+
+    async def close(self):
+        if self._writer is None:
+            return
+        if not self._busy:
+            try:
+                await asyncio.wait_for(self.command("LOGOUT"), 5)
+            except Exception:
+                pass
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except Exception:
+            pass
+        self._writer = self._reader = None
+
+    async def _read_line(self, timeout: float = COMMAND_TIMEOUT) -> bytes:
+        line = await asyncio.wait_for(self._reader.readline(), timeout)
+        if not line:
+            raise ImapError("Connection closed by server")
+        return line
+
+    async def _read_response(self) -> Tuple[bytes, List[bytes]]:
+        """Read one response line, including the literals ({n} + n bytes) it contains."""
+        text = b""
+        literals = []
+        while True:
+            line = await self._read_line()
+            match = LITERAL_REGEX.search(line)
+            if match is None:
+                return text + line.rstrip(b"\r\n"), literals
+            text += line[: match.start()]
+            literals.append(
+                await asyncio.wait_for(self._reader.readexactly(int(match[1])), COMMAND_TIMEOUT)
+            )
+
+    async def _send(self, *args: str) -> bytes:
+        self._tag += 1
+        tag = f"A{self._tag:04d}".encode()
+        self._writer.write(tag + b" " + " ".join(args).encode() + b"\r\n")
+        await self._writer.drain()
+        return tag
+
+    async def _complete(self, tag: bytes) -> List[Tuple[bytes, List[bytes]]]:
+        """Collect untagged responses until the tagged completion of `tag`."""
+        untagged = []
+        while True:
+            text, literals = await self._read_response()
+            if text.startswith(tag + b" "):
+                status = text[len(tag) + 1 :].split(b" ", 1)[0].upper()
+                if status != b"OK":
+                    raise ImapError(text.decode(errors="replace"))
+                return untagged
+            untagged.append((text, literals))
+
+    async def command(self, *args: str) -> List[Tuple[bytes, List[bytes]]]:
+        self._busy = True
+        untagged = await self._complete(await self._send(*args))
+        self._busy = False
+        return untagged
+
+    async def login(self, username: str, password: str):
+        await self.command("LOGIN", _quote(username), _quote(password))
+        for text, _ in await self.command("CAPABILITY"):
+            if text.upper().startswith(b"* CAPABILITY"):
+                self.capabilities = set(text.decode(errors="replace").upper().split()[2:])
+
+    async def select(self, mailbox: str = "INBOX") -> Tuple[Optional[int], Optional[int]]:
+        """Select a mailbox; returns (UIDVALIDITY, UIDNEXT)."""
+        codes = {}
+        for text, _ in await self.command("SELECT", _quote(mailbox)):
+            for name, value in CODE_REGEX.findall(text):
+                codes[name.upper()] = int(value)
+        return codes.get(b"UIDVALIDITY"), codes.get(b"UIDNEXT")
+
+    async def uid_search(self, *criteria: str) -> List[int]:
+        uids = []
+        for text, _ in await self.command("UID SEARCH", *criteria):
+            if text.upper().startswith(b"* SEARCH"):
+                uids += [int(uid) for uid in text.split()[2:]]
+        return uids
+
+    async def uid_fetch(self, uids: List[int], item: str) -> Dict[int, bytes]:
+        """Fetch one data item (e.g. BODY.PEEK[HEADER]) of several messages by UID."""
+        result = {}
+        for start in range(0, len(uids), FETCH_CHUNK):
+            uid_set = ",".join(str(uid) for uid in uids[start : start + FETCH_CHUNK])
+            for text, literals in await self.command("UID FETCH", uid_set, f"(UID {item})"):
+                match = UID_REGEX.search(text)
+                if match and literals:
+                    result[int(match[1])] = literals[0]
+        return result
+
+    async def idle(self, timeout: float) -> bool:
+        """Wait (IDLE) until new mail arrives or `timeout` passes; True if mail arrived."""
+        self._busy = True
+        tag = await self._send("IDLE")
+        line = await self._read_line()
+        if not line.startswith(b"+"):
+            raise ImapError(f"IDLE refused: {line!r}")
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        new_mail = False
+        while not new_mail:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                line = await self._read_line(remaining)
+            except asyncio.TimeoutError:
+                break
+            new_mail = EXISTS_REGEX.match(line) is not None
+
+        self._writer.write(b"DONE\r\n")
+        await self._writer.drain()
+        await self._complete(tag)
+        self._busy = False
+        return new_mail
+
+
+# --- DSN parsing ---
+
+
+class BounceInfo(NamedTuple):
+    result: str  # bounced / delayed / delivered / unknown
+    text: str  # subject + plain text body, used to match the bounce to a test mail
+    final_recipient: Optional[str]
+
+
+def looks_like_dsn(msg: Message) -> bool:
+    """Check if a message (or only its headers) looks like a delivery status notification."""
+    rp = (msg.get("Return-Path") or "").strip()
+    ctype = (msg.get_content_type() or "").lower()
+    ctype_full = (msg.get("Content-Type") or "").lower()
+
+    # RFC-compliant DSN markers
+    if rp == "<>" and ctype == "multipart/report" and "report-type=delivery-status" in ctype_full:
+        return True
+
+    # Heuristic fallback for non-compliant DSNs
+    subj = (msg.get("Subject") or "").lower()
+    if any(h in subj for h in BOUNCE_HINTS):
+        return True
+
+    if (msg.get("Auto-Submitted") or "").lower().startswith("auto-"):
+        return True
+
+    return False
+
+
+def scan_headers(headers: Dict[int, bytes]) -> Dict[int, Optional[str]]:
+    """
+    Parse the headers of several messages (UID -> raw headers) and return the UIDs that
+    look like a DSN, with their Message-ID (None if they have none).
+    """
+    parser = BytesHeaderParser()
+    candidates = {}
+    for uid, raw in headers.items():
+        msg = parser.parsebytes(raw)
+        if looks_like_dsn(msg):
+            candidates[uid] = (msg.get("Message-ID") or "").strip() or None
+    return candidates
+
+
+def extract_dsn_status(msg: Message) -> Optional[dict]:
+    """Extract DSN status information from the message/delivery-status part."""
+    if not msg.is_multipart():
+        return None
+
+    for part in msg.walk():
+        if part.get_content_type() == "message/delivery-status":
+            try:
+                payload = part.get_payload()
+                blocks = payload if isinstance(payload, list) else [part]
+
+                for blk in blocks:
+                    text = blk.as_string()
+                    action = re.search(r"(?im)^Action:\s*([^\r\n]+)", text)
+                    status = re.search(r"(?im)^Status:\s*([0-9]\.[0-9]\.[0-9])", text)
+                    diag = re.search(r"(?im)^Diagnostic-Code:\s*([^\r\n]+)", text)
+                    recip = re.search(r"(?im)^Final-Recipient:\s*rfc822;\s*([^\r\n\s]+)", text)
+
+                    if action or status or diag or recip:
+                        return {
+                            "action": (action.group(1).strip().lower() if action else None),
+                            "status": (status.group(1).strip() if status else None),
+                            "diagnostic": (diag.group(1).strip() if diag else None),
+                            "final_recipient": (recip.group(1).strip() if recip else None),
+                        }
+            except Exception:
+                pass
+    return None
+
+
+def classify_dsn(dsn_info: dict) -> str:
+    """Classify bounce type from DSN information."""
+    action = (dsn_info.get("action") or "").lower()
+    status = dsn_info.get("status") or ""
+    if action == "failed" or status.startswith("5."):
+        return "bounced"
+    if action == "delayed" or status.startswith("4."):
+        return "delayed"
+    if action in ("delivered", "relayed", "expanded"):
+        return "delivered"
+    return "unknown"
+
+
+def _plain_text(msg: Message) -> str:
+    parts = msg.walk() if msg.is_multipart() else [msg]
+    body_text = ""
+    for part in parts:
+        if part.get_content_type() == "text/plain":
+            try:
+                body_text += part.get_payload(decode=True).decode("utf-8", errors="ignore")
+            except Exception:
+                pass
+    return body_text
+
+
+def parse_bounce(raw: bytes) -> Optional[BounceInfo]:
+    """Parse a full message; returns None if it isn't a bounce."""
+    msg = email.message_from_bytes(raw)
+    if not looks_like_dsn(msg):
+        return None
+
+    dsn_info = extract_dsn_status(msg)
+    if dsn_info:
+        result = classify_dsn(dsn_info)
+    else:
+        # Fallback text analysis
+        all_text = (msg.get("Subject", "") + " " + str(msg)).lower()
+        if "5.1.1" in all_text or "user unknown" in all_text or "recipient not found" in all_text:
+            result = "bounced"
+        elif "4." in all_text or "temporar" in all_text:
+            result = "delayed"
+        else:
+            result = "unknown"
+
+    return BounceInfo(
+        result,
+        msg.get("Subject", "") + "\n" + _plain_text(msg),
+        dsn_info.get("final_recipient") if dsn_info else None,
+    )
+
+
+def parse_bounces(bodies: Dict[int, bytes]) -> Dict[int, Optional[BounceInfo]]:
+    """`parse_bounce` for several messages (UID -> raw message) in one worker call."""
+    return {uid: parse_bounce(raw) for uid, raw in bodies.items()}
+
+
+def match_bounce(info: BounceInfo, tests: Dict[str, str]) -> Optional[str]:
+    """Return the test ID (of test_id -> email address) a bounce belongs to, or None."""
+    # Match via test_id token
+    for test_id in tests:
+        if test_id in info.text:
+            return test_id
+
+    # If DSN, use the Final-Recipient
+    if info.final_recipient:
+        for test_id, email_addr in tests.items():
+            if info.final_recipient.lower() == email_addr.lower():
+                return test_id
+
+    # Heuristic: look for any of the emails in message
+    text = info.text.lower()
+    for test_id, email_addr in tests.items():
+        if email_addr.lower() in text:
+            return test_id
+    return None
+
+
+# --- monitor ---
+
+
+class BounceMonitor:
+    """
+    Shared watcher of the migration mailbox.
+
+    `watch` registers a test mail (call it before sending, so its bounce can't be missed)
+    and `wait` returns the classification of its bounce, or "no_bounce_yet" on timeout.
+    The IMAP session is kept open while anything is being watched and closed afterwards.
+    """
+
+    def __init__(self, host: str, port: int, username: str, password: str, use_ssl: bool = True):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_ssl = use_ssl
+
+        # test_id -> (email address, future with the result)
+        self._watchers: Dict[str, Tuple[str, asyncio.Future]] = {}
+        self._client: Optional[ImapClient] = None
+        self._task: Optional[asyncio.Task] = None
+        self._uidvalidity: Optional[int] = None
+        self._last_uid: Optional[int] = None
+        self._uid_next: Optional[int] = None
+        # Message-ID (or UIDVALIDITY:UID) -> parsed message, None if it isn't a bounce
+        self._parsed: "OrderedDict[str, Optional[BounceInfo]]" = OrderedDict()
+        # MIME parsing runs here instead of on the event loop (or motor's default executor)
+        self._pool = ThreadPoolExecutor(PARSE_WORKERS, thread_name_prefix="bounce-parse")
+
+    def watch(self, test_id: str, email_address: str):
+        future = asyncio.get_running_loop().create_future()
+        self._watchers[test_id] = (email_address, future)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def wait(self, test_id: str, timeout: float) -> str:
+        """Wait for the bounce of a watched test mail and stop watching it."""
+        try:
+            _, future = self._watchers[test_id]
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            return "no_bounce_yet"
+        finally:
+            self.forget(test_id)
+
+    def forget(self, test_id: str):
+        self._watchers.pop(test_id, None)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self._disconnect()
+        self._pool.shutdown(wait=False)
+
+    async def _connect(self):
+        client = ImapClient(self.host, self.port, use_ssl=self.use_ssl)
+        await client.connect()
+        try:
+            await client.login(self.username, self.password)
+            uidvalidity, self._uid_next = await client.select("INBOX")
+        except Exception:
+            await client.close()
+            raise
+        if uidvalidity != self._uidvalidity:
+            # UIDs from another mailbox generation mean nothing here
+            self._uidvalidity = uidvalidity
+            self._last_uid = None
+        self._client = client
+
+    async def _disconnect(self):
+        client, self._client = self._client, None
+        if client is not None:
+            await client.close()
+
+    async def _run(self):
+        while True:
+            if not self._watchers:
+                await self._disconnect()
+                if not self._watchers:
+                    # No await between the check and returning: a new watch() starts a new task
+                    self._task = None
+                    return
+            try:
+                if self._client is None:
+                    await self._connect()
+                await self._check_new_mail()
+                if not self._watchers:
+                    continue
+                if "IDLE" in self._client.capabilities:
+                    await self._client.idle(IDLE_TIMEOUT)
+                else:
+                    await asyncio.sleep(POLL_INTERVAL)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error checking bounces: {e}")
+                await self._disconnect()
+                await asyncio.sleep(RETRY_DELAY)
+
+    async def _check_new_mail(self):
+        client = self._client
+        if self._last_uid is None:
+            # First check after (re)selecting: bounces of the last day, a bounce may have
+            # arrived between sending the test mail and opening the session
+            since = time.strftime("%d-%b-%Y", time.gmtime(time.time() - 86400))
+            uids = await client.uid_search("SINCE", since)
+        else:
+            # "n:*" always includes the newest message, even when its UID is lower
+            uids = await client.uid_search("UID", f"{self._last_uid + 1}:*")
+            uids = [uid for uid in uids if uid > self._last_uid]
+        if not uids:
+            if self._last_uid is None:
+                self._last_uid = (self._uid_next or 1) - 1
+            return
+
+        loop = asyncio.get_running_loop()
+        headers = await client.uid_fetch(sorted(uids), "BODY.PEEK[HEADER]")
+        candidates = await loop.run_in_executor(self._pool, scan_headers, headers)
+        keys = {
+            uid: message_id or f"{self._uidvalidity}:{uid}"
+            for uid, message_id in candidates.items()
+        }
+
+        # Each message is downloaded and parsed once, however many migrations are waiting
+        missing = sorted(uid for uid, key in keys.items() if key not in self._parsed)
+        if missing:
+            bodies = await client.uid_fetch(missing, "BODY.PEEK[]")
+            parsed = await loop.run_in_executor(self._pool, parse_bounces, bodies)
+            for uid in missing:
+                self._remember(keys[uid], parsed.get(uid))
+
+        for uid in sorted(keys):
+            info = self._parsed.get(keys[uid])
+            if info is not None:
+                self._resolve(info)
+        self._last_uid = max(uids + [self._last_uid or 0])
+
+    def _remember(self, key: str, info: Optional[BounceInfo]):
+        self._parsed[key] = info
+        self._parsed.move_to_end(key)
+        while len(self._parsed) > PARSE_CACHE_SIZE:
+            self._parsed.popitem(last=False)
+
+    def _resolve(self, info: BounceInfo):
+        tests = {test_id: address for test_id, (address, _) in self._watchers.items()}
+        test_id = match_bounce(info, tests)
+        if test_id is None:
+            return
+        _, future = self._watchers[test_id]
+        if not future.done():
+            future.set_result(info.result)
+
+
+_monitor: Optional[BounceMonitor] = None
+
+
+def get_bounce_monitor(host: str, port: int, username: str, password: str) -> BounceMonitor:
+    """Return the shared BounceMonitor, creating it on first use."""
+    global _monitor
+    if _monitor is None:
+        _monitor = BounceMonitor(host, port, username, password)
+    return _monitor
+
+
+async def close_bounce_monitor():
+    global _monitor
+    if _monitor is not None:
+        monitor, _monitor = _monitor, None
+        await monitor.close()
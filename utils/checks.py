@@ -47,7 +47,7 @@ def developer():
             return False
 
         # Haal developer IDs op uit DB
-        settings = await client.db.settings.find_one({"_id": "server_settings"})
+        settings = await client.settings.get("server_settings")
         developer_ids = settings.get("developer_ids", []) if settings else []
 
         # Als er expliciet developer IDs zijn ingesteld
@@ -60,7 +60,7 @@ def developer():
         if hasattr(client, "guild_id") and client.guild_id:
             guild_id = client.guild_id
         else:
-            guild_settings = await client.db.settings.find_one({"_id": "guild_settings"})
+            guild_settings = await client.settings.get("guild_settings")
             if guild_settings and "guild_id" in guild_settings:
                 guild_id = guild_settings["guild_id"]
             else:
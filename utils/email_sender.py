@@ -1,10 +1,52 @@
+import asyncio
+import logging
 import smtplib
+import time
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from env import SMTP_EMAIL, SMTP_PASSWORD, SMTP_PORT, SMTP_SERVER
 
+logger = logging.getLogger(__name__)
+
+POOL_SIZE = 3  # authenticated SMTP sessions kept open
+QUEUE_SIZE = 200  # queued mails before send() starts waiting (backpressure)
+MAX_RETRIES = 3
+IDLE_TIMEOUT = 120  # close sessions that have been idle this long (seconds)
+
+
+def build_message(
+    to_addresses: List[str],
+    subject: str,
+    body: str,
+    html: Optional[str] = None,
+    from_address: Optional[str] = None,
+) -> MIMEMultipart:
+    """Build the MIME message used by `send_email` and `EmailSender`."""
+    msg = MIMEMultipart("alternative")
+    msg["Subject"] = subject
+    msg["From"] = from_address or SMTP_EMAIL
+    msg["To"] = ", ".join(to_addresses)
+
+    # Attach plain text and (optionally) HTML
+    msg.attach(MIMEText(body, "plain"))
+    if html:
+        msg.attach(MIMEText(html, "html"))
+    return msg
+
+
+def _connect() -> smtplib.SMTP:
+    """Open and authenticate a new SMTP session."""
+    # Use SSL if port 465, otherwise use STARTTLS
+    if SMTP_PORT == 465:
+        server = smtplib.SMTP_SSL(SMTP_SERVER, SMTP_PORT, timeout=30)
+    else:
+        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=30)
+        server.starttls()
+    server.login(SMTP_EMAIL, SMTP_PASSWORD)
+    return server
+
 
 def send_email(
     to_addresses: List[str],
@@ -16,6 +58,9 @@ def send_email(
     """
     Sends an email using the configured SMTP server.
 
+    This opens a new connection per mail and blocks; from the event loop use
+    `get_email_sender().send(...)` instead.
+
     Args:
         to_addresses (List[str]): List of recipient email addresses.
         subject (str): Email subject.
@@ -26,27 +71,191 @@ def send_email(
     Raises:
         Exception: If sending the email fails.
     """
-    msg = MIMEMultipart("alternative")
-    msg["Subject"] = subject
-    msg["From"] = from_address or SMTP_EMAIL
-    msg["To"] = ", ".join(to_addresses)
-
-    # Attach plain text and (optionally) HTML
-    msg.attach(MIMEText(body, "plain"))
-    if html:
-        msg.attach(MIMEText(html, "html"))
+    msg = build_message(to_addresses, subject, body, html, from_address)
 
     try:
-        # Use SSL if port 465, otherwise use STARTTLS
-        if SMTP_PORT == 465:
-            with smtplib.SMTP_SSL(SMTP_SERVER, SMTP_PORT) as server:
-                server.login(SMTP_EMAIL, SMTP_PASSWORD)
-                server.sendmail(msg["From"], to_addresses, msg.as_string())
-        else:
-            with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-                server.starttls()
-                server.login(SMTP_EMAIL, SMTP_PASSWORD)
-                server.sendmail(msg["From"], to_addresses, msg.as_string())
+        with _connect() as server:
+            server.sendmail(msg["From"], to_addresses, msg.as_string())
     except Exception as e:
         # You can add logging here if desired
         raise Exception(f"Failed to send email: {e}")
+
+
+class _EmailJob:
+    __slots__ = ("key", "to_addresses", "msg", "future", "started")
+
+    def __init__(self, key, to_addresses, msg, future):
+        self.key = key
+        self.to_addresses = to_addresses
+        self.msg = msg
+        self.future = future
+        self.started = False
+
+
+class _PooledConnection:
+    """One SMTP session owned by a single worker; all blocking calls run in a thread."""
+
+    def __init__(self):
+        self.server: Optional[smtplib.SMTP] = None
+        self.last_used = 0.0
+
+    async def send(self, from_address: str, to_addresses: List[str], payload: str):
+        if self.server is not None and time.monotonic() - self.last_used > IDLE_TIMEOUT:
+            await self.close()
+        if self.server is None:
+            self.server = await asyncio.to_thread(_connect)
+
+        await asyncio.to_thread(self.server.sendmail, from_address, to_addresses, payload)
+        self.last_used = time.monotonic()
+
+    async def close(self):
+        server, self.server = self.server, None
+        if server is not None:
+            try:
+                await asyncio.to_thread(server.quit)
+            except Exception:
+                pass
+
+
+class EmailSender:
+    """
+    Pooled, queue-based SMTP sender for use on the event loop.
+
+    A fixed number of workers each keep one authenticated SMTP session alive, so the
+    TCP/TLS handshake and login are paid once per session instead of once per mail,
+    and never on the event loop thread. The queue is bounded: `send` waits when it is
+    full. Mails to the same recipient that are still queued are deduplicated, only the
+    newest message is sent and every caller gets its result.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = POOL_SIZE,
+        queue_size: int = QUEUE_SIZE,
+        max_retries: int = MAX_RETRIES,
+    ):
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._pending: Dict[tuple, _EmailJob] = {}
+        self._workers: List[asyncio.Task] = []
+
+    def _ensure_workers(self):
+        self._workers = [w for w in self._workers if not w.done()]
+        while len(self._workers) < self.pool_size:
+            self._workers.append(asyncio.create_task(self._worker()))
+
+    async def send(
+        self,
+        to_addresses: List[str],
+        subject: str,
+        body: str,
+        html: Optional[str] = None,
+        from_address: Optional[str] = None,
+    ) -> None:
+        """
+        Queue an email and wait until it has been sent.
+
+        Raises:
+            Exception: If sending the email fails after all retries.
+        """
+        self._ensure_workers()
+        msg = build_message(to_addresses, subject, body, html, from_address)
+        key = tuple(sorted(address.lower() for address in to_addresses))
+
+        job = self._pending.get(key)
+        if job is not None and not job.started:
+            # Still queued: send the newest message only
+            job.msg = msg
+        else:
+            job = _EmailJob(key, to_addresses, msg, asyncio.get_running_loop().create_future())
+            self._pending[key] = job
+            await self.queue.put(job)
+
+        await asyncio.shield(job.future)
+
+    async def _worker(self):
+        connection = _PooledConnection()
+        try:
+            while True:
+                try:
+                    job = await asyncio.wait_for(self.queue.get(), timeout=IDLE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    await connection.close()
+                    continue
+
+                job.started = True
+                if self._pending.get(job.key) is job:
+                    del self._pending[job.key]
+
+                try:
+                    await self._send_with_retry(connection, job)
+                    if not job.future.done():
+                        job.future.set_result(None)
+                except asyncio.CancelledError:
+                    # Closing: don't leave the caller waiting for a mail that won't be sent
+                    if not job.future.done():
+                        job.future.set_exception(Exception("Email sender closed"))
+                    raise
+                except Exception as e:
+                    if not job.future.done():
+                        job.future.set_exception(Exception(f"Failed to send email: {e}"))
+                finally:
+                    self.queue.task_done()
+        finally:
+            await connection.close()
+
+    async def _send_with_retry(self, connection: _PooledConnection, job: _EmailJob):
+        payload = job.msg.as_string()
+        for attempt in range(self.max_retries):
+            try:
+                await connection.send(job.msg["From"], job.to_addresses, payload)
+                return
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused):
+                # Permanent failures, retrying won't help
+                raise
+            except smtplib.SMTPResponseException as e:
+                await connection.close()
+                if e.smtp_code >= 500 or attempt == self.max_retries - 1:
+                    raise
+            except (smtplib.SMTPException, OSError):
+                # Dropped or stale session: reconnect and try again
+                await connection.close()
+                if attempt == self.max_retries - 1:
+                    raise
+            delay = 2**attempt
+            logger.warning(f"SMTP send failed, retry {attempt + 1}/{self.max_retries} in {delay}s")
+            await asyncio.sleep(delay)
+
+    async def close(self, timeout: float = 10.0):
+        """Wait (up to `timeout` seconds) for queued mails and close all SMTP sessions."""
+        if self._workers:
+            try:
+                await asyncio.wait_for(self.queue.join(), timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Closing email sender with {self.queue.qsize()} mails queued")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+        # Fail the mails that were still queued so their send() callers return
+        jobs = list(self._pending.values())
+        while not self.queue.empty():
+            jobs.append(self.queue.get_nowait())
+            self.queue.task_done()
+        self._pending.clear()
+        for job in jobs:
+            if not job.future.done():
+                job.future.set_exception(Exception("Email sender closed"))
+
+
+_sender: Optional[EmailSender] = None
+
+
+def get_email_sender() -> EmailSender:
+    """Return the shared EmailSender, creating it on first use."""
+    global _sender
+    if _sender is None:
+        _sender = EmailSender()
+    return _sender
@@ -0,0 +1,108 @@
+"""
+Central registry of the MongoDB indexes the bot relies on.
+
+Modules declare their indexes (and the query shapes those indexes are meant to serve)
+at import time with `index_registry.index(...)` / `index_registry.query(...)`. The bot
+creates every declared index in `setup_hook`; creating an index that already exists
+with the same options is a no-op, so this runs on every start. Afterwards every declared
+query shape is explained and shapes that still scan a whole collection are reported.
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from pymongo.errors import OperationFailure
+
+from utils.mongo_monitor import current_caller, has_collscan
+
+logger = logging.getLogger("bot.indexes")
+
+INDEX_CONFLICT_CODES = (85, 86)  # IndexOptionsConflict, IndexKeySpecsConflict
+
+Keys = List[Tuple[str, int]]
+
+
+class IndexSpec(NamedTuple):
+    collection: str
+    keys: Keys
+    options: Dict[str, Any]
+
+
+class QueryShape(NamedTuple):
+    collection: str
+    filter: dict
+    sort: Optional[Keys]
+
+
+class IndexRegistry:
+    def __init__(self):
+        # (collection, keys, name) -> spec; re-declaring (e.g. on cog reload) replaces it
+        self.indexes: Dict[tuple, IndexSpec] = {}
+        self.queries: Dict[tuple, QueryShape] = {}
+
+    def index(self, collection: str, keys, **options):
+        """
+        Declare an index. `keys` is a field name or a list of (field, direction);
+        `options` are passed to `create_index` (unique, expireAfterSeconds, name, ...).
+        """
+        if isinstance(keys, str):
+            keys = [(keys, 1)]
+        key = (collection, tuple(keys), options.get("name"))
+        self.indexes[key] = IndexSpec(collection, list(keys), options)
+
+    def query(self, collection: str, filter: dict, sort: Optional[Keys] = None):
+        """Declare a query shape that must be served by an index (checked at startup)."""
+        key = (collection, repr(filter), repr(sort))
+        self.queries[key] = QueryShape(collection, filter, sort)
+
+    async def _create(self, db, spec: IndexSpec) -> bool:
+        try:
+            await db[spec.collection].create_index(spec.keys, **spec.options)
+            return True
+        except OperationFailure as e:
+            if e.code in INDEX_CONFLICT_CODES:
+                logger.error(
+                    f"Index {spec.keys} on {spec.collection} exists with other options; "
+                    f"drop it to let the bot recreate it: {e}"
+                )
+            else:
+                logger.error(f"Failed to create index {spec.keys} on {spec.collection}: {e}")
+        except Exception as e:
+            logger.error(f"Failed to create index {spec.keys} on {spec.collection}: {e}")
+        return False
+
+    async def apply(self, db) -> int:
+        """Create every declared index; returns how many are in place."""
+        results = await asyncio.gather(*(self._create(db, spec) for spec in self.indexes.values()))
+        logger.info(f"{sum(results)}/{len(results)} declared MongoDB indexes in place")
+        return sum(results)
+
+    async def find_collection_scans(self, db) -> List[QueryShape]:
+        """Explain every declared query shape and return those planned as a COLLSCAN."""
+        scans = []
+        token = current_caller.set("index check")
+        try:
+            for shape in self.queries.values():
+                command: Dict[str, Any] = {"find": shape.collection, "filter": shape.filter}
+                if shape.sort:
+                    command["sort"] = dict(shape.sort)
+                try:
+                    result = await db.command({"explain": command, "verbosity": "queryPlanner"})
+                except Exception as e:
+                    logger.warning(f"Could not explain query on {shape.collection}: {e}")
+                    continue
+                if has_collscan(result):
+                    scans.append(shape)
+                    logger.warning(
+                        f"Query on {shape.collection} scans the whole collection: "
+                        f"filter={shape.filter} sort={shape.sort}"
+                    )
+        finally:
+            current_caller.reset(token)
+        if not scans:
+            logger.info(f"All {len(self.queries)} declared query shapes use an index")
+        return scans
+
+
+index_registry = IndexRegistry()
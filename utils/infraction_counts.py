@@ -0,0 +1,37 @@
+"""
+Per-user infraction counters in the `infraction_counts` collection.
+
+One document per guild member keeps the total and the count per infraction type, so
+/history doesn't have to count the infractions. Kept apart from the moderation cog so
+scripts (e.g. migrate.py) can update the counters without loading the cog.
+"""
+
+from collections import Counter
+from typing import Iterable
+
+from pymongo import UpdateOne
+
+COUNTS_COLLECTION = "infraction_counts"
+
+
+def count_id(guild_id: int, user_id: int) -> str:
+    return f"{guild_id}:{user_id}"
+
+
+async def update_infraction_counts(collection, infractions: Iterable[dict], delta: int = 1):
+    """
+    Adjust the per-user counter documents for written (or, with delta=-1, deleted) infractions.
+
+    Only existing counters are updated; a missing counter is seeded from the infractions
+    themselves the first time it is read (see `get_infraction_counts`).
+    """
+    totals = Counter((i["guild_id"], i["user_id"], i["type"]) for i in infractions)
+    operations = [
+        UpdateOne(
+            {"_id": count_id(guild_id, user_id)},
+            {"$inc": {"total": n * delta, f"types.{infraction_type}": n * delta}},
+        )
+        for (guild_id, user_id, infraction_type), n in totals.items()
+    ]
+    if operations:
+        await collection.database[COUNTS_COLLECTION].bulk_write(operations, ordered=False)
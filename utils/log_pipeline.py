@@ -0,0 +1,148 @@
+"""
+Logging off the event loop.
+
+Loggers get a `BoundedQueueHandler` that only puts records on a queue; a single
+`QueueListener` thread formats them and does the (blocking) file and stream writes,
+including file rotation, for every logger.
+"""
+
+import copy
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from typing import Iterable, List, Optional, Tuple
+
+OVERFLOW_POLICIES = ("drop_oldest", "drop_new", "block")
+BLOCK_TIMEOUT = 1.0  # max seconds the "block" policy waits for room in the queue
+
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    QueueHandler with a bounded queue and a configurable overflow policy:
+
+    - drop_oldest: make room by discarding the oldest queued record
+    - drop_new: discard the new record
+    - block: wait (up to BLOCK_TIMEOUT) for room, then discard the new record
+
+    The records carry the handlers they are meant for (`targets`), so one listener thread
+    can serve every logger. Once the pipeline is stopped the records go to the targets
+    directly, on the calling thread.
+    """
+
+    def __init__(
+        self,
+        log_queue: queue.Queue,
+        overflow: str = "drop_oldest",
+        targets: Iterable[logging.Handler] = (),
+    ):
+        super().__init__(log_queue)
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown log queue overflow policy: {overflow}")
+        self.overflow = overflow
+        self.targets: Tuple[logging.Handler, ...] = tuple(targets)
+        self.direct = False
+        self.dropped = 0
+
+    def emit(self, record: logging.LogRecord):
+        if self.direct:
+            _dispatch(record, self.targets)
+        else:
+            super().emit(record)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Only merge the message arguments here (they may be mutable objects); formatting
+        (timestamps, prefixes, tracebacks) is left to the handlers on the listener thread.
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        record.log_targets = self.targets
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+            return
+        except queue.Full:
+            pass
+
+        if self.overflow == "drop_oldest":
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            self.dropped += 1
+            try:
+                self.queue.put_nowait(record)
+            except queue.Full:
+                pass
+        elif self.overflow == "block":
+            try:
+                self.queue.put(record, timeout=BLOCK_TIMEOUT)
+            except queue.Full:
+                self.dropped += 1
+        else:
+            self.dropped += 1
+
+
+def _dispatch(record: logging.LogRecord, targets: Iterable[logging.Handler]):
+    for handler in targets:
+        if record.levelno >= handler.level:
+            handler.handle(record)
+
+
+class _Listener(QueueListener):
+    def handle(self, record: logging.LogRecord):
+        _dispatch(self.prepare(record), getattr(record, "log_targets", ()))
+
+    def enqueue_sentinel(self):
+        # Wait for room: with a full queue put_nowait would raise instead of stopping
+        self.queue.put(self._sentinel)
+
+
+class LogPipeline:
+    """Owns the queue, the queue handlers and the listener thread shared by the loggers."""
+
+    def __init__(self, queue_size: int = 10_000, overflow: str = "drop_oldest"):
+        self.overflow = overflow
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._handlers: List[BoundedQueueHandler] = []
+        self._listener: Optional[QueueListener] = None
+        self._stopped = False
+
+    def attach(self, logger: logging.Logger, *handlers: logging.Handler) -> BoundedQueueHandler:
+        """
+        Route the records of `logger` to `handlers` through the queue and the listener thread.
+
+        Returns the queue handler that was added to the logger.
+        """
+        queue_handler = BoundedQueueHandler(self._queue, self.overflow, handlers)
+        if self._stopped:
+            queue_handler.direct = True
+        elif self._listener is None:
+            self._listener = _Listener(self._queue)
+            self._listener.start()
+
+        logger.addHandler(queue_handler)
+        self._handlers.append(queue_handler)
+        return queue_handler
+
+    @property
+    def dropped(self) -> int:
+        """Records dropped because the queue was full."""
+        return sum(handler.dropped for handler in self._handlers)
+
+    def stop(self):
+        """
+        Write every queued record and stop the listener thread (blocking). Records logged
+        afterwards are written directly by the calling thread.
+        """
+        self._stopped = True
+        for handler in self._handlers:
+            handler.direct = True
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+        for target in {target for handler in self._handlers for target in handler.targets}:
+            target.flush()
@@ -0,0 +1,332 @@
+"""
+Background jobs that apply the same change to many members of a guild.
+
+A job is started from a command: the affected members are computed once, stored in the
+`member_jobs` collection together with a position, and processed by a background task
+that edits a status message with the progress and an ETA. The position is a low-water
+mark (every member before it is finished), so a job that was interrupted by a restart
+resumes from there; the few members after it that were already handled are simply
+handled again, which is why job actions have to be idempotent.
+
+How many requests are in flight adapts to Discord's rate limits (see
+`utils.ratelimit.AdaptiveLimit`).
+"""
+
+import asyncio
+import datetime
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import discord
+from discord.http import Route
+
+from utils.indexes import index_registry
+from utils.mongo_monitor import current_caller
+from utils.ratelimit import SLOW_REQUEST, AdaptiveLimit, bucket_limit
+
+logger = logging.getLogger(__name__)
+
+SAVE_INTERVAL = 5.0  # seconds between progress writes to MongoDB
+STATUS_INTERVAL = 5.0  # seconds between status message edits
+DRY_RUN_PREVIEW = 20  # members listed in the status message of a dry run
+
+# Job results of a single member
+DONE, SKIPPED, FAILED = "done", "skipped", "failed"
+
+index_registry.index("member_jobs", [("status", 1), ("kind", 1), ("guild_id", 1)])
+index_registry.query("member_jobs", {"status": "running"})
+
+
+class JobKind(NamedTuple):
+    title: str
+    # (guild, params) -> ids of the affected members, in processing order
+    select: Callable[[discord.Guild, dict], List[int]]
+    # (guild, member_id, params) -> DONE or SKIPPED; raises when the member failed
+    apply: Callable[[discord.Guild, int, dict], Awaitable[str]]
+    # guild -> REST route `apply` uses, for its rate limit bucket
+    route: Callable[[discord.Guild], Route]
+
+
+def _format_progress(job: dict, kind: JobKind, counts: Dict[str, int], eta, limit) -> str:
+    total = len(job["member_ids"])
+    processed = sum(counts.values())
+    percentage = processed / total * 100 if total else 100
+    lines = [
+        f"🔄 **{kind.title}** — {processed}/{total} ({percentage:.1f}%)",
+        f"✅ {counts[DONE]} verwerkt · ⏭️ {counts[SKIPPED]} overgeslagen · "
+        f"❌ {counts[FAILED]} mislukt",
+    ]
+    if eta is not None:
+        lines.append(f"⏱️ Klaar {discord.utils.format_dt(eta, 'R')} · {limit} tegelijk")
+    return "\n".join(lines)
+
+
+def _format_finished(job: dict, kind: JobKind, counts: Dict[str, int]) -> str:
+    started = job["created_at"].replace(tzinfo=datetime.timezone.utc)
+    elapsed = discord.utils.utcnow() - started
+    minutes = max(1, round(elapsed.total_seconds() / 60))
+    return (
+        f"✅ **{kind.title}** klaar na {minutes} min — {len(job['member_ids'])} leden\n"
+        f"✅ {counts[DONE]} verwerkt · ⏭️ {counts[SKIPPED]} overgeslagen · "
+        f"❌ {counts[FAILED]} mislukt"
+    )
+
+
+class MemberJobEngine:
+    """Starts, runs and resumes member jobs; one running job per kind and guild."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.kinds: Dict[str, JobKind] = {}
+        # job _id -> runner task
+        self.tasks: Dict[object, asyncio.Task] = {}
+        self._resume_task: Optional[asyncio.Task] = None
+
+    @property
+    def collection(self):
+        return self.bot.db.member_jobs
+
+    def register(self, name: str, kind: JobKind):
+        """Register (or replace, e.g. on cog reload) a job kind."""
+        self.kinds[name] = kind
+
+    def start(self):
+        """Resume the jobs that were running when the bot stopped (once it is ready)."""
+        if self._resume_task is None or self._resume_task.done():
+            self._resume_task = asyncio.create_task(self._resume())
+
+    async def close(self):
+        """Stop the runners; their progress is saved and they resume on the next start."""
+        if self._resume_task and not self._resume_task.done():
+            self._resume_task.cancel()
+        tasks = list(self.tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def running(self) -> int:
+        return sum(1 for task in self.tasks.values() if not task.done())
+
+    async def create(
+        self,
+        name: str,
+        guild: discord.Guild,
+        channel: discord.abc.Messageable,
+        requested_by: discord.abc.User,
+        params: Optional[dict] = None,
+        dry_run: bool = False,
+    ) -> Tuple[dict, discord.Message]:
+        """
+        Compute the affected members, post the status message and start the job.
+
+        A dry run only reports the affected members. Raises ValueError when a job of
+        this kind is already running in the guild.
+        """
+        kind = self.kinds[name]
+        params = params or {}
+        if not dry_run:
+            existing = await self.collection.find_one(
+                {"status": "running", "kind": name, "guild_id": guild.id}
+            )
+            if existing is not None:
+                raise ValueError("Er loopt al een taak van dit type in deze server.")
+
+        member_ids = kind.select(guild, params)
+        job = {
+            "kind": name,
+            "guild_id": guild.id,
+            "params": params,
+            "dry_run": dry_run,
+            "status": "done" if dry_run or not member_ids else "running",
+            "member_ids": member_ids,
+            "position": 0,
+            "counts": {DONE: 0, SKIPPED: 0, FAILED: 0},
+            "requested_by": requested_by.id,
+            "created_at": discord.utils.utcnow(),
+        }
+
+        if dry_run:
+            preview = [f"<@{member_id}>" for member_id in member_ids[:DRY_RUN_PREVIEW]]
+            more = len(member_ids) - len(preview)
+            content = (
+                f"🔍 **{kind.title}** (dry-run) — {len(member_ids)} leden zouden aangepast worden"
+            )
+            if preview:
+                content += "\n" + ", ".join(preview)
+            if more > 0:
+                content += f" en {more} anderen"
+        elif not member_ids:
+            content = f"✅ **{kind.title}** — geen leden om aan te passen."
+        else:
+            content = _format_progress(job, kind, job["counts"], None, 1)
+
+        message = await channel.send(content, allowed_mentions=discord.AllowedMentions.none())
+        job["channel_id"] = message.channel.id
+        job["message_id"] = message.id
+
+        # Dry runs and jobs without members are done already, there is nothing to resume
+        if job["status"] == "running":
+            result = await self.collection.insert_one(job)
+            job["_id"] = result.inserted_id
+            logger.info(
+                f"Member job {name} started in {guild} by {requested_by}: "
+                f"{len(member_ids)} members"
+            )
+            self._spawn(job)
+        return job, message
+
+    def _spawn(self, job: dict):
+        task = asyncio.create_task(self._run(job))
+        self.tasks[job["_id"]] = task
+        task.add_done_callback(lambda _: self.tasks.pop(job["_id"], None))
+
+    async def _resume(self):
+        await self.bot.wait_until_ready()
+        async for job in self.collection.find({"status": "running"}):
+            if job["_id"] in self.tasks:
+                continue
+            if job["kind"] not in self.kinds:
+                logger.warning(f"Cannot resume member job {job['_id']}: unknown kind {job['kind']}")
+                continue
+            logger.info(
+                f"Resuming member job {job['kind']} ({job['_id']}) at "
+                f"{job['position']}/{len(job['member_ids'])}"
+            )
+            self._spawn(job)
+
+    async def _edit_status(self, job: dict, content: str):
+        channel = self.bot.get_channel(job["channel_id"])
+        if channel is None:
+            return
+        try:
+            await channel.get_partial_message(job["message_id"]).edit(content=content)
+        except discord.HTTPException as e:
+            logger.debug(f"Could not update the status of member job {job['_id']}: {e}")
+
+    async def _save(self, job: dict, position: int, counts: Dict[str, int], **fields):
+        await self.collection.update_one(
+            {"_id": job["_id"]},
+            {"$set": {"position": position, "counts": dict(counts), **fields}},
+        )
+
+    async def _fail(self, job: dict, reason: str):
+        """Mark a job failed, so it isn't resumed and doesn't block new jobs of its kind."""
+        try:
+            await self.collection.update_one(
+                {"_id": job["_id"]},
+                {
+                    "$set": {
+                        "status": "failed",
+                        "error": reason,
+                        "finished_at": discord.utils.utcnow(),
+                    }
+                },
+            )
+        except Exception as e:
+            logger.error(f"Could not mark member job {job['_id']} as failed: {e}")
+        kind = self.kinds.get(job["kind"])
+        title = kind.title if kind else job["kind"]
+        await self._edit_status(job, f"❌ **{title}** mislukt: {reason}")
+
+    async def _run(self, job: dict):
+        current_caller.set(f"member job {job['kind']}")
+        try:
+            await self._process(job)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Member job {job['kind']} ({job['_id']}) failed: {e}", exc_info=True)
+            await self._fail(job, str(e))
+
+    async def _process(self, job: dict):
+        kind = self.kinds[job["kind"]]
+        guild = self.bot.get_guild(job["guild_id"])
+        if guild is None:
+            logger.warning(f"Member job {job['_id']}: guild {job['guild_id']} not available")
+            await self._fail(job, "server niet beschikbaar")
+            return
+
+        member_ids: List[int] = job["member_ids"]
+        params = job.get("params", {})
+        route = kind.route(guild)
+
+        # Everything before `position` is finished and counted in `counts`; results of
+        # members after it wait in `results` until the gap before them is closed.
+        position = job["position"]
+        counts = {DONE: 0, SKIPPED: 0, FAILED: 0, **job.get("counts", {})}
+        results: Dict[int, str] = {}
+        limit = AdaptiveLimit()
+        started = time.monotonic()
+        processed_here = 0
+        last_save = last_status = started
+
+        async def process(index: int):
+            nonlocal processed_here
+            request_started = time.monotonic()
+            throttled = False
+            try:
+                results[index] = await kind.apply(guild, member_ids[index], params)
+            except discord.HTTPException as e:
+                throttled = e.status == 429
+                results[index] = FAILED
+                logger.warning(f"Member job {job['kind']}: {member_ids[index]} failed: {e}")
+            except Exception as e:
+                results[index] = FAILED
+                logger.error(
+                    f"Member job {job['kind']}: {member_ids[index]} failed: {e}", exc_info=True
+                )
+            finally:
+                processed_here += 1
+                throttled = throttled or time.monotonic() - request_started >= SLOW_REQUEST
+                await limit.release(throttled, bucket_limit(self.bot.http, route))
+
+        def advance() -> int:
+            nonlocal position
+            while position in results:
+                counts[results.pop(position)] += 1
+                position += 1
+            return position
+
+        in_flight = set()
+        try:
+            for index in range(position, len(member_ids)):
+                await limit.acquire()
+                task = asyncio.create_task(process(index))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+
+                now = time.monotonic()
+                if now - last_save >= SAVE_INTERVAL:
+                    last_save = now
+                    await self._save(job, advance(), counts)
+                if now - last_status >= STATUS_INTERVAL:
+                    last_status = now
+                    live = dict(counts)
+                    for result in results.values():
+                        live[result] += 1
+                    remaining = len(member_ids) - sum(live.values())
+                    rate = processed_here / max(now - started, 1e-6)
+                    eta = None
+                    if rate > 0:
+                        eta = discord.utils.utcnow() + datetime.timedelta(seconds=remaining / rate)
+                    await self._edit_status(
+                        job, _format_progress(job, kind, live, eta, limit.limit)
+                    )
+
+            if in_flight:
+                await asyncio.gather(*in_flight)
+        except asyncio.CancelledError:
+            for task in in_flight:
+                task.cancel()
+            await asyncio.shield(self._save(job, advance(), counts))
+            logger.info(f"Member job {job['_id']} paused at {position}/{len(member_ids)}")
+            raise
+        except Exception:
+            for task in in_flight:
+                task.cancel()
+            raise
+
+        await self._save(job, advance(), counts, status="done", finished_at=discord.utils.utcnow())
+        await self._edit_status(job, _format_finished(job, kind, counts))
+        logger.info(f"Member job {job['kind']} ({job['_id']}) finished: {counts}")
@@ -0,0 +1,161 @@
+"""
+Mapping between modmail thread channel messages and their DM counterparts.
+
+Every relayed message exists twice: once in the thread channel and once in the DM
+with the recipient. The pair is recorded when it is created, so edits and deletes
+can find the other half directly instead of scanning channel history.
+"""
+
+import datetime
+import logging
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional
+
+from pymongo import DESCENDING
+from pymongo.errors import PyMongoError
+
+from utils.indexes import index_registry
+
+logger = logging.getLogger(__name__)
+
+MAX_ENTRIES = 5_000  # links kept in memory, older ones are read from MongoDB
+
+
+class MessageLink(NamedTuple):
+    thread_message_id: int
+    channel_id: int
+    dm_message_id: int
+    from_mod: bool
+
+
+class MessageLinkStore:
+    """
+    Bounded in-memory map of thread message ID <-> DM message ID, backed by the
+    `modmail_message_links` collection so links survive restarts.
+    """
+
+    def __init__(self, db, max_entries: int = MAX_ENTRIES):
+        self.collection = db.modmail_message_links
+        self.max_entries = max_entries
+        index_registry.index(self.collection.name, "dm_message_id")
+        index_registry.index(
+            self.collection.name, [("channel_id", 1), ("from_mod", 1), ("_id", DESCENDING)]
+        )
+        index_registry.query(self.collection.name, {"dm_message_id": 0})
+        self._by_thread_message: "OrderedDict[int, MessageLink]" = OrderedDict()
+        self._by_dm_message: Dict[int, int] = {}
+        # channel_id -> thread message ID of the latest staff reply
+        self._last_staff_message: Dict[int, int] = {}
+
+    def _remember(self, link: MessageLink):
+        previous = self._by_thread_message.get(link.thread_message_id)
+        if previous is not None and previous.dm_message_id != link.dm_message_id:
+            self._by_dm_message.pop(previous.dm_message_id, None)
+        self._by_thread_message[link.thread_message_id] = link
+        self._by_thread_message.move_to_end(link.thread_message_id)
+        self._by_dm_message[link.dm_message_id] = link.thread_message_id
+        while len(self._by_thread_message) > self.max_entries:
+            _, old = self._by_thread_message.popitem(last=False)
+            self._by_dm_message.pop(old.dm_message_id, None)
+
+    @staticmethod
+    def _from_document(document) -> MessageLink:
+        return MessageLink(
+            document["_id"],
+            document["channel_id"],
+            document["dm_message_id"],
+            document.get("from_mod", False),
+        )
+
+    async def record(
+        self, channel_id: int, thread_message_id: int, dm_message_id: int, from_mod: bool
+    ):
+        """Record a thread message and its DM counterpart."""
+        link = MessageLink(thread_message_id, channel_id, dm_message_id, from_mod)
+        self._remember(link)
+        if from_mod and thread_message_id > self._last_staff_message.get(channel_id, 0):
+            # Older messages are recorded too when their link is found by a history scan
+            self._last_staff_message[channel_id] = thread_message_id
+
+        try:
+            await self.collection.replace_one(
+                {"_id": thread_message_id},
+                {
+                    "_id": thread_message_id,
+                    "channel_id": channel_id,
+                    "dm_message_id": dm_message_id,
+                    "from_mod": from_mod,
+                    "created_at": datetime.datetime.now(datetime.timezone.utc),
+                },
+                upsert=True,
+            )
+        except PyMongoError as e:
+            logger.error(f"Failed to persist message link {thread_message_id}: {e}")
+
+    async def get_by_thread_message(self, thread_message_id: int) -> Optional[MessageLink]:
+        """Return the link of a thread channel message, or None."""
+        link = self._by_thread_message.get(thread_message_id)
+        if link is not None:
+            return link
+
+        document = await self.collection.find_one({"_id": thread_message_id})
+        if document is None:
+            return None
+        link = self._from_document(document)
+        self._remember(link)
+        return link
+
+    async def get_by_dm_message(self, dm_message_id: int) -> Optional[MessageLink]:
+        """Return the link of a DM message, or None."""
+        thread_message_id = self._by_dm_message.get(dm_message_id)
+        if thread_message_id is not None:
+            link = self._by_thread_message.get(thread_message_id)
+            if link is not None and link.dm_message_id == dm_message_id:
+                return link
+
+        document = await self.collection.find_one({"dm_message_id": dm_message_id})
+        if document is None:
+            return None
+        link = self._from_document(document)
+        self._remember(link)
+        return link
+
+    async def get_last_staff_message(self, channel_id: int) -> Optional[MessageLink]:
+        """Return the link of the latest staff reply in a thread channel, or None."""
+        thread_message_id = self._last_staff_message.get(channel_id)
+        if thread_message_id is not None:
+            return await self.get_by_thread_message(thread_message_id)
+
+        document = await self.collection.find_one(
+            {"channel_id": channel_id, "from_mod": True}, sort=[("_id", DESCENDING)]
+        )
+        if document is None:
+            return None
+        link = self._from_document(document)
+        self._remember(link)
+        self._last_staff_message[channel_id] = link.thread_message_id
+        return link
+
+    async def forget(self, thread_message_id: int):
+        """Remove a single link (e.g. after the messages were deleted)."""
+        link = self._by_thread_message.pop(thread_message_id, None)
+        if link is not None:
+            self._by_dm_message.pop(link.dm_message_id, None)
+            if self._last_staff_message.get(link.channel_id) == thread_message_id:
+                del self._last_staff_message[link.channel_id]
+        try:
+            await self.collection.delete_one({"_id": thread_message_id})
+        except PyMongoError as e:
+            logger.error(f"Failed to remove message link {thread_message_id}: {e}")
+
+    async def forget_channel(self, channel_id: int):
+        """Remove every link of a thread channel (after the thread was closed)."""
+        stale = [k for k, link in self._by_thread_message.items() if link.channel_id == channel_id]
+        for thread_message_id in stale:
+            link = self._by_thread_message.pop(thread_message_id)
+            self._by_dm_message.pop(link.dm_message_id, None)
+        self._last_staff_message.pop(channel_id, None)
+        try:
+            await self.collection.delete_many({"channel_id": channel_id})
+        except PyMongoError as e:
+            logger.error(f"Failed to remove message links of channel {channel_id}: {e}")
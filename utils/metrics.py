@@ -0,0 +1,207 @@
+"""
+In-process metrics exposed in the Prometheus text format on the health server (/metrics).
+
+Everything is recorded without locks: command latencies and gauges live on the event
+loop, and MongoDB command events (which pymongo reports from the driver's worker
+threads to `MongoMonitor`) wait in its deque and are folded into the histograms on the
+event loop.
+"""
+
+import asyncio
+import bisect
+import collections
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from discord import Interaction, app_commands
+
+from utils.mongo_monitor import MongoMonitor, current_caller
+
+COMMAND_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+MONGO_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+LOOP_LAG_INTERVAL = 1.0  # seconds between event loop lag samples
+
+Labels = Tuple[Tuple[str, str], ...]
+GaugeValue = Union[float, Dict[Labels, float]]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Cumulative histogram with fixed upper bounds, one series per label set."""
+
+    def __init__(self, name: str, help_text: str, buckets: Iterable[float]):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        # labels -> [bucket counts..., +Inf count, sum]
+        self.series: Dict[Labels, List[float]] = {}
+
+    def observe(self, value: float, labels: Labels = ()):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, series in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                cumulative += count
+                bucket_labels = _format_labels(labels + (("le", str(bound)),))
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {series[-1]!r}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter, one series per label set."""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self.series: Dict[Labels, float] = collections.defaultdict(int)
+
+    def inc(self, labels: Labels = (), amount: float = 1):
+        self.series[labels] += amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in self.series.items():
+            lines.append(f"{self.name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class Metrics:
+    """Registry of the bot's metrics; `render` produces the /metrics response body."""
+
+    def __init__(self, mongo_monitor: Optional[MongoMonitor] = None):
+        self.command_latency = Histogram(
+            "bot_app_command_duration_seconds",
+            "Time from the start of a slash command until it finished",
+            COMMAND_BUCKETS,
+        )
+        self.mongo_duration = Histogram(
+            "bot_mongo_operation_duration_seconds",
+            "Duration of MongoDB commands per collection and operation",
+            MONGO_BUCKETS,
+        )
+        self.mongo_operations = Counter(
+            "bot_mongo_operations_total", "MongoDB commands per collection, operation and status"
+        )
+        self.loop_lag = Histogram(
+            "bot_event_loop_lag_seconds",
+            "How late the event loop woke up a sleeping task",
+            LOOP_LAG_BUCKETS,
+        )
+        # Source of the MongoDB command events (the bot's single command listener)
+        self.mongo_monitor = mongo_monitor
+        # name -> (help, callback returning a value or {labels: value})
+        self._gauges: Dict[str, Tuple[str, Callable[[], GaugeValue]]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.last_loop_lag = 0.0
+
+    def gauge(self, name: str, help_text: str, callback: Callable[[], GaugeValue]):
+        """Register a gauge whose value is read from `callback` on every scrape."""
+        self._gauges[name] = (help_text, callback)
+
+    # --- slash commands ---
+
+    def command_started(self, interaction: Interaction):
+        interaction.extras["metrics_started"] = time.perf_counter()
+
+    def command_finished(self, interaction: Interaction, status: str):
+        started = interaction.extras.pop("metrics_started", None)
+        if started is None:
+            return
+        command = interaction.command
+        name = command.qualified_name if command is not None else "unknown"
+        self.command_latency.observe(
+            time.perf_counter() - started, (("command", name), ("status", status))
+        )
+
+    # --- background sampling ---
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._sample_loop_lag())
+
+    def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+
+    async def _sample_loop_lag(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + LOOP_LAG_INTERVAL
+            await asyncio.sleep(LOOP_LAG_INTERVAL)
+            self.last_loop_lag = max(0.0, loop.time() - expected)
+            self.loop_lag.observe(self.last_loop_lag)
+            self.collect()
+
+    def collect(self):
+        """Fold the MongoDB events recorded since the last call into the histograms."""
+        if self.mongo_monitor is None:
+            return
+        events = self.mongo_monitor.events
+        for _ in range(len(events)):
+            collection, operation, duration, succeeded = events.popleft()
+            labels = (("collection", collection), ("operation", operation))
+            self.mongo_duration.observe(duration, labels)
+            self.mongo_operations.inc(labels + (("status", "ok" if succeeded else "error"),))
+
+    def render(self) -> str:
+        self.collect()
+        lines: List[str] = []
+        for name, (help_text, callback) in self._gauges.items():
+            try:
+                value = callback()
+            except Exception:
+                continue
+            if value is None:
+                continue
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+            series = value if isinstance(value, dict) else {(): value}
+            for labels, number in series.items():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(number)}")
+        for metric in (
+            self.command_latency,
+            self.mongo_duration,
+            self.mongo_operations,
+            self.loop_lag,
+        ):
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+class MetricsCommandTree(app_commands.CommandTree):
+    """
+    Command tree that marks when a slash command starts (for the latency histogram) and
+    which command the following MongoDB queries belong to.
+    """
+
+    async def interaction_check(self, interaction: Interaction, /) -> bool:
+        metrics = getattr(self.client, "metrics", None)
+        if metrics is not None:
+            metrics.command_started(interaction)
+        command = interaction.command
+        if command is not None:
+            cog = getattr(command.binding, "qualified_name", None)
+            current_caller.set(f"/{command.qualified_name} ({cog})")
+        return True
@@ -0,0 +1,231 @@
+"""
+MongoDB command monitoring: slow-operation log, rolling percentiles and collection scans.
+
+`MongoMonitor` is a pymongo `CommandListener`. pymongo calls it from the driver's worker
+threads, but motor runs those with a copy of the caller's context, so `current_caller`
+(set when a slash command, prefix command or event handler starts) tells which cog or
+command issued a query. The first time a query shape is seen it is explained on the
+event loop; shapes whose winning plan is a COLLSCAN are logged once.
+
+It is the only command listener of the client: the durations for /metrics are queued in
+`events` and folded in by `utils.metrics.Metrics`.
+"""
+
+import asyncio
+import collections
+import contextvars
+import json
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+
+logger = logging.getLogger("bot.mongo")
+
+current_caller: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "mongo_caller", default=None
+)
+
+WINDOW_SIZE = 500  # durations kept per collection/operation for the percentiles
+MAX_SHAPES = 2_000  # distinct query shapes remembered (and explained)
+MAX_PENDING_EVENTS = 100_000  # events waiting for `Metrics.collect` (oldest are dropped)
+EXPLAINABLE = {"find", "aggregate", "count", "distinct", "update", "delete", "findAndModify"}
+# Driver/session fields that explain doesn't accept or doesn't need
+DRIVER_FIELDS = {
+    "lsid",
+    "$db",
+    "$clusterTime",
+    "$readPreference",
+    "txnNumber",
+    "readConcern",
+    "writeConcern",
+    "startTransaction",
+    "autocommit",
+}
+
+
+def _shape(value):
+    """Replace the values of a query by "?", keeping field names and operators."""
+    if isinstance(value, dict):
+        return {key: _shape(item) for key, item in value.items()}
+    if isinstance(value, list) and value and all(isinstance(item, dict) for item in value):
+        return [_shape(item) for item in value]
+    return "?"
+
+
+def _query_of(command_name: str, command: dict):
+    if command_name == "find":
+        return {"filter": command.get("filter", {}), "sort": command.get("sort")}
+    if command_name == "aggregate":
+        pipeline = command.get("pipeline", [])
+        first = pipeline[0] if pipeline else {}
+        return {
+            "stages": [next(iter(stage), "?") for stage in pipeline],
+            "match": first.get("$match"),
+        }
+    if command_name in ("count", "distinct", "findAndModify"):
+        return command.get("query", {})
+    if command_name == "update":
+        return (command.get("updates") or [{}])[0].get("q", {})
+    if command_name == "delete":
+        return (command.get("deletes") or [{}])[0].get("q", {})
+    return None
+
+
+def has_collscan(document, winning: bool = False) -> bool:
+    """True if any winning plan in an explain result contains a COLLSCAN stage."""
+    if isinstance(document, dict):
+        if winning and document.get("stage") == "COLLSCAN":
+            return True
+        return any(
+            has_collscan(value, winning or key in ("winningPlan", "queryPlan"))
+            for key, value in document.items()
+            if key != "rejectedPlans"
+        )
+    if isinstance(document, list):
+        return any(has_collscan(item, winning) for item in document)
+    return False
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class MongoMonitor(monitoring.CommandListener):
+    """Records duration, collection, caller and query shape of every MongoDB command."""
+
+    def __init__(self, slow_ms: int = 100, explain_new_shapes: bool = False):
+        self.slow_ms = slow_ms
+        self.explain_new_shapes = explain_new_shapes
+        self.client = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # (connection, request_id) -> (collection, shape, caller)
+        self._running: Dict[tuple, Tuple[str, str, Optional[str]]] = {}
+        # (collection, operation) -> recent durations in ms
+        self.durations: Dict[Tuple[str, str], collections.deque] = {}
+        self.counts: "collections.Counter[Tuple[str, str]]" = collections.Counter()
+        self.slow_count = 0
+        self._shapes: set = set()
+        # shape -> caller that first issued it
+        self.collscans: Dict[str, Optional[str]] = {}
+        self._explain_lock: Optional[asyncio.Semaphore] = None
+        # (collection, operation, seconds, succeeded) for the /metrics histograms
+        self.events: "collections.deque[Tuple[str, str, float, bool]]" = collections.deque(
+            maxlen=MAX_PENDING_EVENTS
+        )
+
+    def start(self, client):
+        """Enable explain sampling (call from the running event loop)."""
+        self.client = client
+        self._loop = asyncio.get_running_loop()
+        self._explain_lock = asyncio.Semaphore(1)
+
+    # --- CommandListener ---
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        name = event.command_name
+        command = event.command
+        if name == "getMore":
+            collection = str(command.get("collection", ""))
+        else:
+            value = command.get(name)
+            collection = value if isinstance(value, str) else ""
+
+        query = None if name == "explain" else _query_of(name, command)
+        shape = f"{collection}.{name}"
+        if query is not None:
+            shape += " " + json.dumps(_shape(query), sort_keys=True, default=str)
+        caller = current_caller.get()
+        self._running[(event.connection_id, event.request_id)] = (collection, shape, caller)
+
+        if (
+            self.explain_new_shapes
+            and self._loop is not None
+            and name in EXPLAINABLE
+            and shape not in self._shapes
+            and len(self._shapes) < MAX_SHAPES
+        ):
+            self._shapes.add(shape)
+            explain = {k: v for k, v in command.items() if k not in DRIVER_FIELDS}
+            for key in ("updates", "deletes"):
+                if key in explain:
+                    explain[key] = explain[key][:1]
+            self._loop.call_soon_threadsafe(
+                self._schedule_explain, event.database_name, explain, shape, caller
+            )
+
+    def _finished(self, event, succeeded: bool):
+        running = self._running.pop((event.connection_id, event.request_id), None)
+        collection, shape, caller = running or ("", event.command_name, None)
+        key = (collection, event.command_name)
+        elapsed_ms = event.duration_micros / 1000
+        self.events.append((collection, event.command_name, elapsed_ms / 1000, succeeded))
+
+        window = self.durations.get(key)
+        if window is None:
+            window = self.durations.setdefault(key, collections.deque(maxlen=WINDOW_SIZE))
+        window.append(elapsed_ms)
+        self.counts[key] += 1
+
+        if elapsed_ms >= self.slow_ms and event.command_name not in ("getMore", "explain"):
+            self.slow_count += 1
+            status = "" if succeeded else " (failed)"
+            logger.warning(
+                f"Slow MongoDB {event.command_name} on {collection or '-'}{status}: "
+                f"{elapsed_ms:.0f} ms by {caller or 'unknown'} — {shape}"
+            )
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        self._finished(event, True)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        self._finished(event, False)
+
+    # --- explain sampling (event loop) ---
+
+    def _schedule_explain(self, database: str, command: dict, shape: str, caller):
+        asyncio.ensure_future(self._explain(database, command, shape, caller))
+
+    async def _explain(self, database: str, command: dict, shape: str, caller):
+        async with self._explain_lock:
+            token = current_caller.set("explain")
+            try:
+                result = await self.client[database].command(
+                    {"explain": command, "verbosity": "queryPlanner"}
+                )
+            except Exception as e:
+                logger.debug(f"Explain failed for {shape}: {e}")
+                return
+            finally:
+                current_caller.reset(token)
+
+        if has_collscan(result):
+            self.collscans[shape] = caller
+            logger.warning(f"MongoDB collection scan by {caller or 'unknown'}: {shape}")
+
+    # --- reporting ---
+
+    def summary(self, limit: int = 15) -> List[Tuple[str, str, int, float, float, float, float]]:
+        """
+        (collection, operation, count, p50, p95, p99, max) in ms for the slowest operations,
+        sorted by p95.
+        """
+        rows = []
+        for (collection, operation), window in list(self.durations.items()):
+            values = sorted(window)
+            if not values:
+                continue
+            rows.append(
+                (
+                    collection or "-",
+                    operation,
+                    self.counts[(collection, operation)],
+                    _percentile(values, 0.50),
+                    _percentile(values, 0.95),
+                    _percentile(values, 0.99),
+                    values[-1],
+                )
+            )
+        rows.sort(key=lambda row: row[4], reverse=True)
+        return rows[:limit]
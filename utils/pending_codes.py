@@ -0,0 +1,253 @@
+"""
+Stores for pending verification codes.
+
+Two backends share one interface:
+
+- `MemoryCodeStore`: bounded LRU with a TTL, for a single pod or local development.
+- `MongoCodeStore`: documents with a TTL index, survives restarts and is shared
+  between pods.
+
+Both keep per-user counters so code requests and wrong guesses can be rate limited.
+"""
+
+import asyncio
+import datetime
+import logging
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from cryptography.fernet import Fernet, InvalidToken
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from env import ENCRYPTION_KEY
+from utils.indexes import index_registry
+
+logger = logging.getLogger(__name__)
+
+CODE_TTL = 600  # 10 minutes
+REQUEST_WINDOW = 3600  # window for counting code requests
+MAX_REQUESTS = 5  # code requests per user per window
+MAX_ATTEMPTS = 5  # wrong guesses before a code is invalidated
+MAX_ENTRIES = 10_000  # memory backend bound
+SWEEP_INTERVAL = 60
+
+
+class PendingCode(NamedTuple):
+    code: str
+    email: str
+    created_at: float
+    attempts: int = 0
+
+
+class PendingCodeStore(ABC):
+    """Interface for pending verification code stores."""
+
+    def __init__(self, ttl: int = CODE_TTL):
+        self.ttl = ttl
+        self._sweeper: Optional[asyncio.Task] = None
+
+    @abstractmethod
+    async def allow_request(self, user_id: int) -> bool:
+        """Count a code request; False if the user exceeded MAX_REQUESTS in the window."""
+
+    @abstractmethod
+    async def put(self, user_id: int, code: str, email: str):
+        """Store a new code for a user, replacing any previous one."""
+
+    @abstractmethod
+    async def get(self, user_id: int) -> Optional[PendingCode]:
+        """Return the pending code of a user, or None if there is none or it expired."""
+
+    @abstractmethod
+    async def register_failed_attempt(self, user_id: int) -> int:
+        """Count a wrong guess and return the number of wrong guesses for this code."""
+
+    @abstractmethod
+    async def pop(self, user_id: int):
+        """Remove the pending code of a user."""
+
+    @abstractmethod
+    async def sweep(self) -> int:
+        """Remove expired entries and return how many were removed."""
+
+    def start_sweeper(self):
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    def stop_sweeper(self):
+        if self._sweeper and not self._sweeper.done():
+            self._sweeper.cancel()
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(SWEEP_INTERVAL)
+            try:
+                removed = await self.sweep()
+                if removed:
+                    logger.debug(f"Removed {removed} expired pending verification codes")
+            except Exception as e:
+                logger.error(f"Failed to sweep pending verification codes: {e}")
+
+
+class MemoryCodeStore(PendingCodeStore):
+    """In-process LRU+TTL store. Memory is bounded by `max_entries`, even under abuse."""
+
+    def __init__(self, ttl: int = CODE_TTL, max_entries: int = MAX_ENTRIES):
+        super().__init__(ttl)
+        self.max_entries = max_entries
+        self._codes: "OrderedDict[int, PendingCode]" = OrderedDict()
+        # user_id -> (window start, request count)
+        self._requests: "OrderedDict[int, tuple]" = OrderedDict()
+
+    @staticmethod
+    def _bounded_set(store: OrderedDict, key, value, max_entries: int):
+        store[key] = value
+        store.move_to_end(key)
+        while len(store) > max_entries:
+            store.popitem(last=False)
+
+    async def allow_request(self, user_id: int) -> bool:
+        now = time.time()
+        window_start, count = self._requests.get(user_id, (now, 0))
+        if now - window_start >= REQUEST_WINDOW:
+            window_start, count = now, 0
+        count += 1
+        self._bounded_set(self._requests, user_id, (window_start, count), self.max_entries)
+        return count <= MAX_REQUESTS
+
+    async def put(self, user_id: int, code: str, email: str):
+        self._bounded_set(
+            self._codes, user_id, PendingCode(code, email, time.time()), self.max_entries
+        )
+
+    async def get(self, user_id: int) -> Optional[PendingCode]:
+        entry = self._codes.get(user_id)
+        if entry is None:
+            return None
+        if time.time() - entry.created_at > self.ttl:
+            self._codes.pop(user_id, None)
+            return None
+        return entry
+
+    async def register_failed_attempt(self, user_id: int) -> int:
+        entry = self._codes.get(user_id)
+        if entry is None:
+            return 0
+        entry = entry._replace(attempts=entry.attempts + 1)
+        self._codes[user_id] = entry
+        return entry.attempts
+
+    async def pop(self, user_id: int):
+        self._codes.pop(user_id, None)
+
+    async def sweep(self) -> int:
+        now = time.time()
+        expired = [uid for uid, entry in self._codes.items() if now - entry.created_at > self.ttl]
+        for uid in expired:
+            del self._codes[uid]
+        stale = [uid for uid, (start, _) in self._requests.items() if now - start >= REQUEST_WINDOW]
+        for uid in stale:
+            del self._requests[uid]
+        return len(expired)
+
+
+class MongoCodeStore(PendingCodeStore):
+    """
+    MongoDB-backed store. Documents expire through TTL indexes on `expires_at`;
+    reads check the expiry as well because the TTL monitor only runs once a minute.
+    The email address is stored encrypted.
+    """
+
+    def __init__(self, db, ttl: int = CODE_TTL):
+        super().__init__(ttl)
+        self.codes = db.pending_codes
+        self.requests = db.pending_code_requests
+        self._fernet = Fernet(ENCRYPTION_KEY.encode())
+        # TTL indexes: MongoDB removes the documents once `expires_at` has passed
+        index_registry.index(self.codes.name, "expires_at", expireAfterSeconds=0)
+        index_registry.index(self.requests.name, "expires_at", expireAfterSeconds=0)
+
+    @staticmethod
+    def _now() -> datetime.datetime:
+        return datetime.datetime.now(datetime.timezone.utc)
+
+    async def allow_request(self, user_id: int) -> bool:
+        now = self._now()
+        for _ in range(3):
+            document = await self.requests.find_one_and_update(
+                {"_id": user_id, "expires_at": {"$gt": now}},
+                {"$inc": {"count": 1}},
+                return_document=ReturnDocument.AFTER,
+            )
+            if document is not None:
+                return document["count"] <= MAX_REQUESTS
+
+            # No live window: replace an expired one or start the first
+            try:
+                await self.requests.replace_one(
+                    {"_id": user_id, "expires_at": {"$lte": now}},
+                    {
+                        "_id": user_id,
+                        "count": 1,
+                        "expires_at": now + datetime.timedelta(seconds=REQUEST_WINDOW),
+                    },
+                    upsert=True,
+                )
+                return True
+            except DuplicateKeyError:
+                # A concurrent request started the window first: count in that one
+                continue
+
+        logger.warning(f"Could not count code request of {user_id}, refusing it")
+        return False
+
+    async def put(self, user_id: int, code: str, email: str):
+        now = self._now()
+        await self.codes.replace_one(
+            {"_id": user_id},
+            {
+                "_id": user_id,
+                "code": code,
+                "email_encrypted": self._fernet.encrypt(email.encode()).decode(),
+                "created_at": now,
+                "expires_at": now + datetime.timedelta(seconds=self.ttl),
+                "attempts": 0,
+            },
+            upsert=True,
+        )
+
+    def _to_pending_code(self, document) -> Optional[PendingCode]:
+        try:
+            email = self._fernet.decrypt(document["email_encrypted"].encode()).decode()
+        except InvalidToken:
+            logger.error(f"Could not decrypt pending code for user {document['_id']}")
+            return None
+        created_at = document["created_at"].replace(tzinfo=datetime.timezone.utc).timestamp()
+        return PendingCode(document["code"], email, created_at, document.get("attempts", 0))
+
+    async def get(self, user_id: int) -> Optional[PendingCode]:
+        document = await self.codes.find_one({"_id": user_id, "expires_at": {"$gt": self._now()}})
+        if document is None:
+            return None
+        return self._to_pending_code(document)
+
+    async def register_failed_attempt(self, user_id: int) -> int:
+        document = await self.codes.find_one_and_update(
+            {"_id": user_id},
+            {"$inc": {"attempts": 1}},
+            projection={"attempts": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        return document["attempts"] if document else 0
+
+    async def pop(self, user_id: int):
+        await self.codes.delete_one({"_id": user_id})
+
+    async def sweep(self) -> int:
+        now = self._now()
+        result = await self.codes.delete_many({"expires_at": {"$lte": now}})
+        await self.requests.delete_many({"expires_at": {"$lte": now}})
+        return result.deleted_count
@@ -2,14 +2,25 @@
 Utility for managing persistent views that survive bot restarts.
 """
 
+import asyncio
 import logging
+import time
+from collections import defaultdict
 from typing import Any, Dict, List, Optional
 
 import discord
 from discord.ext import commands
 
+from utils.indexes import index_registry
+
 logger = logging.getLogger(__name__)
 
+VERIFY_CONCURRENCY = 5  # concurrent fetch_message calls in the background check
+
+index_registry.index("persistent_views", [("view_type", 1), ("guild_id", 1)])
+index_registry.index("persistent_views", [("channel_id", 1), ("message_id", 1)])
+index_registry.query("persistent_views", {"channel_id": 0, "message_id": 0})
+
 
 class PersistentViewManager:
     """Manages persistent views that need to survive bot restarts."""
@@ -17,6 +28,7 @@ class PersistentViewManager:
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         self.collection = bot.db.persistent_views
+        self._verify_task: Optional[asyncio.Task] = None
 
     async def store_view_message(
         self,
@@ -93,24 +105,17 @@ class PersistentViewManager:
             logger.error(f"Failed to remove persistent view for message {message_id}: {e}")
 
     async def restore_views(self):
-        """Restore all persistent views on bot startup."""
+        """
+        Restore all persistent views on bot startup.
+
+        Views are registered straight from the stored metadata, without fetching the
+        messages, so interactions work right away. Whether the messages still exist is
+        checked afterwards by a background pass that prunes dead entries.
+        """
         logger.info("Starting persistent view restoration...")
+        started = time.perf_counter()
 
         try:
-            # Check if collection exists and has documents
-            try:
-                count = await self.collection.count_documents({})
-                if count == 0:
-                    logger.info(
-                        "No persistent views found to restore (first run or empty collection)"
-                    )
-                    return
-            except Exception as e:
-                logger.info(
-                    f"Persistent views collection doesn't exist yet or is inaccessible: {e}"
-                )
-                return
-
             view_messages = await self.get_view_messages()
             if not view_messages:
                 logger.info("No persistent views found to restore")
@@ -118,41 +123,93 @@ class PersistentViewManager:
 
             restored_count = 0
             failed_count = 0
+            # view_type -> (count, total seconds)
+            timings: Dict[str, List[float]] = defaultdict(lambda: [0, 0.0])
+            shared: Dict[str, Any] = {}
 
             for view_data in view_messages:
+                view_started = time.perf_counter()
                 try:
-                    success = await self._restore_single_view(view_data)
-                    if success:
-                        restored_count += 1
-                    else:
-                        failed_count += 1
+                    success = await self._restore_single_view(view_data, shared)
                 except Exception as e:
                     logger.error(f"Failed to restore view {view_data.get('_id', 'unknown')}: {e}")
+                    success = False
+
+                elapsed = time.perf_counter() - view_started
+                timing = timings[view_data.get("view_type", "unknown")]
+                timing[0] += 1
+                timing[1] += elapsed
+                if success:
+                    restored_count += 1
+                else:
                     failed_count += 1
 
+            for view_type, (count, total) in sorted(timings.items()):
+                logger.info(
+                    f"Restored {count} {view_type} view(s) in {total * 1000:.1f} ms "
+                    f"({total * 1000 / count:.2f} ms per view)"
+                )
             logger.info(
-                f"Persistent view restoration complete: {restored_count} restored, {failed_count} failed"
+                f"Persistent view restoration complete: {restored_count} restored, "
+                f"{failed_count} failed in {(time.perf_counter() - started) * 1000:.1f} ms"
             )
 
+            if self._verify_task is None or self._verify_task.done():
+                self._verify_task = asyncio.create_task(self._verify_messages(view_messages))
+
         except Exception as e:
             logger.error(f"Failed to restore persistent views: {e}")
             # Don't re-raise the exception to prevent bot startup failure
 
-    async def _restore_single_view(self, view_data: Dict[str, Any]) -> bool:
-        """Restore a single persistent view."""
+    async def _restore_single_view(
+        self, view_data: Dict[str, Any], shared: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """Register a single persistent view from its stored metadata."""
         view_type = view_data["view_type"]
-        channel_id = view_data["channel_id"]
         message_id = view_data["message_id"]
         guild_id = view_data["guild_id"]
         additional_data = view_data.get("additional_data", {})
 
-        # Get the channel and message
-        channel = self.bot.get_channel(channel_id)
-        if not channel:
-            logger.warning(f"Channel {channel_id} not found for view {view_type}")
+        # Create and add the appropriate view
+        view = await self._create_view(view_type, guild_id, additional_data, shared)
+        if view:
+            self.bot.add_view(view, message_id=message_id)
+            logger.debug(f"Restored {view_type} view for message {message_id}")
+            return True
+        else:
+            logger.warning(f"Failed to create view of type {view_type}")
             return False
 
+    async def _verify_messages(self, view_messages: List[Dict[str, Any]]):
+        """Check in the background that the stored messages still exist, prune dead ones."""
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(VERIFY_CONCURRENCY)
+
+        async def verify(view_data: Dict[str, Any]) -> bool:
+            async with semaphore:
+                return await self._verify_single_message(view_data)
+
+        results = await asyncio.gather(
+            *(verify(view_data) for view_data in view_messages), return_exceptions=True
+        )
+        pruned = sum(1 for result in results if result is False)
+        errors = [result for result in results if isinstance(result, Exception)]
+        for error in errors:
+            logger.error(f"Failed to verify persistent view message: {error}")
+
+        logger.info(
+            f"Verified {len(view_messages)} persistent view message(s) in "
+            f"{time.perf_counter() - started:.1f}s: {pruned} pruned"
+        )
+
+    async def _verify_single_message(self, view_data: Dict[str, Any]) -> bool:
+        """Return False (after removing the entry) if the message of a view is gone."""
+        view_type = view_data["view_type"]
+        channel_id = view_data["channel_id"]
+        message_id = view_data["message_id"]
+
         try:
+            channel = self.bot.get_channel(channel_id) or await self.bot.fetch_channel(channel_id)
             await channel.fetch_message(message_id)
         except discord.NotFound:
             logger.warning(
@@ -162,22 +219,26 @@ class PersistentViewManager:
             return False
         except discord.Forbidden:
             logger.warning(f"No permission to access message {message_id} for view {view_type}")
-            return False
+        return True
 
-        # Create and add the appropriate view
-        view = await self._create_view(view_type, guild_id, additional_data)
-        if view:
-            self.bot.add_view(view, message_id=message_id)
-            logger.debug(f"Restored {view_type} view for message {message_id}")
-            return True
-        else:
-            logger.warning(f"Failed to create view of type {view_type}")
-            return False
+    def stop(self):
+        """Stop the background verification pass."""
+        if self._verify_task and not self._verify_task.done():
+            self._verify_task.cancel()
 
     async def _create_view(
-        self, view_type: str, guild_id: int, additional_data: Dict[str, Any]
+        self,
+        view_type: str,
+        guild_id: int,
+        additional_data: Dict[str, Any],
+        shared: Optional[Dict[str, Any]] = None,
     ) -> Optional[discord.ui.View]:
-        """Create a view instance based on the view type."""
+        """
+        Create a view instance based on the view type.
+
+        `shared` caches lookups (e.g. role categories) across the views of one restore run.
+        """
+        shared = shared if shared is not None else {}
         try:
             if view_type == "verification":
                 from cogs.verification import VerificationView
@@ -192,8 +253,9 @@ class PersistentViewManager:
                     view = RoleSelectorView(role_selector_cog)
                     # Refresh the view with current categories
                     try:
-                        categories = await role_selector_cog.get_categories()
-                        await view.refresh(categories)
+                        if "role_categories" not in shared:
+                            shared["role_categories"] = await role_selector_cog.get_categories()
+                        await view.refresh(shared["role_categories"])
                     except Exception as e:
                         logger.error(f"Failed to refresh role selector view with categories: {e}")
                         # Return the view anyway, it will work with empty categories
@@ -226,7 +288,7 @@ class PersistentViewManager:
 
                 # Fallback: try to load from database if additional data is missing
                 try:
-                    settings = await self.bot.db.settings.find_one({"_id": "mod_settings"}) or {}
+                    settings = await self.bot.settings.get("mod_settings") or {}
                     urc = settings.get("unban_request_kanaal_id")
                     log1 = settings.get("aanvragen_log_kanaal_id_1")
                     log2 = settings.get("aanvragen_log_kanaal_id_2")
@@ -0,0 +1,70 @@
+"""
+Adapting the number of concurrent REST requests to Discord's rate limits.
+
+discord.py already queues requests per rate limit bucket; sending more requests at
+once than a bucket allows only makes them wait. `AdaptiveLimit` finds how many are
+worth having in flight: it grows while requests come back quickly, is capped at the
+limit Discord reports for the route's bucket and is halved as soon as a request had to
+wait for the bucket to reset.
+"""
+
+import asyncio
+from typing import Optional
+
+from discord.http import Route
+
+MAX_CONCURRENCY = 10  # requests in flight, whatever the bucket allows
+SLOW_REQUEST = 2.0  # seconds; a slower request waited for its rate limit bucket
+
+
+def bucket_limit(http, route: Route) -> Optional[int]:
+    """
+    Requests per window Discord reported for the bucket of `route`, or None when the
+    bucket isn't known yet. Reads discord.py's rate limit state, so this is best effort.
+    """
+    try:
+        bucket_hash = http._bucket_hashes.get(route.key)
+        major = route.major_parameters
+        if bucket_hash is None:
+            keys = [f"{route.key}:{major}"]
+        else:
+            keys = [f"{bucket_hash}:{major}", bucket_hash + major]
+        for key in keys:
+            ratelimit = http._buckets.get(key)
+            if ratelimit is not None:
+                return ratelimit.limit
+    except Exception:
+        pass
+    return None
+
+
+class AdaptiveLimit:
+    """
+    Additive increase, multiplicative decrease of the number of requests in flight:
+    +1 per window of fast requests, halved after a throttled one.
+    """
+
+    def __init__(self, maximum: int = MAX_CONCURRENCY):
+        self.maximum = maximum
+        self.window = 1.0
+        self.active = 0
+        self._changed = asyncio.Condition()
+
+    @property
+    def limit(self) -> int:
+        return max(1, int(self.window))
+
+    async def acquire(self):
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+
+    async def release(self, throttled: bool, ceiling: Optional[int] = None):
+        async with self._changed:
+            self.active -= 1
+            if throttled:
+                self.window = max(1.0, self.window / 2)
+            else:
+                self.window = min(self.window + 1 / self.limit, ceiling or self.maximum)
+                self.window = min(self.window, self.maximum)
+            self._changed.notify_all()
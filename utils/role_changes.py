@@ -0,0 +1,103 @@
+"""
+Applying self-service role changes (role selector, channel menu) to a member.
+"""
+
+import asyncio
+import logging
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+import discord
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRIES = 3
+
+
+class RoleNameIndex:
+    """
+    Name -> role map per guild, built from `guild.roles` once instead of scanning the
+    role list for every lookup. discord.py updates role objects in place, so an entry
+    whose name changed or whose role was deleted is detected and the map is rebuilt.
+    """
+
+    def __init__(self):
+        self._maps: Dict[int, Dict[str, discord.Role]] = {}
+
+    def _build(self, guild: discord.Guild) -> Dict[str, discord.Role]:
+        roles: Dict[str, discord.Role] = {}
+        for role in guild.roles:
+            # Same result as discord.utils.get(guild.roles, name=...): the first match wins
+            roles.setdefault(role.name, role)
+        self._maps[guild.id] = roles
+        return roles
+
+    def get(self, guild: discord.Guild, name: str) -> Optional[discord.Role]:
+        """Return the role called `name`, or None."""
+        roles = self._maps.get(guild.id)
+        if roles is None:
+            roles = self._build(guild)
+
+        role = roles.get(name)
+        if role is not None and role.name == name and guild.get_role(role.id) is role:
+            return role
+
+        # Stale entry or unknown name (e.g. a role created since): rebuild once
+        return self._build(guild).get(name)
+
+
+role_names = RoleNameIndex()
+
+
+class RoleChangeResult(NamedTuple):
+    added: List[discord.Role]
+    removed: List[discord.Role]
+    rest_calls: int
+
+
+async def apply_role_changes(
+    member: discord.Member,
+    add: Iterable[discord.Role] = (),
+    remove: Iterable[discord.Role] = (),
+    *,
+    reason: Optional[str] = None,
+) -> RoleChangeResult:
+    """
+    Apply a role diff to a member with a single `member.edit(roles=...)` request.
+
+    Roles the member already has (or doesn't have) are skipped; when nothing changes no
+    request is made. Rate limits (429) and server errors are retried with a backoff.
+
+    Raises:
+        discord.Forbidden: If the bot isn't allowed to change these roles.
+        discord.HTTPException: If the request keeps failing.
+    """
+    current = {role.id: role for role in member.roles if not role.is_default()}
+    added = [role for role in add if role.id not in current]
+    removed = [role for role in remove if role.id in current]
+
+    if not added and not removed:
+        return RoleChangeResult([], [], 0)
+
+    for role in removed:
+        del current[role.id]
+    for role in added:
+        current[role.id] = role
+
+    rest_calls = 0
+    for attempt in range(MAX_RETRIES):
+        rest_calls += 1
+        try:
+            await member.edit(roles=list(current.values()), reason=reason)
+            break
+        except discord.HTTPException as e:
+            retryable = e.status == 429 or e.status >= 500
+            if not retryable or attempt == MAX_RETRIES - 1:
+                raise
+            delay = 2**attempt
+            logger.warning(f"Role update for {member} failed ({e.status}), retrying in {delay}s")
+            await asyncio.sleep(delay)
+
+    logger.debug(
+        f"Roles of {member} updated (+{len(added)}/-{len(removed)}) in {rest_calls} REST call(s)"
+    )
+    return RoleChangeResult(added, removed, rest_calls)
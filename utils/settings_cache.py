@@ -0,0 +1,154 @@
+"""
+In-process, write-through cache for the documents in the `settings` collection.
+"""
+
+import asyncio
+import copy
+import logging
+from typing import Any, Dict, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+
+class SettingsCache:
+    """
+    Serves `settings` documents from memory.
+
+    All documents are loaded once at startup. Reads return a copy of the cached
+    document, writes go to MongoDB first and replace the cached copy with the
+    document the server returns. Optionally a change stream keeps several pods
+    coherent when another pod (or a manual edit) changes a document.
+    """
+
+    def __init__(self, db, *, follow_changes: bool = False):
+        self.collection = db.settings
+        self.follow_changes = follow_changes
+        # settings_id -> document, or None when we know the document doesn't exist
+        self._documents: Dict[str, Optional[Dict[str, Any]]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._watch_task: Optional[asyncio.Task] = None
+
+    async def load(self):
+        """Load every settings document into memory and start following changes."""
+        try:
+            documents = await self.collection.find({}).to_list(length=None)
+        except PyMongoError as e:
+            logger.error(f"Failed to preload settings, falling back to lazy loading: {e}")
+            return
+
+        self._documents = {doc["_id"]: doc for doc in documents}
+        logger.info(f"Loaded {len(self._documents)} settings documents into the cache")
+
+        if self.follow_changes and self._watch_task is None:
+            self._watch_task = asyncio.create_task(self._watch())
+
+    async def get(self, settings_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a settings document.
+
+        Args:
+            settings_id: The `_id` of the settings document (e.g. 'server_settings')
+
+        Returns:
+            A copy of the document, or None if it doesn't exist
+        """
+        if settings_id not in self._documents:
+            async with self._lock(settings_id):
+                if settings_id not in self._documents:
+                    self._documents[settings_id] = await self.collection.find_one(
+                        {"_id": settings_id}
+                    )
+
+        document = self._documents[settings_id]
+        return copy.deepcopy(document) if document is not None else None
+
+    async def get_value(self, settings_id: str, key: str, default: Any = None) -> Any:
+        """Get a single field of a settings document, or `default` if it isn't set."""
+        document = await self.get(settings_id)
+        if document is None:
+            return default
+        return document.get(key, default)
+
+    async def update_one(
+        self, settings_id: str, update: Dict[str, Any], *, upsert: bool = True
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Apply an update to a settings document and refresh the cached copy.
+
+        Args:
+            settings_id: The `_id` of the settings document
+            update: A MongoDB update document (e.g. {"$set": {...}})
+            upsert: Create the document if it doesn't exist yet
+
+        Returns:
+            A copy of the updated document
+        """
+        async with self._lock(settings_id):
+            document = await self.collection.find_one_and_update(
+                {"_id": settings_id},
+                update,
+                upsert=upsert,
+                return_document=ReturnDocument.AFTER,
+            )
+            self._documents[settings_id] = document
+        return copy.deepcopy(document) if document is not None else None
+
+    async def insert_one(self, document: Dict[str, Any]):
+        """Insert a new settings document and cache it."""
+        async with self._lock(document["_id"]):
+            await self.collection.insert_one(document)
+            self._documents[document["_id"]] = copy.deepcopy(document)
+
+    def invalidate(self, settings_id: Optional[str] = None):
+        """Drop one (or every) cached document so the next read goes to MongoDB."""
+        if settings_id is None:
+            self._documents.clear()
+        else:
+            self._documents.pop(settings_id, None)
+
+    def _lock(self, settings_id: str) -> asyncio.Lock:
+        lock = self._locks.get(settings_id)
+        if lock is None:
+            lock = self._locks[settings_id] = asyncio.Lock()
+        return lock
+
+    async def _watch(self):
+        """Follow the change stream of the settings collection to stay coherent across pods."""
+        try:
+            async with self.collection.watch(full_document="updateLookup") as stream:
+                logger.info("Following settings change stream")
+                async for change in stream:
+                    settings_id = change.get("documentKey", {}).get("_id")
+                    if settings_id is None:
+                        # drop/rename/invalidate events: start over from the database
+                        self.invalidate()
+                        continue
+
+                    if change["operationType"] == "delete":
+                        self._documents[settings_id] = None
+                    elif change.get("fullDocument") is not None:
+                        self._documents[settings_id] = change["fullDocument"]
+                    else:
+                        self.invalidate(settings_id)
+        except OperationFailure as e:
+            # Change streams require a replica set; a standalone mongod refuses them.
+            logger.warning(f"Settings change stream unavailable, cache is local only: {e}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Settings change stream stopped, invalidating cache: {e}")
+            self.invalidate()
+        finally:
+            self._watch_task = None
+
+    async def close(self):
+        """Stop following the change stream."""
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
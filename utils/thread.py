@@ -24,7 +24,9 @@ from discord.ext.commands import CommandError, MissingRequiredArgument
 from lottie.exporters import exporters as l_exporters
 from lottie.importers import importers as l_importers
 
+from .message_links import MessageLinkStore
 from .timezone import LOCAL_TIMEZONE
+from .transcript import compress_transcript, render_transcript, store_transcript
 from .utils import (
     AcceptButton,
     ConfirmThreadCreationView,
@@ -36,6 +38,9 @@ from .utils import (
     parse_channel_topic,
 )
 
+# Messages relayed before links were recorded are searched in this many recent messages
+LEGACY_HISTORY_LIMIT = 100
+
 
 class Thread:
     """Represents a discord Modmail channel thread."""
@@ -120,9 +125,15 @@ class Thread:
                 i.cancel()
 
     @classmethod
-    async def from_channel(cls, manager: "ThreadManager", channel: discord.TextChannel) -> "Thread":
+    async def from_channel(
+        cls,
+        manager: "ThreadManager",
+        channel: discord.TextChannel,
+        recipient_id: typing.Optional[int] = None,
+    ) -> "Thread":
         # there is a chance it grabs from another recipient's main thread
-        _, recipient_id = parse_channel_topic(channel.topic)
+        if recipient_id is None:
+            _, recipient_id = parse_channel_topic(channel.topic)
 
         if recipient_id in manager.cache:
             thread = manager.cache[recipient_id]
@@ -154,7 +165,7 @@ class Thread:
 
         if category is None:
             # Get modmail category from database
-            settings = await self.bot.db.settings.find_one({"_id": "modmail_settings"})
+            settings = await self.bot.settings.get("modmail_settings")
             if settings and "modmail_category_id" in settings:
                 category = discord.utils.get(
                     self.bot.guild.categories, id=settings["modmail_category_id"]
@@ -181,6 +192,7 @@ class Thread:
             return
 
         self._channel = channel
+        await self.manager.index_channel(recipient.id, channel.id)
 
         self.ready = True
 
@@ -314,204 +326,77 @@ class Thread:
     async def store_and_send_log(
         self, closer: typing.Union[discord.Member, discord.User], log_channel: discord.TextChannel
     ):
-        def format_discord_timestamp(text):
-            """Convert Discord timestamps (<t:1234567890:R>) into human-readable format."""
-            matches = re.findall(r"<t:(\d+):R>", text)
-            for match in matches:
-                timestamp = datetime.utcfromtimestamp(int(match)).strftime("%Y-%m-%d %H:%M:%S")
-                text = text.replace(f"<t:{match}:R>", f"<span class='timestamp'>{timestamp}</span>")
-            return text
-
-        def replace_mentions(text, guild):
-            """Replaces user, role, and channel mentions with readable names."""
-            if not text:
-                return ""
-
-            # Replace role mentions
-            if "<@&" in text:  # Only process if a role mention exists
-                role_mention_pattern = re.compile(r"<@&(\d+)>")
-                text = role_mention_pattern.sub(
-                    lambda m: f"@{guild.get_role(int(m.group(1))).name if guild.get_role(int(m.group(1))) else 'Unknown Role'}",
-                    text,
-                )
-
-            # Replace channel mentions
-            if "<#" in text:  # Only process if a channel mention exists
-                channel_mention_pattern = re.compile(r"<#(\d+)>")
-                text = channel_mention_pattern.sub(
-                    lambda m: f"#{guild.get_channel(int(m.group(1))).name if guild.get_channel(int(m.group(1))) else 'Unknown Channel'}",
-                    text,
-                )
-
-            # Replace user mentions
-            if "<@" in text:  # Only process if a user mention exists
-                user_mention_pattern = re.compile(r"<@(\d+)>")
-                text = user_mention_pattern.sub(
-                    lambda m: f"@{guild.get_member(int(m.group(1))).display_name if guild.get_member(int(m.group(1))) else 'Unknown User'}",
-                    text,
-                )
-
-            return text
-
         # Determine NSFW status
         nsfw = "NSFW-" if self.channel.nsfw else ""
 
         channel = self.channel
-        messages = []
-
-        async for msg in channel.history(limit=None, oldest_first=True):
-            timestamp = msg.created_at.strftime("%Y-%m-%d %H:%M:%S")
-            author_name = msg.author.display_name
-            content = msg.content or ""
-
-            # Replace mentions with actual names
-            for mention in msg.mentions:
-                content = content.replace(
-                    f"<@{mention.id}>", f"<span class='mention'>@{mention.display_name}</span>"
-                )
-            for role in msg.role_mentions:
-                content = content.replace(
-                    f"<@&{role.id}>", f"<span class='role'>@{role.name}</span>"
-                )
-            for channel_mention in msg.channel_mentions:
-                content = content.replace(
-                    f"<#{channel_mention.id}>",
-                    f"<span class='channel'>#{channel_mention.name}</span>",
-                )
-
-            # Convert timestamps
-            content = format_discord_timestamp(content)
-
-            message_html = (
-                f"<div class='message'>"
-                f"<span class='author'>{author_name}</span> <span class='timestamp'>{timestamp}</span><br>"
-                f"<p class='content'>{content}</p>"
-            )
-
-            # Process embeds
-            if msg.embeds:
-                for embed in msg.embeds:
-                    embed_content = f"<div class='embed' style='border-left: 5px solid {embed.color}; padding: 10px;'>"
-
-                    if embed.author:
-                        embed_content += f"<div class='embed-author'><img src='{embed.author.icon_url}' class='embed-author-icon'> {embed.author.name}</div>"
-
-                    if embed.title:
-                        embed_content += f"<h3>{replace_mentions(embed.title, msg.guild)}</h3>"
-
-                    if embed.description:
-                        desc = embed.description
-
-                        desc = replace_mentions(desc, msg.guild)
-                        desc = format_discord_timestamp(desc)
-
-                        embed_content += f"<p>{desc}</p>"
-
-                    if embed.fields:
-                        for field in embed.fields:
-                            embed_content += f"<p><strong>{replace_mentions(field.name, msg.guild)}:</strong> {replace_mentions(field.value, msg.guild)}</p>"
+        html = await render_transcript(channel)
+        compressed = None
 
-                    if embed.thumbnail:
-                        embed_content += (
-                            f'<img src="{embed.thumbnail.url}" class="embed-thumbnail">'
-                        )
-
-                    if embed.image:
-                        embed_content += f'<img src="{embed.image.url}" class="embed-image">'
+        try:
+            html_size = html.seek(0, 2)
+            html.seek(0)
+
+            # Send to log channel
+            if log_channel:
+                # Create an HTML file; compress it if it's too big to upload as is
+                upload_limit = channel.guild.filesize_limit if channel.guild else 10 * 1024 * 1024
+                if html_size <= upload_limit:
+                    file = discord.File(html, filename=f"modmail_{channel.id}.html")
+                else:
+                    compressed = await compress_transcript(html)
+                    file = discord.File(compressed, filename=f"modmail_{channel.id}.html.gz")
 
-                    if embed.footer:
-                        embed_content += "<p class='footer'>"
-                        timestamp_str = (
-                            embed.timestamp.strftime("%Y-%m-%d %H:%M") if embed.timestamp else ""
-                        )
-                        if embed.footer.text:
-                            embed_content += f"{embed.footer.text} "
-                        embed_content += f"{timestamp_str}</p>"
-
-                    embed_content += "</div>"
-                    message_html += embed_content
-
-            message_html += "</div>"
-            messages.append(message_html)
-
-            # Create the HTML log
-        log_html = f"""<html>
-    <head>
-        <style>
-            body {{ font-family: Arial, sans-serif; background-color: #36393F; color: #DCDDDE; padding: 20px; }}
-            .container {{ max-width: 800px; margin: auto; background: #2F3136; padding: 20px; border-radius: 5px; }}
-            .user-info {{ padding: 10px; background: #23272A; border-radius: 5px; margin-bottom: 10px; }}
-            .message {{ padding: 10px; margin: 5px 0; border-radius: 5px; background: #40444B; }}
-            .author {{ font-weight: bold; color: #FFFFFF; }}
-            .timestamp {{ font-size: 0.8em; color: #B9BBBE; }}
-            .mention {{ color: #7289DA; font-weight: bold; }}
-            .role {{ color: #FAA61A; font-weight: bold; }}
-            .channel {{ color: #43B581; font-weight: bold; }}
-            .embed {{ background: #202225; padding: 10px; margin-top: 10px; border-radius: 5px; }}
-            .embed-author {{ font-weight: bold; margin-bottom: 5px; }}
-            .embed-author-icon {{ width: 20px; height: 20px; vertical-align: middle; margin-right: 5px; }}
-            .embed-thumbnail {{ max-width: 100px; float: right; }}
-            .embed-image {{ max-width: 100%; margin-top: 5px; }}
-            .footer {{ font-size: 0.9em; color: #B9BBBE; }}
-        </style>
-    </head>
-    <body>
-        <div class='container'>
-            <h2>Modmail Log - {channel.name}</h2>
-                {' '.join(messages)}
-        </div>
-    </body>
-</html>"""
-
-        # Create an HTML file
-        file = discord.File(io.BytesIO(log_html.encode()), filename=f"modmail_{channel.id}.html")
-
-        # Send to log channel
-        if log_channel:
-            try:
-                await log_channel.send(
-                    f"{nsfw}Transcript for {channel.name} (closed by {closer.mention}):", file=file
-                )
-            except discord.NotFound:
-                self.bot.log.error(
-                    f"Modmail log channel {log_channel.id} not found when trying to send transcript for ticket {channel.id}"
-                )
-                raise Exception(
-                    f"Het geconfigureerde modmail log kanaal (ID: {log_channel.id}) bestaat niet meer."
-                )
-            except discord.Forbidden:
-                self.bot.log.error(
-                    f"No permission to send to modmail log channel {log_channel.id} when trying to send transcript for ticket {channel.id}"
-                )
-                raise Exception(
-                    f"Geen toestemming om berichten te sturen naar het modmail log kanaal (ID: {log_channel.id})."
-                )
-            except discord.HTTPException as e:
-                self.bot.log.error(
-                    f"HTTP error when sending transcript to modmail log channel {log_channel.id} for ticket {channel.id}: {e}"
-                )
-                raise Exception(
-                    f"Discord API fout bij versturen transcript naar log kanaal: {str(e)}"
-                )
-            except Exception as e:
-                self.bot.log.error(
-                    f"Unexpected error when sending transcript to modmail log channel {log_channel.id} for ticket {channel.id}: {e}",
-                    exc_info=True,
-                )
-                raise Exception(
-                    f"Onverwachte fout bij versturen transcript naar log kanaal: {str(e)}"
-                )
+                try:
+                    await log_channel.send(
+                        f"{nsfw}Transcript for {channel.name} (closed by {closer.mention}):",
+                        file=file,
+                    )
+                except discord.NotFound:
+                    self.bot.log.error(
+                        f"Modmail log channel {log_channel.id} not found when trying to send transcript for ticket {channel.id}"
+                    )
+                    raise Exception(
+                        f"Het geconfigureerde modmail log kanaal (ID: {log_channel.id}) bestaat niet meer."
+                    )
+                except discord.Forbidden:
+                    self.bot.log.error(
+                        f"No permission to send to modmail log channel {log_channel.id} when trying to send transcript for ticket {channel.id}"
+                    )
+                    raise Exception(
+                        f"Geen toestemming om berichten te sturen naar het modmail log kanaal (ID: {log_channel.id})."
+                    )
+                except discord.HTTPException as e:
+                    self.bot.log.error(
+                        f"HTTP error when sending transcript to modmail log channel {log_channel.id} for ticket {channel.id}: {e}"
+                    )
+                    raise Exception(
+                        f"Discord API fout bij versturen transcript naar log kanaal: {str(e)}"
+                    )
+                except Exception as e:
+                    self.bot.log.error(
+                        f"Unexpected error when sending transcript to modmail log channel {log_channel.id} for ticket {channel.id}: {e}",
+                        exc_info=True,
+                    )
+                    raise Exception(
+                        f"Onverwachte fout bij versturen transcript naar log kanaal: {str(e)}"
+                    )
 
-        # Store in MongoDB
-        _, recipient_id = parse_channel_topic(channel.topic)
-        log_entry = {
-            "recipient_id": recipient_id,
-            "ticket_id": channel.id,
-            "closed_by": closer.id,
-            "timestamp": datetime.now(LOCAL_TIMEZONE),
-            "log_html": log_html,
-        }
-        await self.bot.db.modmail_logs.insert_one(log_entry)
+            # Store in MongoDB
+            _, recipient_id = parse_channel_topic(channel.topic)
+            log_entry = {
+                "recipient_id": recipient_id,
+                "ticket_id": channel.id,
+                "closed_by": closer.id,
+                "timestamp": datetime.now(LOCAL_TIMEZONE),
+            }
+            if compressed is None:
+                compressed = await compress_transcript(html)
+            await store_transcript(self.bot.db, log_entry, compressed)
+        finally:
+            html.close()
+            if compressed is not None:
+                compressed.close()
 
     async def close(
         self,
@@ -642,43 +527,67 @@ class Thread:
                     raise ValueError("Thread message not found. 3")
                 return message1, None
         else:
-            async for message1 in self.channel.history():
-                if (
-                    message1.embeds
-                    and message1.embeds[0].color
-                    and message1.author == self.bot.user
-                ):
-                    break
+            link = await self.manager.links.get_last_staff_message(self.channel.id)
+            if link is not None:
+                try:
+                    message1 = await self.channel.fetch_message(link.thread_message_id)
+                except discord.NotFound:
+                    await self.manager.links.forget(link.thread_message_id)
+                    raise ValueError("Thread message not found. 5")
             else:
-                self.bot.log.warning("6")
-                raise ValueError("Thread message not found. 5")
+                # No recorded reply (yet): the thread may predate the message links
+                async for message1 in self.channel.history(limit=LEGACY_HISTORY_LIMIT):
+                    if (
+                        message1.embeds
+                        and message1.embeds[0].color
+                        and message1.author == self.bot.user
+                    ):
+                        break
+                else:
+                    self.bot.log.warning("6")
+                    raise ValueError("Thread message not found. 5")
+
+        link = await self.manager.links.get_by_thread_message(message1.id)
+        if link is None:
+            message2 = await self._find_legacy_dm_message(message1)
+            if message2 is None:
+                raise ValueError("DM message not found.")
+            return [message1, message2]
+
+        try:
+            message2 = await self.recipient.fetch_message(link.dm_message_id)
+        except discord.NotFound:
+            raise ValueError("DM message not found.")
+
+        return [message1, message2]
 
+    async def _find_legacy_dm_message(
+        self, message1: discord.Message
+    ) -> typing.Optional[discord.Message]:
+        """
+        Find the DM copy of a thread message that has no recorded link by matching its
+        embed in the recent DM history, and record the link for next time.
+        """
         try:
             sender = message1.embeds[0].author
             desc = message1.embeds[0].description
             time = message1.embeds[0].timestamp
-        except ValueError:
+        except (IndexError, ValueError):
             raise ValueError("Malformed thread message.")
 
-        messages = [message1]
-        async for msg in self.recipient.history():
+        async for msg in self.recipient.history(limit=LEGACY_HISTORY_LIMIT):
             if not (msg.embeds and msg.embeds[0].author):
                 continue
-            try:
-                if (
-                    msg.embeds[0].author == sender
-                    and msg.embeds[0].description == desc
-                    and msg.embeds[0].timestamp == time
-                ):
-                    messages.append(msg)
-                    break
-            except ValueError:
-                continue
-
-        if len(messages) > 1:
-            return messages
-
-        raise ValueError("DM message not found.")
+            embed = msg.embeds[0]
+            if embed.author == sender and embed.description == desc and embed.timestamp == time:
+                await self.manager.links.record(
+                    self.channel.id,
+                    message1.id,
+                    msg.id,
+                    from_mod=message1.embeds[0].colour != discord.Colour.green(),
+                )
+                return msg
+        return None
 
     async def edit_message(self, message_id: typing.Optional[int], message: str) -> None:
         try:
@@ -713,31 +622,35 @@ class Thread:
 
         if tasks:
             await asyncio.gather(*tasks)
+            await self.manager.links.forget(message1.id)
 
     async def find_linked_message_from_dm(
         self, message: discord.Message, either_direction=False, get_thread_channel=False
     ) -> typing.List[discord.Message]:
-        try:
-            sender = message.author
-            desc = message.content
-        except ValueError:
-            raise ValueError("Malformed thread message.")
+        if self.channel is None:
+            raise ValueError("Thread channel message not found.")
 
-        linked_messages = []
-        if self.channel is not None:
-            async for msg in self.channel.history():
-                if not msg.embeds:
-                    continue
-                try:
-                    if msg.channel.name == sender.name and msg.embeds[0].description == desc:
-                        linked_messages.append(msg)
-                        break
-                except ValueError:
-                    continue
-            else:
+        link = await self.manager.links.get_by_dm_message(message.id)
+        if link is not None:
+            try:
+                linked_messages = [await self.channel.fetch_message(link.thread_message_id)]
+            except discord.NotFound:
                 raise ValueError("Thread channel message not found.")
         else:
-            raise ValueError("Thread channel message not found.")
+            # Relayed before links were recorded: match the copy in the recent history
+            async for msg in self.channel.history(limit=LEGACY_HISTORY_LIMIT):
+                if (
+                    msg.embeds
+                    and msg.channel.name == message.author.name
+                    and msg.embeds[0].description == message.content
+                ):
+                    await self.manager.links.record(
+                        self.channel.id, msg.id, message.id, from_mod=False
+                    )
+                    linked_messages = [msg]
+                    break
+            else:
+                raise ValueError("Thread channel message not found.")
 
         if get_thread_channel:
             # end early as we only want the main message from thread channel
@@ -830,6 +743,7 @@ class Thread:
             msg = await self.send(
                 message, destination=self.channel, from_mod=True, anonymous=anonymous, plain=plain
             )
+            await self.manager.links.record(self.channel.id, msg.id, user_msg[0].id, from_mod=True)
 
         await asyncio.gather(*tasks)
         self.bot.dispatch("thread_reply", self, True, message, anonymous, plain)
@@ -1062,6 +976,15 @@ class Thread:
         else:
             msg = await destination.send(embed=embed)
 
+        if (
+            destination == self.channel
+            and not from_mod
+            and not note
+            and isinstance(message.channel, discord.DMChannel)
+        ):
+            # Incoming DM: link it to its copy in the thread channel
+            await self.manager.links.record(self.channel.id, msg.id, message.id, from_mod=False)
+
         if additional_images:
             self.ready = False
             await asyncio.gather(*additional_images)
@@ -1104,11 +1027,105 @@ class ThreadManager:
     def __init__(self, bot):
         self.bot = bot
         self.cache = {}
+        # recipient_id <-> channel_id of open threads, persisted in modmail_threads
+        self.channel_ids: typing.Dict[int, int] = {}
+        self.recipient_ids: typing.Dict[int, int] = {}
+        self.index_collection = bot.db.modmail_threads
+        self.links = MessageLinkStore(bot.db)
 
     async def populate_cache(self) -> None:
-        for channel in self.bot.guild.text_channels:
+        await self.load_index()
+
+        if not self.recipient_ids:
+            # No persisted index yet: build it from the channel topics once
+            for channel in self.bot.guild.text_channels:
+                if channel.topic:
+                    _, user_id = parse_channel_topic(channel.topic)
+                    if user_id != -1:
+                        await self.index_channel(user_id, channel.id)
+
+        for channel_id in list(self.recipient_ids):
+            channel = self.bot.get_channel(channel_id)
+            if not isinstance(channel, discord.TextChannel):
+                await self.unindex_channel(channel_id)
+                continue
             await self.find(channel=channel)
 
+    async def load_index(self) -> None:
+        """Load the persisted recipient <-> channel index."""
+        try:
+            documents = await self.index_collection.find({}).to_list(length=None)
+        except Exception as e:
+            self.bot.log.error(f"Failed to load modmail thread index: {e}")
+            return
+
+        for document in documents:
+            self.channel_ids[document["recipient_id"]] = document["_id"]
+            self.recipient_ids[document["_id"]] = document["recipient_id"]
+        self.bot.log.debug(f"Loaded {len(documents)} modmail threads from the index")
+
+    async def index_channel(self, recipient_id: int, channel_id: int) -> None:
+        """Record that `channel_id` is the thread channel of `recipient_id`."""
+        if self.recipient_ids.get(channel_id) == recipient_id:
+            return
+
+        old_recipient_id = self.recipient_ids.get(channel_id)
+        if old_recipient_id is not None and self.channel_ids.get(old_recipient_id) == channel_id:
+            del self.channel_ids[old_recipient_id]
+
+        self.channel_ids[recipient_id] = channel_id
+        self.recipient_ids[channel_id] = recipient_id
+        try:
+            await self.index_collection.replace_one(
+                {"_id": channel_id}, {"_id": channel_id, "recipient_id": recipient_id}, upsert=True
+            )
+        except Exception as e:
+            self.bot.log.error(f"Failed to persist modmail thread index for {channel_id}: {e}")
+
+    async def unindex_channel(self, channel_id: int) -> None:
+        """Forget a thread channel (closed or deleted)."""
+        recipient_id = self.recipient_ids.pop(channel_id, None)
+        if recipient_id is None:
+            return
+
+        if self.channel_ids.get(recipient_id) == channel_id:
+            del self.channel_ids[recipient_id]
+        try:
+            await self.index_collection.delete_one({"_id": channel_id})
+        except Exception as e:
+            self.bot.log.error(f"Failed to remove {channel_id} from the modmail thread index: {e}")
+
+    async def handle_channel_create(self, channel: discord.abc.GuildChannel) -> None:
+        if not isinstance(channel, discord.TextChannel) or channel.guild != self.bot.guild:
+            return
+        if channel.topic:
+            _, user_id = parse_channel_topic(channel.topic)
+            if user_id != -1:
+                await self.index_channel(user_id, channel.id)
+
+    async def handle_channel_update(
+        self, before: discord.abc.GuildChannel, after: discord.abc.GuildChannel
+    ) -> None:
+        if not isinstance(after, discord.TextChannel) or after.guild != self.bot.guild:
+            return
+        if before.topic == after.topic:
+            return
+
+        _, user_id = parse_channel_topic(after.topic) if after.topic else (None, -1)
+        recipient_id = self.recipient_ids.get(after.id)
+
+        if user_id != -1:
+            await self.index_channel(user_id, after.id)
+        elif recipient_id is not None:
+            # The user ID was removed from the topic of a thread channel, put it back
+            self.bot.log.debug("Found thread with tempered ID.")
+            await after.edit(topic=f"User ID: {recipient_id}")
+
+    async def handle_channel_delete(self, channel: discord.abc.GuildChannel) -> None:
+        if channel.id in self.recipient_ids:
+            await self.links.forget_channel(channel.id)
+        await self.unindex_channel(channel.id)
+
     def __len__(self):
         return len(self.cache)
 
@@ -1127,14 +1144,16 @@ class ThreadManager:
     ) -> typing.Optional[Thread]:
         """Finds a thread from cache or from discord channel topics."""
         if recipient is None and channel is not None and isinstance(channel, discord.TextChannel):
+            user_id = self.recipient_ids.get(channel.id)
+            thread = self.cache.get(user_id) if user_id is not None else None
+            if thread is not None and thread.channel == channel:
+                return thread
+
             thread = await self._find_from_channel(channel)
-            if thread is None:
-                user_id, thread = next(
-                    ((k, v) for k, v in self.cache.items() if v.channel == channel), (-1, None)
-                )
-                if thread is not None:
-                    self.bot.log.debug("Found thread with tempered ID.")
-                    await channel.edit(topic=f"User ID: {user_id}")
+            if thread is None and user_id is not None:
+                self.bot.log.debug("Found thread with tempered ID.")
+                await channel.edit(topic=f"User ID: {user_id}")
+                thread = await self._find_from_channel(channel, user_id)
             return thread
 
         if recipient:
@@ -1160,19 +1179,18 @@ class ThreadManager:
                         self.cache.pop(thread.id, None)
                     except KeyError:
                         pass
+                    if thread.channel:
+                        await self.unindex_channel(thread.channel.id)
                     thread = None
         else:
+            channel_id = self.channel_ids.get(recipient_id)
+            channel = self.bot.get_channel(channel_id) if channel_id else None
 
-            def check(topic):
-                _, user_id = parse_channel_topic(topic)
-                return recipient_id == user_id
-
-            channel = next(
-                (x for x in self.bot.guild.text_channels if x.topic and check(x.topic)), None
-            )
+            if channel_id and channel is None:
+                await self.unindex_channel(channel_id)
 
             if channel:
-                thread = await Thread.from_channel(self, channel)
+                thread = await Thread.from_channel(self, channel, recipient_id)
                 if thread.recipient:
                     # only save if data is valid.
                     # also the recipient_id here could belong to other recipient,
@@ -1187,20 +1205,21 @@ class ThreadManager:
 
         return thread
 
-    async def _find_from_channel(self, channel):
+    async def _find_from_channel(self, channel, user_id: typing.Optional[int] = None):
         """
         Tries to find a thread from a channel channel topic,
         if channel topic doesnt exist for some reason, falls back to
         searching channel history for genesis embed and
         extracts user_id from that.
         """
-        if not channel.topic:
-            return None
+        if user_id is None:
+            if not channel.topic:
+                return None
 
-        _, user_id = parse_channel_topic(channel.topic)
+            _, user_id = parse_channel_topic(channel.topic)
 
-        if user_id == -1:
-            return None
+            if user_id == -1:
+                return None
 
         if user_id in self.cache:
             return self.cache[user_id]
@@ -0,0 +1,331 @@
+"""
+Streaming HTML transcript rendering and storage for modmail tickets.
+
+The transcript is written page by page into a spooled temporary file (kept in memory
+while small, moved to disk when it grows), so closing a ticket with thousands of
+messages uses bounded memory. Stored transcripts are gzip-compressed; transcripts
+that would still come close to MongoDB's 16 MB document limit go to GridFS.
+"""
+
+import asyncio
+import gzip
+import re
+import shutil
+import tempfile
+import typing
+import zipfile
+from datetime import datetime
+
+import discord
+from bson import Binary
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+
+SPOOL_MAX_MEMORY = 4 * 1024 * 1024  # bytes kept in memory before spilling to disk
+MAX_INLINE_SIZE = 12 * 1024 * 1024  # compressed transcripts above this go to GridFS
+PAGE_SIZE = 100  # messages per history request (Discord maximum)
+GRIDFS_BUCKET = "modmail_transcripts"
+ARCHIVE_LEVEL = 6  # deflate level of transcript archives
+ARCHIVE_DIRECTORY_ENTRY = 46  # central directory record of a zip entry, without the name
+ARCHIVE_END_RECORD = 22
+
+# One pass over the text for every mention and relative timestamp
+TOKEN_REGEX = re.compile(
+    r"<(?:@&(?P<role>\d+)|@!?(?P<user>\d+)|#(?P<channel>\d+)|t:(?P<timestamp>\d+):R)>"
+)
+
+HTML_HEADER = """<html>
+    <head>
+        <style>
+            body {{ font-family: Arial, sans-serif; background-color: #36393F; color: #DCDDDE; padding: 20px; }}
+            .container {{ max-width: 800px; margin: auto; background: #2F3136; padding: 20px; border-radius: 5px; }}
+            .user-info {{ padding: 10px; background: #23272A; border-radius: 5px; margin-bottom: 10px; }}
+            .message {{ padding: 10px; margin: 5px 0; border-radius: 5px; background: #40444B; }}
+            .author {{ font-weight: bold; color: #FFFFFF; }}
+            .timestamp {{ font-size: 0.8em; color: #B9BBBE; }}
+            .mention {{ color: #7289DA; font-weight: bold; }}
+            .role {{ color: #FAA61A; font-weight: bold; }}
+            .channel {{ color: #43B581; font-weight: bold; }}
+            .embed {{ background: #202225; padding: 10px; margin-top: 10px; border-radius: 5px; }}
+            .embed-author {{ font-weight: bold; margin-bottom: 5px; }}
+            .embed-author-icon {{ width: 20px; height: 20px; vertical-align: middle; margin-right: 5px; }}
+            .embed-thumbnail {{ max-width: 100px; float: right; }}
+            .embed-image {{ max-width: 100%; margin-top: 5px; }}
+            .footer {{ font-size: 0.9em; color: #B9BBBE; }}
+        </style>
+    </head>
+    <body>
+        <div class='container'>
+            <h2>Modmail Log - {channel_name}</h2>
+                """
+
+HTML_FOOTER = """
+        </div>
+    </body>
+</html>"""
+
+
+def substitute_tokens(
+    text: str,
+    guild: typing.Optional[discord.Guild],
+    *,
+    styled: bool,
+    members: typing.Optional[dict] = None,
+) -> str:
+    """
+    Replace user, role and channel mentions and relative timestamps with readable text.
+
+    Args:
+        text: The message content, embed text, ...
+        guild: The guild used to resolve IDs
+        styled: Wrap mentions in spans (message content) or use plain text (embeds)
+        members: Pre-resolved users for user mentions (e.g. `message.mentions`)
+    """
+    if not text or "<" not in text:
+        return text or ""
+
+    def replace(match: re.Match) -> str:
+        if match["timestamp"]:
+            timestamp = datetime.utcfromtimestamp(int(match["timestamp"]))
+            return f"<span class='timestamp'>{timestamp.strftime('%Y-%m-%d %H:%M:%S')}</span>"
+
+        if match["user"]:
+            user_id = int(match["user"])
+            user = (members or {}).get(user_id) or (guild.get_member(user_id) if guild else None)
+            name = f"@{user.display_name}" if user else "@Unknown User"
+            css = "mention"
+        elif match["role"]:
+            role = guild.get_role(int(match["role"])) if guild else None
+            name = f"@{role.name}" if role else "@Unknown Role"
+            css = "role"
+        else:
+            channel = guild.get_channel(int(match["channel"])) if guild else None
+            name = f"#{channel.name}" if channel else "#Unknown Channel"
+            css = "channel"
+
+        return f"<span class='{css}'>{name}</span>" if styled else name
+
+    return TOKEN_REGEX.sub(replace, text)
+
+
+def render_message(msg: discord.Message) -> str:
+    """Render one message (and its embeds) as an HTML fragment."""
+    guild = msg.guild
+    timestamp = msg.created_at.strftime("%Y-%m-%d %H:%M:%S")
+    members = {m.id: m for m in msg.mentions}
+    content = substitute_tokens(msg.content, guild, styled=True, members=members)
+
+    parts = [
+        "<div class='message'>",
+        f"<span class='author'>{msg.author.display_name}</span> <span class='timestamp'>{timestamp}</span><br>",
+        f"<p class='content'>{content}</p>",
+    ]
+
+    for embed in msg.embeds:
+        parts.append(
+            f"<div class='embed' style='border-left: 5px solid {embed.color}; padding: 10px;'>"
+        )
+
+        if embed.author:
+            parts.append(
+                f"<div class='embed-author'><img src='{embed.author.icon_url}' class='embed-author-icon'> {embed.author.name}</div>"
+            )
+
+        if embed.title:
+            parts.append(f"<h3>{substitute_tokens(embed.title, guild, styled=False)}</h3>")
+
+        if embed.description:
+            parts.append(f"<p>{substitute_tokens(embed.description, guild, styled=False)}</p>")
+
+        for field in embed.fields:
+            parts.append(
+                f"<p><strong>{substitute_tokens(field.name, guild, styled=False)}:</strong> "
+                f"{substitute_tokens(field.value, guild, styled=False)}</p>"
+            )
+
+        if embed.thumbnail:
+            parts.append(f'<img src="{embed.thumbnail.url}" class="embed-thumbnail">')
+
+        if embed.image:
+            parts.append(f'<img src="{embed.image.url}" class="embed-image">')
+
+        if embed.footer:
+            timestamp_str = embed.timestamp.strftime("%Y-%m-%d %H:%M") if embed.timestamp else ""
+            footer_text = f"{embed.footer.text} " if embed.footer.text else ""
+            parts.append(f"<p class='footer'>{footer_text}{timestamp_str}</p>")
+
+        parts.append("</div>")
+
+    parts.append("</div>")
+    return "".join(parts)
+
+
+async def render_transcript(channel: discord.TextChannel) -> tempfile.SpooledTemporaryFile:
+    """
+    Render the full history of a ticket channel into a spooled file (UTF-8 HTML).
+
+    History is fetched one page at a time and every page is written as one chunk.
+    The returned file is positioned at the start; the caller closes it.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY, mode="w+b")
+    spool.write(HTML_HEADER.format(channel_name=channel.name).encode())
+
+    after = None
+    while True:
+        page = [
+            msg async for msg in channel.history(limit=PAGE_SIZE, after=after, oldest_first=True)
+        ]
+        if not page:
+            break
+        spool.write(" ".join(render_message(msg) for msg in page).encode())
+        spool.write(b" ")
+        if len(page) < PAGE_SIZE:
+            break
+        after = page[-1]
+
+    spool.write(HTML_FOOTER.encode())
+    spool.seek(0)
+    return spool
+
+
+def _compress(source: typing.BinaryIO) -> tempfile.SpooledTemporaryFile:
+    """Gzip a file object into a new spooled file, chunk by chunk."""
+    compressed = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY, mode="w+b")
+    source.seek(0)
+    with gzip.GzipFile(fileobj=compressed, mode="wb", compresslevel=6) as gz:
+        shutil.copyfileobj(source, gz, length=256 * 1024)
+    source.seek(0)
+    compressed.seek(0)
+    return compressed
+
+
+async def compress_transcript(spool: typing.BinaryIO) -> tempfile.SpooledTemporaryFile:
+    """Gzip a rendered transcript off the event loop."""
+    return await asyncio.to_thread(_compress, spool)
+
+
+async def store_transcript(db, log_entry: dict, compressed: typing.BinaryIO):
+    """
+    Store a compressed transcript in `modmail_logs`.
+
+    Small transcripts are stored inline as `log_html_gz`; large ones are uploaded to
+    GridFS and referenced through `log_file_id`.
+    """
+    compressed.seek(0, 2)
+    size = compressed.tell()
+    compressed.seek(0)
+
+    log_entry["compression"] = "gzip"
+    if size <= MAX_INLINE_SIZE:
+        log_entry["log_html_gz"] = Binary(compressed.read())
+    else:
+        bucket = AsyncIOMotorGridFSBucket(db, bucket_name=GRIDFS_BUCKET)
+        log_entry["log_file_id"] = await bucket.upload_from_stream(
+            f"modmail_{log_entry['ticket_id']}.html.gz", compressed
+        )
+    await db.modmail_logs.insert_one(log_entry)
+
+
+async def load_transcript_html(db, document: dict) -> typing.Optional[bytes]:
+    """Return the (uncompressed) HTML of a stored transcript, whatever its storage format."""
+    if "log_html" in document:
+        return document["log_html"].encode("utf-8")
+
+    if "log_html_gz" in document:
+        data = bytes(document["log_html_gz"])
+    elif "log_file_id" in document:
+        bucket = AsyncIOMotorGridFSBucket(db, bucket_name=GRIDFS_BUCKET)
+        stream = await bucket.open_download_stream(document["log_file_id"])
+        data = await stream.read()
+    else:
+        return None
+
+    return await asyncio.to_thread(gzip.decompress, data)
+
+
+class TranscriptArchive:
+    """
+    Zip archive of transcripts, written one transcript at a time into spooled temporary
+    files and split into parts of at most `max_size` bytes (the upload limit).
+
+    Every transcript is compressed once, straight into the current part; the part's size
+    is read from the file after the write, and an entry that overflows it is removed again
+    and written into the next part. `add` is meant to run off the event loop.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._file: typing.Optional[tempfile.SpooledTemporaryFile] = None
+        self._zip: typing.Optional[zipfile.ZipFile] = None
+        self._directory = 0  # size of the central directory the part will end with
+        self.parts = 0
+
+    def _open_part(self):
+        self._file = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY, mode="w+b")
+        self._zip = zipfile.ZipFile(self._file, "w", compression=zipfile.ZIP_DEFLATED)
+        self._directory = 0
+        self.parts += 1
+
+    def _close_part(self) -> typing.Optional[tempfile.SpooledTemporaryFile]:
+        if self._zip is None:
+            return None
+        self._zip.close()
+        part, self._file, self._zip = self._file, None, None
+        part.seek(0)
+        return part
+
+    def _remove_last(self, info: zipfile.ZipInfo):
+        # Entries are appended and the central directory is only written on close, so
+        # truncating the file at the entry's header removes it again
+        self._zip.filelist.remove(info)
+        del self._zip.NameToInfo[info.filename]
+        self._zip.start_dir = info.header_offset
+        self._file.seek(info.header_offset)
+        self._file.truncate()
+
+    def _write(self, name: str, html: bytes, date: datetime) -> typing.Tuple[zipfile.ZipInfo, int]:
+        """Write an entry into the current part; returns it with the part's final size."""
+        info = zipfile.ZipInfo(name, date_time=date.timetuple()[:6])
+        info.compress_type = zipfile.ZIP_DEFLATED
+        self._zip.writestr(info, html, compresslevel=ARCHIVE_LEVEL)
+        directory = self._directory + ARCHIVE_DIRECTORY_ENTRY + len(info.filename.encode())
+        return info, self._file.tell() + directory + ARCHIVE_END_RECORD
+
+    def add(
+        self, name: str, html: bytes, date: datetime
+    ) -> typing.Optional[tempfile.SpooledTemporaryFile]:
+        """
+        Add a transcript. When it doesn't fit in the current part anymore, that part is
+        finished and returned (positioned at the start; the caller closes it).
+
+        Raises:
+            ValueError: If the transcript doesn't fit in an empty part either.
+        """
+        if self._zip is None:
+            self._open_part()
+
+        info, size = self._write(name, html, date)
+        if size <= self.max_size:
+            self._directory += ARCHIVE_DIRECTORY_ENTRY + len(info.filename.encode())
+            return None
+
+        # The entry measured on its own, in an empty part
+        alone = size - info.header_offset - self._directory
+        self._remove_last(info)
+        if alone > self.max_size:
+            if not self._zip.filelist:
+                # Don't leave an empty part behind
+                self._zip.close()
+                self._file.close()
+                self._file, self._zip = None, None
+                self.parts -= 1
+            raise ValueError(f"{name} is too large for the upload limit")
+
+        finished = self._close_part()
+        self._open_part()
+        info, _ = self._write(name, html, date)
+        self._directory += ARCHIVE_DIRECTORY_ENTRY + len(info.filename.encode())
+        return finished
+
+    def finish(self) -> typing.Optional[tempfile.SpooledTemporaryFile]:
+        """Finish and return the last part (None when nothing was added since the last one)."""
+        return self._close_part()
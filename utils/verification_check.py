@@ -3,7 +3,7 @@ import discord
 
 async def ensure_verified_role(bot, interaction: discord.Interaction) -> None:
     guild = interaction.guild
-    settings = await bot.db.settings.find_one({"_id": "verification_settings"})
+    settings = await bot.settings.get("verification_settings")
     verified_role_id = settings.get("verified_role_id")
     role = guild.get_role(verified_role_id) if verified_role_id else None
 
@@ -0,0 +1,56 @@
+"""
+Removing verification records of users that are no longer in the server.
+
+A full sweep diffs every stored `user_id` against the member cache. Between sweeps the
+cog keeps a compact snapshot of the member IDs (the watermark); after a restart or a
+gateway reconnect only the members in that snapshot that are gone now have to be
+removed, which needs no scan of the collection.
+"""
+
+import array
+import zlib
+from typing import Callable, Iterable, Set, Tuple
+
+CLEANUP_BATCH_SIZE = 1000
+
+
+def pack_member_ids(member_ids: Iterable[int]) -> bytes:
+    """Sorted 64-bit IDs, deflated (sorted snowflakes compress well)."""
+    return zlib.compress(array.array("Q", sorted(member_ids)).tobytes())
+
+
+def unpack_member_ids(data: bytes) -> Set[int]:
+    ids = array.array("Q")
+    ids.frombytes(zlib.decompress(data))
+    return set(ids)
+
+
+async def remove_records(collection, user_ids: Iterable[int]) -> int:
+    """Delete the records of `user_ids` with one `delete_many` per batch; returns how many."""
+    user_ids = list(user_ids)
+    removed = 0
+    for i in range(0, len(user_ids), CLEANUP_BATCH_SIZE):
+        chunk = user_ids[i : i + CLEANUP_BATCH_SIZE]
+        result = await collection.delete_many({"user_id": {"$in": chunk}})
+        removed += result.deleted_count
+    return removed
+
+
+async def sweep_orphaned_records(collection, is_member: Callable[[int], bool]) -> Tuple[int, int]:
+    """
+    Diff the stored user IDs against the member cache in one pass and remove the
+    orphans in bulk.
+
+    Returns:
+        (removed records, total records)
+    """
+    orphaned_ids = []
+    total_records = 0
+
+    cursor = collection.find({}, {"user_id": 1, "_id": 0}).batch_size(CLEANUP_BATCH_SIZE)
+    async for record in cursor:
+        total_records += 1
+        if not is_member(record["user_id"]):
+            orphaned_ids.append(record["user_id"])
+
+    return await remove_records(collection, orphaned_ids), total_records